@@ -0,0 +1,89 @@
+#Benchmark: JSON-Kosten pro Alarm mit Standardbibliothek (vorher) und orjson (nachher)
+#Aufruf: python bench_json.py [anzahl_bots] [wiederholungen]
+#Gemessen wird ein typischer LONG-Alarm: Request parsen, BingX-Antworten parsen, Antwort inkl. logs serialisieren
+
+import json
+import sys
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def beispiel_alarm():
+    return {
+        "vyn": {"action": "increase"},
+        "RENDER": {
+            "api_key": "x" * 64, "secret_key": "y" * 64, "symbol": "BABY-USDT", "botname": "Baby_Bot",
+            "position_side": "LONG", "sell_percentage": 2.5, "price": 0.0612, "leverage": 1,
+            "FIREBASE_SECRET": "z" * 40, "alarm": 1, "pyramiding": 8, "sicherheit": 96, "usdt_factor": 1.4,
+            "bo_factor": 0.001, "base_time2": "", "after_h": 48, "after_so": 14, "sell_percentage2": 0.5,
+            "sl": 10, "beenden": "nein"
+        }
+    }
+
+
+def beispiel_bingx_antworten():
+    position = {
+        "symbol": "BABY-USDT", "positionId": "1234567890", "positionSide": "LONG", "isolated": False,
+        "positionAmt": "1520.0", "availableAmt": "1520.0", "unrealizedProfit": "-1.2", "realisedProfit": "0.3",
+        "initialMargin": "93.1", "avgPrice": "0.0613", "liquidationPrice": "0.0123", "leverage": 1,
+        "positionValue": "93.1", "markPrice": "0.0611", "riskRate": "0.01", "maxMarginReduction": "0"
+    }
+    order = {"orderId": 1712345678901234567, "symbol": "BABY-USDT", "side": "SELL", "positionSide": "LONG",
+             "type": "LIMIT", "origQty": "1520", "price": "0.0628", "status": "NEW", "time": 1712345678901}
+    return [
+        {"code": 0, "data": {"balance": {"asset": "USDT", "balance": "5123.4", "equity": "5120.1", "availableMargin": "4890.2"}}},
+        {"code": 0, "data": [position]},
+        {"code": 0, "data": {"orders": [order, dict(order, type="STOP_MARKET", side="SELL", price="0")]}},
+        {"code": 0, "data": {"order": dict(order, type="MARKET", executedQty="1520")}},
+    ]
+
+
+def beispiel_antwort(anzahl_bots, antworten):
+    balance, positionen, orders, market = antworten
+    logs = [
+        f"Balance Response: {balance}",
+        f"Positions Rohdaten: {positionen['data']}",
+        f"Open Orders: {orders}",
+        f"Market-Order Antwort: {market}",
+    ] * 4
+    return {
+        "error": False,
+        "order_result": market,
+        "limit_order_result": market,
+        "symbol": "BABY-USDT",
+        "botname": "Baby_Bot",
+        "usdt_amount": 93.1,
+        "firebase_all_prices": [{"price": 0.0612 - i * 0.001, "usdt_amount": 10 * 1.4 ** i} for i in range(8)],
+        "saved_usdt_amount": {f"Bot_{i}": 12.5 * i for i in range(anzahl_bots)},
+        "status_fuer_alle": {f"Bot_{i}": "OK" for i in range(anzahl_bots)},
+        "logs": logs,
+    }
+
+
+def messen(name, dumps, loads, anzahl_bots, wiederholungen):
+    alarm_roh = json.dumps(beispiel_alarm()).encode()
+    antworten_roh = [json.dumps(a).encode() for a in beispiel_bingx_antworten()]
+    start = time.perf_counter()
+    for _ in range(wiederholungen):
+        loads(alarm_roh)
+        # get_current_position wird im LONG-Zweig mehrfach aufgerufen
+        antworten = [loads(roh) for roh in antworten_roh] + [loads(antworten_roh[1]) for _ in range(3)]
+        antwort = dumps(beispiel_antwort(anzahl_bots, antworten[:4]))
+    dauer_us = (time.perf_counter() - start) / wiederholungen * 1e6
+    print(f"{name:>8}: {dauer_us:9.1f} µs pro Alarm, Antwort {len(antwort)} Bytes ({anzahl_bots} Bots)")
+    return dauer_us
+
+
+if __name__ == "__main__":
+    anzahl_bots = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    wiederholungen = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    vorher = messen("json", lambda o: json.dumps(o).encode(), json.loads, anzahl_bots, wiederholungen)
+    if orjson is None:
+        print("orjson nicht installiert – pip install orjson")
+    else:
+        nachher = messen("orjson", lambda o: orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS), orjson.loads, anzahl_bots, wiederholungen)
+        print(f"Faktor: {vorher / nachher:.1f}x")
@@ -0,0 +1,48 @@
+# Produktion: gunicorn -c gunicorn.conf.py main:app
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Der Zustand der Bots (Ordergrößen, Zähler, Base-Order-Zeiten) liegt im Speicher des Prozesses,
+# deshalb genau ein Worker. Parallelität über Threads: die Arbeit ist fast nur Warten auf BingX/Firebase.
+# Mehr Kerne nutzen: SHARDS=n startet im Worker n Shard-Prozesse, auf die die Bots nach API-Key verteilt werden.
+workers = 1
+worker_class = "gthread"
+# Die HTTP-Threads reihen Alarme nur in den Alarm-Pool (ALARM_SLOTS Threads) ein; WEB_THREADS > ALARM_SLOTS lassen,
+# damit auch bei vollem Pool Threads frei sind, die ein close annehmen.
+threads = int(os.environ.get("WEB_THREADS", "32"))
+
+# Eine Order-Sequenz (Market-Order, Warten, TP, SL) dauert mit Timeouts und Retries im schlimmsten Fall ~60s
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+# Bei SIGTERM werden keine neuen Verbindungen angenommen, laufende Alarme dürfen so lange fertig laufen
+graceful_timeout = int(os.environ.get("DRAIN_TIMEOUT", "60"))
+keepalive = 5
+
+
+def post_worker_init(worker):
+    import main
+    main.server_vorbereiten()
+
+    # gunicorn hat hier schon seinen SIGTERM-Handler gesetzt (Drain starten); davor die Annahme stoppen,
+    # damit /ready während des Drains 503 liefert und der Load Balancer keine Alarme mehr schickt
+    gunicorn_handler = signal.getsignal(signal.SIGTERM)
+
+    def sigterm(signum, frame):
+        main.annahme_stoppen()
+        if callable(gunicorn_handler):
+            gunicorn_handler(signum, frame)
+
+    signal.signal(signal.SIGTERM, sigterm)
+
+
+def worker_int(worker):
+    # SIGINT/SIGQUIT: gunicorn beendet den Worker sofort, laufende Alarme werden nicht mehr angenommen
+    import main
+    main.annahme_stoppen()
+
+
+def worker_exit(server, worker):
+    # falls noch Alarme außerhalb der HTTP-Requests laufen (z.B. Notfall-Schließen)
+    import main
+    main.herunterfahren(graceful_timeout)
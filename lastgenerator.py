@@ -0,0 +1,395 @@
+#Lastgenerator: Alarm-Bursts wie beim Kerzenschluss gegen einen lokalen Server mit Mock-BingX/Firebase
+#Aufruf (startet Mock und gunicorn selbst):
+#   python lastgenerator.py --server --bots 60 --groessen 5,10,20,40,60 --muster gleichzeitig
+#Gegen einen bereits laufenden Server (mit BINGX_BASE_URL und FIREBASE_URL = Mock-Adresse gestartet):
+#   python lastgenerator.py --ziel http://127.0.0.1:5000 --mock-port 9100
+#Nur den Mock starten: python lastgenerator.py --nur-mock
+#Firebase-Mock kann auch streamen (Accept: text/event-stream), POST /_mock/streams_trennen beendet alle Streams
+#Ausgabe: Abschlusszeiten pro Burst (p50/p90/p99/max) und die Burst-Größe, ab der die Latenz einbricht
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+
+# === Mock: BingX (Positionen mit Zustand) und Firebase (Baum im Speicher) ===
+def mock_app(latenz_ms=50, jitter_ms=20):
+    app = Flask("mock")
+    positionen = {}  # (api_key, symbol, seite) -> menge
+    preise = {}
+    baum = {}
+    abos = []  # Firebase-Streams: (Pfadteile, Queue)
+    lock = threading.Lock()
+
+    def warten():
+        time.sleep(max(latenz_ms + random.uniform(-jitter_ms, jitter_ms), 0) / 1000)
+
+    def antwort_bauen(daten, status=200, headers=None):
+        # serialisiert sofort, damit das unter dem Lock geht und danach niemand mehr den Baum anfasst
+        return app.response_class(json.dumps(daten), status=status, mimetype="application/json", headers=headers)
+
+    def antwort(daten, status=200, headers=None):
+        warten()
+        return antwort_bauen(daten, status, headers)
+
+    def preis(symbol):
+        with lock:
+            preise[symbol] = preise.get(symbol, 100.0) * (1 + random.uniform(-0.002, 0.002))
+            return preise[symbol]
+
+    def parameter():
+        daten = dict(request.args)
+        if request.is_json:
+            daten.update(request.get_json(silent=True) or {})
+        return daten
+
+    @app.route("/openApi/swap/v2/server/time")
+    def server_zeit():
+        return antwort({"code": 0, "data": {"serverTime": int(time.time() * 1000)}})
+
+    @app.route("/openApi/swap/v2/quote/price")
+    def quote():
+        return antwort({"code": 0, "data": {"symbol": request.args.get("symbol"), "price": str(round(preis(request.args.get("symbol")), 6))}})
+
+    @app.route("/openApi/swap/v2/user/balance")
+    def balance():
+        return antwort({"code": 0, "data": {"balance": {"asset": "USDT", "balance": "100000", "availableMargin": "100000"}}})
+
+    @app.route("/openApi/swap/v2/user/positions")
+    def positions():
+        api_key = request.headers.get("X-BX-APIKEY")
+        symbol = request.args.get("symbol")
+        with lock:
+            daten = [
+                {"symbol": s, "positionSide": seite, "positionAmt": str(menge), "availableAmt": str(menge),
+                 "avgPrice": str(preise.get(s, 100.0)), "markPrice": str(preise.get(s, 100.0)),
+                 "liquidationPrice": str(round(preise.get(s, 100.0) * (0.5 if seite == "LONG" else 1.5), 6))}
+                for (k, s, seite), menge in positionen.items() if k == api_key and menge > 0 and (not symbol or s == symbol)
+            ]
+        return antwort({"code": 0, "data": daten})
+
+    @app.route("/openApi/swap/v2/trade/openOrders")
+    def open_orders():
+        return antwort({"code": 0, "data": {"orders": []}})
+
+    @app.route("/openApi/swap/v2/trade/leverage", methods=["POST"])
+    def leverage():
+        return antwort({"code": 0, "data": {}})
+
+    @app.route("/openApi/swap/v2/trade/order", methods=["POST", "DELETE"])
+    def order():
+        if request.method == "DELETE":
+            return antwort({"code": 0, "data": {}})
+        p = parameter()
+        api_key = request.headers.get("X-BX-APIKEY")
+        menge = float(p.get("quantity", 0) or 0)
+        seite = str(p.get("positionSide", "LONG")).upper()
+        if p.get("type") == "MARKET":
+            eroeffnen = (p.get("side") == "BUY") == (seite == "LONG")
+            schluessel = (api_key, p.get("symbol"), seite)
+            with lock:
+                aktuell = positionen.get(schluessel, 0.0)
+                positionen[schluessel] = aktuell + menge if eroeffnen else max(aktuell - menge, 0.0)
+        return antwort({"code": 0, "data": {"order": {"orderId": random.randint(1, 10 ** 12), "symbol": p.get("symbol"),
+                                                      "status": "NEW", "executedQty": str(menge), "avgPrice": "0"}}})
+
+    def knoten(pfad, erzeugen=False):
+        teile = [t for t in pfad.split("/") if t]
+        aktuell = baum
+        for teil in teile[:-1]:
+            if teil not in aktuell or not isinstance(aktuell[teil], dict):
+                if not erzeugen:
+                    return None, None
+                aktuell[teil] = {}
+            aktuell = aktuell[teil]
+        return aktuell, teile[-1] if teile else None
+
+    def wert_unter(teile):
+        aktuell = baum
+        for teil in teile:
+            aktuell = aktuell.get(teil) if isinstance(aktuell, dict) else None
+        return json.loads(json.dumps(aktuell))
+
+    def etag(wert):
+        return "null_etag" if wert is None else hashlib.sha1(json.dumps(wert, sort_keys=True).encode()).hexdigest()
+
+    def benachrichtigen(teile, event, daten):
+        # wie Firebase: Ereignis mit Pfad relativ zum abonnierten Knoten; Schreiben oberhalb -> ganzer Knoten neu
+        for abo_teile, warteschlange in abos:
+            if teile[:len(abo_teile)] == abo_teile:
+                warteschlange.put((event, {"path": "/" + "/".join(teile[len(abo_teile):]), "data": daten}))
+            elif abo_teile[:len(teile)] == teile:
+                warteschlange.put(("put", {"path": "/", "data": wert_unter(abo_teile)}))
+
+    def stream(teile):
+        warteschlange = queue.Queue()
+        with lock:
+            start = wert_unter(teile)
+            abos.append((teile, warteschlange))
+
+        def ereignisse():
+            try:
+                yield f"event: put\ndata: {json.dumps({'path': '/', 'data': start})}\n\n"
+                while True:
+                    try:
+                        ereignis = warteschlange.get(timeout=30)
+                    except queue.Empty:
+                        yield "event: keep-alive\ndata: null\n\n"
+                        continue
+                    if ereignis is None:
+                        return
+                    yield f"event: {ereignis[0]}\ndata: {json.dumps(ereignis[1])}\n\n"
+            finally:
+                with lock:
+                    abos.remove((teile, warteschlange))
+
+        return app.response_class(ereignisse(), mimetype="text/event-stream")
+
+    @app.route("/_mock/streams_trennen", methods=["POST"])
+    def streams_trennen():
+        # alle Firebase-Streams beenden, um Reconnect und Resync zu testen
+        with lock:
+            for _, warteschlange in abos:
+                warteschlange.put(None)
+            getrennt = len(abos)
+        return antwort({"getrennt": getrennt})
+
+    @app.route("/<path:pfad>.json", methods=["GET", "PUT", "POST", "PATCH", "DELETE"])
+    def firebase(pfad):
+        teile = [t for t in pfad.split("/") if t]
+        if request.method == "GET" and "text/event-stream" in request.headers.get("Accept", ""):
+            return stream(teile)
+        # Antwort unter dem Lock bauen, die simulierte Latenz erst danach; sonst laufen alle Firebase-Requests
+        # nacheinander und der Mock wird selbst zum Engpass des Lasttests
+        with lock:
+            ergebnis = bearbeiten(pfad, teile)
+        warten()
+        return ergebnis
+
+    def bearbeiten(pfad, teile):
+        eltern, name = knoten(pfad, erzeugen=request.method != "GET")
+        mit_etag = request.headers.get("X-Firebase-ETag") == "true"
+        if request.method == "GET":
+            wert = eltern.get(name) if eltern is not None else None
+            return antwort_bauen(wert, headers={"ETag": etag(wert)} if mit_etag else None)
+        if request.method == "PUT" and request.headers.get("if-match"):
+            # Compare-and-set: 412 mit aktuellem Wert und ETag, wenn sich der Knoten geändert hat
+            aktuell = eltern.get(name)
+            if request.headers["if-match"] != etag(aktuell):
+                return antwort_bauen(aktuell, 412, headers={"ETag": etag(aktuell)})
+        if request.method == "DELETE":
+            eltern.pop(name, None)
+            benachrichtigen(teile, "put", None)
+            return antwort_bauen(None)
+        daten = request.get_json(silent=True)
+        if request.method == "PUT":
+            eltern[name] = daten
+            benachrichtigen(teile, "put", daten)
+            if mit_etag:
+                return antwort_bauen(daten, headers={"ETag": etag(daten)})
+        elif request.method == "POST":
+            schluessel = "-" + uuid.uuid4().hex[:19]
+            eltern.setdefault(name, {})[schluessel] = daten
+            benachrichtigen(teile + [schluessel], "put", daten)
+            return antwort_bauen({"name": schluessel})
+        else:  # PATCH: Multi-Path-Update relativ zum Pfad
+            ziel = eltern.setdefault(name, {})
+            for unterpfad, wert in (daten or {}).items():
+                unter_eltern, unter_name = knoten(f"{pfad}/{unterpfad}", erzeugen=True)
+                if wert is None:
+                    unter_eltern.pop(unter_name, None)
+                else:
+                    unter_eltern[unter_name] = wert
+            benachrichtigen(teile, "patch", daten)
+            return antwort_bauen(ziel)
+        return antwort_bauen(daten)
+
+    return app
+
+
+def mock_starten(port, latenz_ms, jitter_ms):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, mock_app(latenz_ms, jitter_ms), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# === Alarme: Bots mit eigenem Zustand, damit BO/increase/close realistisch gemischt werden ===
+class Bot:
+
+    def __init__(self, nummer, konten):
+        self.botname = f"Last_Bot_{nummer}"
+        self.position_side = "SHORT" if nummer % 3 == 2 else "LONG"
+        self.symbol = f"LAST{nummer % 40}-USDT"
+        self.api_key = f"last-key-{nummer % konten}"
+        self.offen = False
+
+    def alarm(self, bar_zeit, anteil_close):
+        if not self.offen:
+            action = ""
+        elif random.random() < anteil_close:
+            action = "close"
+        else:
+            action = "increase"
+        self.offen = action != "close"
+        render = {
+            "api_key": self.api_key, "secret_key": "geheim", "symbol": self.symbol, "botname": self.botname,
+            "position_side": self.position_side, "sell_percentage": 2.5, "price": 100.0, "leverage": 1,
+            "FIREBASE_SECRET": "last", "alarm": 50, "pyramiding": 8, "sicherheit": 0, "usdt_factor": 1.4,
+            "bo_factor": 0.001, "after_h": 48, "after_so": 14, "sell_percentage2": 0.5, "sl": 10, "beenden": "nein",
+            "time": bar_zeit,
+        }
+        return action or "bo", {"vyn": {"action": action}, "RENDER": render}
+
+
+def ankunftszeiten(anzahl, muster, spreizung):
+    # Sekunden ab Burst-Beginn
+    if muster == "gleichzeitig" or spreizung <= 0:
+        return [0.0] * anzahl
+    if muster == "gestaffelt":
+        return [i * spreizung / anzahl for i in range(anzahl)]
+    zeiten, t = [], 0.0  # poisson
+    for _ in range(anzahl):
+        t += random.expovariate(anzahl / spreizung)
+        zeiten.append(t)
+    return zeiten
+
+
+def perzentil(werte, p):
+    if not werte:
+        return None
+    werte = sorted(werte)
+    return werte[min(int(len(werte) * p / 100), len(werte) - 1)]
+
+
+def burst(ziel, bots, muster, spreizung, anteil_close, timeout):
+    bar_zeit = datetime.now(timezone.utc).isoformat()
+    alarme = [bot.alarm(bar_zeit, anteil_close) for bot in bots]
+    zeiten = ankunftszeiten(len(alarme), muster, spreizung)
+    start = time.perf_counter()
+
+    def senden(i):
+        verzoegerung = start + zeiten[i] - time.perf_counter()
+        if verzoegerung > 0:
+            time.sleep(verzoegerung)
+        gesendet = time.perf_counter()
+        try:
+            r = requests.post(ziel + "/webhook?kompakt=1", json=alarme[i][1], timeout=timeout)
+            status = r.status_code
+        except requests.RequestException:
+            status = None
+        # Abschlusszeit ab Kerzenschluss (Burst-Beginn) und reine Antwortzeit
+        return alarme[i][0], status, time.perf_counter() - start, time.perf_counter() - gesendet
+
+    with ThreadPoolExecutor(max_workers=len(alarme)) as pool:
+        return list(pool.map(senden, range(len(alarme))))
+
+
+def auswerten(groesse, ergebnisse):
+    fertig = [e[2] for e in ergebnisse]
+    fehler = sum(1 for e in ergebnisse if e[1] is None or e[1] >= 500)
+    arten = {}
+    for art, *_ in ergebnisse:
+        arten[art] = arten.get(art, 0) + 1
+    return {
+        "groesse": groesse, "fehler": fehler, "arten": arten,
+        "p50": perzentil(fertig, 50), "p90": perzentil(fertig, 90), "p99": perzentil(fertig, 99), "max": max(fertig),
+        "antwort_p50": perzentil([e[3] for e in ergebnisse], 50),
+    }
+
+
+def server_starten(port, mock_port, umgebung):
+    # Abschlusszeiten messen: auf das Ergebnis warten statt 202 bei vollem Alarm-Pool (per umgebung überschreibbar)
+    env = dict(os.environ, BINGX_BASE_URL=f"http://127.0.0.1:{mock_port}", FIREBASE_URL=f"http://127.0.0.1:{mock_port}",
+               FIREBASE_SECRET="last", PORT=str(port), HTTP_RETRIES="0", RECONCILE_INTERVALL="0",
+               ALARM_START_WARTEN="300", ALARM_ANTWORT_WARTEN="300")
+    env.update(umgebung)
+    verzeichnis = os.path.dirname(os.path.abspath(__file__))
+    prozess = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "main:app"],
+                               cwd=verzeichnis, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return prozess
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    prozess.terminate()
+    raise RuntimeError("Server nicht bereit")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alarm-Bursts wie beim Kerzenschluss")
+    parser.add_argument("--ziel", default="http://127.0.0.1:5000")
+    parser.add_argument("--server", action="store_true", help="gunicorn selbst starten (Port --port)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--nur-mock", action="store_true")
+    parser.add_argument("--latenz", type=float, default=50, help="ms pro Mock-Antwort")
+    parser.add_argument("--jitter", type=float, default=20)
+    parser.add_argument("--bots", type=int, default=60)
+    parser.add_argument("--konten", type=int, default=4)
+    parser.add_argument("--groessen", default="5,10,20,40,60", help="Burst-Größen, aufsteigend")
+    parser.add_argument("--wiederholungen", type=int, default=2, help="Bursts pro Größe")
+    parser.add_argument("--muster", choices=("gleichzeitig", "gestaffelt", "poisson"), default="gleichzeitig")
+    parser.add_argument("--spreizung", type=float, default=1.0, help="Sekunden, über die ein Burst verteilt ankommt")
+    parser.add_argument("--close-anteil", type=float, default=0.15)
+    parser.add_argument("--pause", type=float, default=2.0, help="Sekunden zwischen Bursts")
+    parser.add_argument("--grenze", type=float, default=10.0, help="p99 in Sekunden, ab der die Latenz als eingebrochen gilt")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--env", action="append", default=[], help="NAME=WERT für den gestarteten Server, z.B. SHARDS=4")
+    args = parser.parse_args()
+
+    mock = mock_starten(args.mock_port, args.latenz, args.jitter)
+    print(f"Mock BingX/Firebase auf http://127.0.0.1:{args.mock_port} (Latenz {args.latenz}±{args.jitter} ms)")
+    if args.nur_mock:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    prozess = None
+    if args.server:
+        prozess = server_starten(args.port, args.mock_port, dict(e.split("=", 1) for e in args.env))
+        args.ziel = f"http://127.0.0.1:{args.port}"
+    try:
+        bots = [Bot(i, args.konten) for i in range(args.bots)]
+        print(f"{'Burst':>6} {'Fehler':>6} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7}  Arten")
+        einbruch = None
+        for groesse in [int(g) for g in args.groessen.split(",")]:
+            for _ in range(args.wiederholungen):
+                teilnehmer = random.sample(bots, min(groesse, len(bots)))
+                r = auswerten(groesse, burst(args.ziel, teilnehmer, args.muster, args.spreizung, args.close_anteil, args.timeout))
+                print(f"{groesse:>6} {r['fehler']:>6} {r['p50']:>6.2f}s {r['p90']:>6.2f}s {r['p99']:>6.2f}s {r['max']:>6.2f}s  {r['arten']}")
+                if einbruch is None and (r["p99"] > args.grenze or r["fehler"] > 0.01 * groesse):
+                    einbruch = r
+                time.sleep(args.pause)
+        if einbruch:
+            print(f"Einbruch ab Burst-Größe {einbruch['groesse']}: p99 {einbruch['p99']:.2f}s, Fehler {einbruch['fehler']} (Grenze {args.grenze}s)")
+        else:
+            print(f"Kein Einbruch bis Burst-Größe {args.groessen.split(',')[-1]} (Grenze p99 {args.grenze}s)")
+    finally:
+        if prozess is not None:
+            prozess.terminate()
+            prozess.wait(30)
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
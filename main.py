@@ -18,9 +18,15 @@
 #vyn Alarm kann benutzt werden (inkl. close-Signal) und dann folgende Alarmnachricht
 #Wenn Position auf BINGX schon gelöscht wurde und bei Traidingview noch nicht, wird der nächste increase-Befehl ignoriert
 #Nach x Stunden seit BO oder nach x SO wird die Sell-Limit-Order auf x % gesetzt
+#Beim Start wird der Zustand aller Bots aus Firebase geladen (Umgebungsvariable FIREBASE_SECRET)
+#Kaufpreise werden regelmäßig in kaufpreise/<botname>/snapshot verdichtet (Summe, gewichteter Preis, Anzahl), neue Käufe kommen als Deltas dazu
+#ordergroesse, base_order_time und kaufpreise werden per Firebase-Stream im Speicher gespiegelt, Lesezugriffe brauchen dann keinen GET (FIREBASE_STREAM=0 schaltet ab, FIREBASE_STREAM_NUR_REGISTRY=1 spiegelt nur Registry-Bots)
 
 #https://......../webhook
 # action wird vom vyn genommen
+# Mit Bot-Registry (Umgebungsvariable BOT_REGISTRY_DATEI, JSON {"Baby_Bot": {RENDER-Felder, "webhook_token": "..."}}) reicht im Alarm:
+#{"vyn":{{strategy.order.alert_message}}, "RENDER": {"botname": "Baby_Bot", "token": "...", "price": {{close}}}}
+# In der Registry-Datei kann jeder Wert "env:NAME" sein (aus der Umgebungsvariable NAME), im Alarm nicht
 
 #{"vyn":{{strategy.order.alert_message}}, RENDER": {"api_key": {
 #    "api_key": "",
@@ -43,63 +49,712 @@
 #    "sell_percentage2": 0.5,
 #    "sl": 10, Stop Loss bei x Prozent setzen
 #    "beenden": "nein" wenn ja, wird keine neue Position nach dem Schliessen der aktuellen Position geöffnet
+#    "so_abstand": 2, optional, Preisabstand der SO in Prozent; nur für die Projektion von Durchschnitts- und Liquidationspreis (/bots/<botname>/ladder)
+#    "time": {{time}}, optional, Bar-Zeit; damit werden doppelt zugestellte Alarme nur einmal ausgeführt (alternativ "alert_id")
+#    "antwort": "kompakt" optional, Antwort nur mit dem Ergebnis dieses Bots ohne Logs (oder ?kompakt=1, Logs mit ?logs=1)
 #    }}
 
 
 
 #}}
 
+#Profil eines Alarms (mit PROFIL_VERZEICHNIS): Stichprobe mit PROFIL_RATE, oder gezielt mit PROFIL_TOKEN: Header "X-Profil: 1" oder ?profil=1
+#(Sampling, .folded + .speedscope.json), "X-Profil: cprofile" für .pstats, jeweils nur mit Header "X-Profil-Token: <PROFIL_TOKEN>"
+
 
 
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from datetime import datetime, timezone
 import time
 import hmac
 import hashlib
 import requests
 import os
+import threading
+import multiprocessing
+import signal
+import sys
+import random
+import uuid
+import json
+import copy
+import sqlite3
+import cProfile
+import heapq
+import itertools
+import weakref
+from contextlib import ExitStack, nullcontext
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+
+try:
+    import orjson  # optional, deutlich schneller als json
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np  # optional, nur für das Trade-Journal
+except ImportError:
+    np = None
+
+# === Request-Logs: Ereignisse speichern, Text erst bei Bedarf erzeugen ===
+MAX_LOG_EINTRAEGE = int(os.environ.get("MAX_LOG_EINTRAEGE", "200"))  # pro Request
+BOT_LOG_PUFFER = int(os.environ.get("BOT_LOG_PUFFER", "20"))  # letzte Requests pro Bot für /debug/logs
+BOT_LOG_BOTS = int(os.environ.get("BOT_LOG_BOTS", "1000"))  # so viele Bots behalten ihren Puffer, danach fällt der älteste raus
+DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN", "")  # nötig für /debug/logs (Header X-Debug-Token), leer = gesperrt
+ANTWORT_MODUS = os.environ.get("ANTWORT_MODUS", "voll")  # "voll" oder "kompakt"
+
+class RequestLog:
+    """
+    Log eines Requests mit Obergrenze. ereignis(text, daten) speichert die Rohdaten (z.B. API-Antworten)
+    und formatiert sie erst, wenn die Logs wirklich ausgegeben werden.
+    """
+    __slots__ = ("eintraege", "verworfen")
+
+    def __init__(self):
+        self.eintraege = []
+        self.verworfen = 0
+
+    def append(self, eintrag):
+        if len(self.eintraege) < MAX_LOG_EINTRAEGE:
+            self.eintraege.append(eintrag)
+        else:
+            self.verworfen += 1
+
+    def ereignis(self, text, daten):
+        self.append((text, daten))
+
+    def extend(self, eintraege):
+        for eintrag in eintraege:
+            self.append(eintrag)
+
+    @staticmethod
+    def _formatieren(eintrag):
+        if isinstance(eintrag, tuple):
+            return f"{eintrag[0]}: {eintrag[1]}"
+        return eintrag if isinstance(eintrag, str) else str(eintrag)
+
+    def render(self):
+        zeilen = [self._formatieren(e) for e in self.eintraege]
+        if self.verworfen:
+            zeilen.append(f"... {self.verworfen} weitere Log-Einträge verworfen (MAX_LOG_EINTRAEGE={MAX_LOG_EINTRAEGE})")
+        return zeilen
+
+    def __getitem__(self, index):
+        return self._formatieren(self.eintraege[index])
+
+    def __iter__(self):
+        return (self._formatieren(e) for e in self.eintraege)
+
+    def __len__(self):
+        return len(self.eintraege)
+
+    def __repr__(self):
+        return repr(self.render())
+
+def _json_default(obj):
+    if isinstance(obj, RequestLog):
+        return obj.render()
+    return str(obj)
+
+# === JSON: orjson falls installiert, sonst Standardbibliothek ===
+if orjson is not None:
+    _ORJSON_OPTIONEN = orjson.OPT_NON_STR_KEYS
+
+    def json_dumps(obj):
+        return orjson.dumps(obj, default=_json_default, option=_ORJSON_OPTIONEN)
+
+    def json_loads(daten):
+        return orjson.loads(daten)
+else:
+    def json_dumps(obj):
+        return json.dumps(obj, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+    def json_loads(daten):
+        return json.loads(daten)
+
+def antwort_json(response):
+    # ersetzt response.json() von requests
+    daten = json_loads(response.content)
+    if isinstance(daten, dict) and daten.get("code") not in (0, None) and "timestamp" in str(daten.get("msg", "")).lower():
+        zeit_fehler_melden(daten)
+    return daten
+
+class SchnellerJSONProvider(DefaultJSONProvider):
+    """Flask-Provider für Request-Parsing und Antworten über json_dumps/json_loads."""
+
+    def dumps(self, obj, **kwargs):
+        return json_dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return json_loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_dumps(obj), mimetype=self.mimetype)
 
 app = Flask(__name__)
+app.json = SchnellerJSONProvider(app)
 
-BASE_URL = "https://open-api.bingx.com"
+BASE_URL = os.environ.get("BINGX_BASE_URL", "https://open-api.bingx.com")
 BALANCE_ENDPOINT = "/openApi/swap/v2/user/balance"
 ORDER_ENDPOINT = "/openApi/swap/v2/trade/order"
 PRICE_ENDPOINT = "/openApi/swap/v2/quote/price"
 OPEN_ORDERS_ENDPOINT = "/openApi/swap/v2/trade/openOrders"
+ALL_ORDERS_ENDPOINT = "/openApi/swap/v2/trade/allOrders"
 FIREBASE_URL = os.environ.get("FIREBASE_URL", "")
 
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN", "")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
 
-saved_usdt_amounts = {}  # globales Dict für alle Coins
-status_fuer_alle = {} 
-alarm_counter = {}
-base_order_times = {}
+# === Bot-Zustand: ein kompakter Datensatz pro Bot, begrenzt (LRU + TTL) ===
+BOT_ZUSTAND_MAX = int(os.environ.get("BOT_ZUSTAND_MAX", "5000"))  # max. Bots im Speicher
+BOT_ZUSTAND_TTL = float(os.environ.get("BOT_ZUSTAND_TTL", str(14 * 24 * 3600)))  # Sekunden ohne Zugriff bis zur Verdrängung
+
+class BotZustand:
+    __slots__ = ("ordergroesse", "status", "alarm_counter", "base_order_time", "zuletzt")
+
+    def __init__(self):
+        self.ordergroesse = self.status = self.alarm_counter = self.base_order_time = None
+        self.zuletzt = time.monotonic()
+
+    def leer(self):
+        return self.ordergroesse is None and self.status is None and self.alarm_counter is None and self.base_order_time is None
+
+class BotZustandSpeicher:
+    """
+    LRU-geordnete Datensätze (ältester Zugriff zuerst). Über max_anzahl oder nach ttl ohne Zugriff
+    wird verdrängt; verdrängte Bots werden gemerkt und beim nächsten Alarm aus Firebase nachgeladen.
+    verdraengen_abonnenten: Funktionen(botname), die ihre eigenen Maps des Bots mit aufräumen; sie laufen
+    nach dem Verdrängen außerhalb des Locks und dürfen nur kurz ihre eigenen Locks nehmen.
+    """
+
+    def __init__(self, max_anzahl, ttl):
+        self.max_anzahl = max_anzahl
+        self.ttl = ttl
+        self._daten = OrderedDict()
+        self._verdraengt = OrderedDict()  # botname -> None, begrenzt auf 4 * max_anzahl
+        self._lock = threading.RLock()
+        self.statistik = {"verdraengt_lru": 0, "verdraengt_ttl": 0, "rehydriert": 0}
+        self.verdraengen_abonnenten = []
+        self._zu_melden = []
+
+    def lesen(self, botname):
+        with self._lock:
+            zustand = self._daten.get(botname)
+            if zustand is not None:
+                zustand.zuletzt = time.monotonic()
+                self._daten.move_to_end(botname)
+            return zustand
+
+    def schreiben(self, botname):
+        with self._lock:
+            zustand = self.lesen(botname)
+            if zustand is None:
+                zustand = self._daten[botname] = BotZustand()
+                self._verdraengt.pop(botname, None)
+                self._aufraeumen()
+        self._verdraengte_melden()
+        return zustand
+
+    def _verdraengte_melden(self):
+        with self._lock:
+            namen, self._zu_melden = self._zu_melden, []
+        for name in namen:
+            for abonnent in self.verdraengen_abonnenten:
+                try:
+                    abonnent(name)
+                except Exception as e:
+                    print(f"[Fehler] Aufräumen nach Verdrängen von {name}: {e}")
+
+    def entfernen_falls_leer(self, botname):
+        with self._lock:
+            zustand = self._daten.get(botname)
+            if zustand is not None and zustand.leer():
+                del self._daten[botname]
+
+    def namen(self, feld):
+        with self._lock:
+            return [name for name, zustand in self._daten.items() if getattr(zustand, feld) is not None]
+
+    def _aufraeumen(self):
+        # Aufruf nur mit _lock; ältester Eintrag steht vorne, daher amortisiert O(1)
+        grenze = time.monotonic() - self.ttl
+        while self._daten:
+            name, zustand = next(iter(self._daten.items()))
+            if zustand.zuletzt < grenze:
+                self.statistik["verdraengt_ttl"] += 1
+            elif len(self._daten) > self.max_anzahl:
+                self.statistik["verdraengt_lru"] += 1
+            else:
+                break
+            del self._daten[name]
+            self._verdraengt[name] = None
+            self._zu_melden.append(name)
+            if len(self._verdraengt) > 4 * self.max_anzahl:
+                self._verdraengt.popitem(last=False)
+
+    def verdraengt(self, botname):
+        return botname in self._verdraengt
+
+    def rehydrieren(self, botname, firebase_secret=None):
+        """Lädt Ordergröße, Base-Order-Zeit und Anzahl Käufe eines verdrängten Bots aus Firebase."""
+        firebase_secret = firebase_secret or FIREBASE_SECRET
+        if not self.verdraengt(botname) or not FIREBASE_URL or not firebase_secret:
+            return False
+        betrag = firebase_lese_ordergroesse(botname, firebase_secret)
+        zeit = _iso_zeit_parsen(firebase_lese_base_order_time(botname, firebase_secret))
+        kaeufe = firebase_lese_kaufpreise(botname, firebase_secret)
+        with self._lock:
+            zustand = self.schreiben(botname)
+            if betrag and zustand.ordergroesse is None:
+                zustand.ordergroesse = betrag
+            if zeit and zustand.base_order_time is None:
+                zustand.base_order_time = zeit
+            if kaeufe and zustand.alarm_counter is None:
+                zustand.alarm_counter = anzahl_kaeufe(kaeufe) - 1
+                zustand.status = zustand.status or "OK"
+            self.entfernen_falls_leer(botname)
+            self.statistik["rehydriert"] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            anzahl = len(self._daten)
+            aufraeumen = self._daten and next(iter(self._daten.values())).zuletzt < time.monotonic() - self.ttl
+            if aufraeumen:
+                self._aufraeumen()
+                anzahl = len(self._daten)
+            # Schätzung: Datensatz + Dict-Eintrag + Schlüssel
+            groesse = anzahl * (sys.getsizeof(BotZustand()) + 100) + sum(sys.getsizeof(name) for name in self._daten)
+            ergebnis = dict(self.statistik, anzahl=anzahl, max=self.max_anzahl, ttl_s=self.ttl,
+                            verdraengt_gemerkt=len(self._verdraengt), bytes_geschaetzt=groesse)
+        self._verdraengte_melden()
+        return ergebnis
+
+class ZustandFeld(MutableMapping):
+    """Dict-Sicht auf ein Feld aller Bot-Datensätze, damit der bestehende Code unverändert bleibt."""
+
+    def __init__(self, speicher, feld):
+        self._speicher = speicher
+        self._feld = feld
+
+    def __getitem__(self, botname):
+        zustand = self._speicher.lesen(botname)
+        wert = getattr(zustand, self._feld) if zustand is not None else None
+        if wert is None:
+            raise KeyError(botname)
+        return wert
+
+    def __setitem__(self, botname, wert):
+        setattr(self._speicher.schreiben(botname), self._feld, wert)
+
+    def __delitem__(self, botname):
+        zustand = self._speicher.lesen(botname)
+        if zustand is None or getattr(zustand, self._feld) is None:
+            raise KeyError(botname)
+        setattr(zustand, self._feld, None)
+        self._speicher.entfernen_falls_leer(botname)
+
+    def __contains__(self, botname):
+        zustand = self._speicher._daten.get(botname)
+        return zustand is not None and getattr(zustand, self._feld) is not None
+
+    def __iter__(self):
+        return iter(self._speicher.namen(self._feld))
+
+    def __len__(self):
+        return len(self._speicher.namen(self._feld))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+bot_zustaende = BotZustandSpeicher(BOT_ZUSTAND_MAX, BOT_ZUSTAND_TTL)
+saved_usdt_amounts = ZustandFeld(bot_zustaende, "ordergroesse")  # Ordergröße pro Bot
+status_fuer_alle = ZustandFeld(bot_zustaende, "status")
+alarm_counter = ZustandFeld(bot_zustaende, "alarm_counter")
+base_order_times = ZustandFeld(bot_zustaende, "base_order_time")
+letzte_preise = {}  # symbol -> letzter bekannter Preis (Preisabfragen, Positionen), für unrealisierten PnL
+bot_positionen = {}  # botname -> {"symbol", "position_side", "api_key", "secret_key", "firebase_secret", "zeit"} für kontoweite Aktionen
+
+def _bot_position_vergessen(botname):
+    # der Konto-Snapshot geht mit, wenn kein anderer Bot im Speicher das Konto benutzt
+    eintrag = bot_positionen.pop(botname, None)
+    api_key = (eintrag or {}).get("api_key")
+    if api_key and not any(info.get("api_key") == api_key for info in list(bot_positionen.values())):
+        konto_snapshots.pop(api_key, None)
+
+bot_zustaende.verdraengen_abonnenten.append(_bot_position_vergessen)
+
+FLATTEN_MAX_WORKERS = int(os.environ.get("FLATTEN_MAX_WORKERS", "8"))
+SNAPSHOT_MAX_ALTER = float(os.environ.get("SNAPSHOT_MAX_ALTER", "2"))  # Sekunden, wie lange ein Konto-Snapshot gültig ist
+IDEMPOTENZ_TTL = float(os.environ.get("IDEMPOTENZ_TTL", "300"))  # Sekunden, wie lange ein Alarm als Duplikat erkannt wird
+IDEMPOTENZ_MAX = int(os.environ.get("IDEMPOTENZ_MAX", "10000"))
+IDEMPOTENZ_DB = os.environ.get("IDEMPOTENZ_DB", "")  # optional: SQLite-Datei, damit Duplikate auch nach Neustart erkannt werden
+BOT_REGISTRY_DATEI = os.environ.get("BOT_REGISTRY_DATEI", "")  # optional: JSON-Datei mit allen Bot-Konfigurationen
+
+# === HTTP: Timeouts, Retries mit Jitter und Circuit Breaker pro Abhängigkeit ===
+def _timeout_aus_env(name, default):
+    connect, read = os.environ.get(name, default).split(",")
+    return float(connect), float(read)
+
+HTTP_TIMEOUTS = {  # (connect, read) in Sekunden
+    "bingx": _timeout_aus_env("BINGX_TIMEOUT", "3,10"),
+    "firebase": _timeout_aus_env("FIREBASE_TIMEOUT", "3,5"),
+    "telegram": _timeout_aus_env("TELEGRAM_TIMEOUT", "3,10"),
+    "sonstige": (3.0, 10.0),
+}
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))  # zusätzliche Versuche, nur für idempotente Anfragen
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.2"))  # Sekunden, Basis für exponentiellen Backoff
+CB_FEHLER_SCHWELLE = int(os.environ.get("CB_FEHLER_SCHWELLE", "5"))  # Fehler in Folge bis der Circuit öffnet
+CB_PAUSE = float(os.environ.get("CB_PAUSE", "30"))  # Sekunden, bis wieder ein Probe-Request erlaubt ist
+RECV_WINDOW = int(os.environ.get("RECV_WINDOW", "5000"))  # ms, wie lange BingX einen signierten Request akzeptiert
+ZEIT_SYNC_INTERVALL = float(os.environ.get("ZEIT_SYNC_INTERVALL", "60"))  # Sekunden zwischen Messungen der BingX-Serverzeit
+RECONCILE_INTERVALL = float(os.environ.get("RECONCILE_INTERVALL", "60"))  # Sekunden zwischen Abgleichen mit BingX, 0 = aus
+RECONCILE_KARENZ = float(os.environ.get("RECONCILE_KARENZ", "30"))  # Sekunden nach einem Alarm, in denen ein Bot nicht abgeglichen wird
+RECONCILE_TELEGRAM = os.environ.get("RECONCILE_TELEGRAM", "1") == "1"
+JOURNAL_VERZEICHNIS = os.environ.get("JOURNAL_VERZEICHNIS", "")  # optional: Ordner für das Trade-Journal (braucht numpy)
+JOURNAL_FLUSH_INTERVALL = float(os.environ.get("JOURNAL_FLUSH_INTERVALL", "5"))  # Sekunden zwischen Segmenten
+JOURNAL_SEGMENT_ZEILEN = int(os.environ.get("JOURNAL_SEGMENT_ZEILEN", "50000"))  # Puffer voll -> sofort schreiben
+TAKER_GEBUEHR = float(os.environ.get("TAKER_GEBUEHR", "0.0005"))  # geschätzte Gebühr Market-Orders (Anteil vom Volumen)
+MAKER_GEBUEHR = float(os.environ.get("MAKER_GEBUEHR", "0.0002"))  # geschätzte Gebühr Limit-Orders (TP)
+LADDER_PRUEFUNG = os.environ.get("LADDER_PRUEFUNG", "warnen")  # Order größer als freie Margin: "warnen", "ablehnen" oder "aus"
+FIREBASE_STREAM = os.environ.get("FIREBASE_STREAM", "1") == "1"  # Firebase-Bäume per Stream spiegeln und Lesezugriffe aus dem Speicher bedienen
+FIREBASE_STREAM_NUR_REGISTRY = os.environ.get("FIREBASE_STREAM_NUR_REGISTRY", "0") == "1"  # nur Registry-Bots spiegeln, andere per GET
+FIREBASE_CAS_VERSUCHE = int(os.environ.get("FIREBASE_CAS_VERSUCHE", "5"))  # bedingte Schreibversuche der Ordergröße bei Konflikten
+KAUFPREISE_KOMPAKT_INTERVALL = float(os.environ.get("KAUFPREISE_KOMPAKT_INTERVALL", "300"))  # Sekunden zwischen Kompaktierungen, 0 = aus
+KAUFPREISE_KOMPAKT_AB = int(os.environ.get("KAUFPREISE_KOMPAKT_AB", "4"))  # so viele Deltas pro Bot, bevor gefaltet wird
+FIREBASE_STREAM_TIMEOUT = float(os.environ.get("FIREBASE_STREAM_TIMEOUT", "90"))  # Sekunden ohne Daten (Firebase sendet alle 30s keep-alive)
+PROFIL_VERZEICHNIS = os.environ.get("PROFIL_VERZEICHNIS", "")  # optional: Ordner für Profile einzelner Alarme, leer = aus
+PROFIL_RATE = float(os.environ.get("PROFIL_RATE", "0"))  # Anteil der Alarme, die ohne Header/Parameter profiliert werden
+PROFIL_TOKEN = os.environ.get("PROFIL_TOKEN", "")  # nötig für X-Profil/?profil=; leer = nur Stichproben mit PROFIL_RATE
+PROFIL_INTERVALL = float(os.environ.get("PROFIL_INTERVALL", "0.005"))  # Sekunden zwischen zwei Stichproben
+PROFIL_MAX_DATEIEN = int(os.environ.get("PROFIL_MAX_DATEIEN", "200"))
+PROFIL_MAX_ALTER = float(os.environ.get("PROFIL_MAX_ALTER", str(7 * 24 * 3600)))  # Sekunden
+HEDGING = os.environ.get("HEDGING", "0") == "1"  # zweite Anfrage für Preis/Positionen/Open Orders, wenn die erste zu lange dauert
+HEDGE_MIN_MESSUNGEN = int(os.environ.get("HEDGE_MIN_MESSUNGEN", "20"))  # erst ab so vielen Messungen ist das p90 brauchbar
+HEDGE_MIN_VERZOEGERUNG = float(os.environ.get("HEDGE_MIN_VERZOEGERUNG", "0.05"))  # Sekunden
+
+class AbhaengigkeitNichtVerfuegbar(Exception):
+    pass
+
+class CircuitBreaker:
+    """Offen nach CB_FEHLER_SCHWELLE Fehlern in Folge; nach CB_PAUSE darf ein Probe-Request durch (halb offen)."""
+    __slots__ = ("name", "fehler_in_folge", "offen_bis", "probe_laeuft", "lock", "geoeffnet_anzahl", "abgelehnt")
+
+    def __init__(self, name):
+        self.name = name
+        self.fehler_in_folge = 0
+        self.offen_bis = 0.0
+        self.probe_laeuft = False
+        self.lock = threading.Lock()
+        self.geoeffnet_anzahl = 0
+        self.abgelehnt = 0
+
+    def offen(self):
+        return self.fehler_in_folge >= CB_FEHLER_SCHWELLE and time.monotonic() < self.offen_bis
+
+    def erlauben(self):
+        with self.lock:
+            if self.fehler_in_folge < CB_FEHLER_SCHWELLE:
+                return True
+            if time.monotonic() >= self.offen_bis and not self.probe_laeuft:
+                self.probe_laeuft = True
+                return True
+            self.abgelehnt += 1
+            return False
+
+    def erfolg(self):
+        with self.lock:
+            self.fehler_in_folge = 0
+            self.probe_laeuft = False
+
+    def fehler(self):
+        with self.lock:
+            self.fehler_in_folge += 1
+            self.probe_laeuft = False
+            if self.fehler_in_folge >= CB_FEHLER_SCHWELLE:
+                if time.monotonic() >= self.offen_bis:
+                    self.geoeffnet_anzahl += 1
+                self.offen_bis = time.monotonic() + CB_PAUSE
+
+    def status(self):
+        return {
+            "offen": self.offen(),
+            "fehler_in_folge": self.fehler_in_folge,
+            "geoeffnet_anzahl": self.geoeffnet_anzahl,
+            "abgelehnt": self.abgelehnt,
+        }
+
+circuit_breaker = {name: CircuitBreaker(name) for name in HTTP_TIMEOUTS}
+_http_session = requests.Session()
+_http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=50))
+
+def _abhaengigkeit(url):
+    if url.startswith(BASE_URL):
+        return "bingx"
+    if FIREBASE_URL and url.startswith(FIREBASE_URL):
+        return "firebase"
+    if url.startswith("https://api.telegram.org"):
+        return "telegram"
+    return "sonstige"
+
+def abhaengigkeit_verfuegbar(name):
+    return not circuit_breaker[name].offen()
+
+def neue_client_order_id():
+    # macht Order-POSTs wiederholbar: BingX lehnt eine zweite Order mit gleicher ID ab
+    return f"mb{uuid.uuid4().hex[:30]}"
+
+def http_anfrage(methode, url, idempotent=None, hedge=None, **kwargs):
+    """
+    Ersetzt requests.get/post/put/delete. Setzt Timeouts pro Abhängigkeit, wiederholt idempotente
+    Anfragen (GET, Firebase PUT/DELETE) mit Jitter-Backoff und wirft AbhaengigkeitNichtVerfuegbar
+    sofort, solange der Circuit der Abhängigkeit offen ist. Order-POSTs laufen über order_posten.
+    hedge: Endpoint-Name für Hedging (nur GET, nur mit HEDGING=1)
+    """
+    if hedge and HEDGING and methode == "GET":
+        return _hedged_anfrage(hedge, methode, url, idempotent, kwargs)
+    return _http_anfrage_einzeln(methode, url, idempotent, **kwargs)
+
+def _http_anfrage_einzeln(methode, url, idempotent=None, **kwargs):
+    name = _abhaengigkeit(url)
+    breaker = circuit_breaker[name]
+    kwargs.setdefault("timeout", HTTP_TIMEOUTS[name])
+    if idempotent is None:
+        idempotent = methode == "GET" or (name == "firebase" and methode in ("PUT", "DELETE"))
+    versuche = 1 + (HTTP_RETRIES if idempotent else 0)
+
+    for versuch in range(versuche):
+        if not breaker.erlauben():
+            raise AbhaengigkeitNichtVerfuegbar(f"{name} nicht verfügbar (Circuit offen)")
+        try:
+            response = _http_session.request(methode, url, **kwargs)
+        except requests.RequestException:
+            breaker.fehler()
+            if versuch + 1 >= versuche:
+                raise
+        else:
+            if response.status_code < 500:
+                breaker.erfolg()
+                return response
+            breaker.fehler()
+            if versuch + 1 >= versuche:
+                return response
+        # Full Jitter: zufällige Wartezeit bis zur exponentiellen Obergrenze
+        time.sleep(random.uniform(0, HTTP_BACKOFF * (2 ** versuch)))
+
+def _order_nach_client_id(url, headers, symbol, client_order_id, secret_key):
+    """
+    Fragt eine Order per clientOrderID ab. Rückgabe: Response (Order existiert),
+    False (BingX kennt die ID nicht, erneutes Senden ist sicher) oder None (Abfrage selbst gescheitert).
+    """
+    params = {"symbol": symbol, "clientOrderId": client_order_id, "timestamp": bingx_timestamp(), "recvWindow": RECV_WINDOW}
+    query_string = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    params["signature"] = generate_signature(secret_key, query_string)
+    try:
+        response = http_anfrage("GET", url, headers=headers, params=params)
+        data = antwort_json(response)
+    except Exception as e:
+        print(f"[Fehler] Order {client_order_id} nicht abfragbar: {e}")
+        return None
+    if response.status_code >= 500:
+        return None
+    if data.get("code") == 0 and ((data.get("data") or {}).get("order") or {}).get("orderId"):
+        return response
+    return False
+
+def order_posten(url, headers, params, secret_key):
+    """
+    Sendet eine Order mit clientOrderID. Nach einem mehrdeutigen Fehlschlag (Timeout, Verbindungsabbruch, 5xx)
+    ist unklar, ob BingX die Order angenommen hat. Ein blindes zweites POST würde dann wegen der doppelten ID
+    abgelehnt; deshalb wird die Order zuerst per clientOrderID abgefragt und nur neu gesendet, wenn BingX sie nicht kennt.
+    Ist auch die Abfrage nicht möglich, bleibt es beim ursprünglichen Fehler.
+    """
+    fehler = response = None
+    for versuch in range(1 + HTTP_RETRIES):
+        if versuch:
+            time.sleep(random.uniform(0, HTTP_BACKOFF * (2 ** (versuch - 1))))
+        try:
+            response = http_anfrage("POST", url, idempotent=False, headers=headers, json=params)
+        except AbhaengigkeitNichtVerfuegbar:
+            raise
+        except requests.RequestException as e:
+            fehler, response = e, None
+        else:
+            if response.status_code < 500:
+                return response
+            fehler = None
+        vorhanden = _order_nach_client_id(url, headers, params["symbol"], params["clientOrderID"], secret_key)
+        if vorhanden:
+            return vorhanden
+        if vorhanden is None:
+            break
+    if fehler is not None:
+        raise fehler
+    return response
+
+# === Hedging: zweite Anfrage, wenn die erste länger als das p90 des Endpoints dauert ===
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("HEDGE_THREADS", "16")))
+_hedge_lock = threading.Lock()
+hedge_latenzen = {}  # endpoint -> deque der letzten Antwortzeiten (Sekunden)
+hedge_zaehler = {}  # endpoint -> {"anfragen", "hedges", "hedge_gewonnen"}
+
+def _hedge_verzoegerung(endpoint):
+    latenzen = hedge_latenzen.get(endpoint)
+    if not latenzen or len(latenzen) < HEDGE_MIN_MESSUNGEN:
+        return None
+    sortiert = sorted(latenzen)
+    return max(sortiert[int(len(sortiert) * 0.9) - 1], HEDGE_MIN_VERZOEGERUNG)
+
+def _latenz_merken(endpoint, dauer):
+    with _hedge_lock:
+        latenzen = hedge_latenzen.get(endpoint)
+        if latenzen is None:
+            latenzen = hedge_latenzen[endpoint] = deque(maxlen=200)
+        latenzen.append(dauer)
+
+def _gemessene_anfrage(endpoint, methode, url, idempotent, kwargs, start):
+    # start = Zeitpunkt der Übergabe: Wartezeit im Hedge-Pool zählt mit, denn gegen dieselbe Uhr läuft die Verzögerung
+    try:
+        return _http_anfrage_einzeln(methode, url, idempotent, **kwargs)
+    finally:
+        _latenz_merken(endpoint, time.perf_counter() - start)
+
+def _erfolgreich(future):
+    return future.exception() is None and future.result().status_code < 500
+
+def _hedged_anfrage(endpoint, methode, url, idempotent, kwargs):
+    with _hedge_lock:
+        zaehler = hedge_zaehler.setdefault(endpoint, {"anfragen": 0, "hedges": 0, "hedge_gewonnen": 0})
+        zaehler["anfragen"] += 1
+    verzoegerung = _hedge_verzoegerung(endpoint)
+    start = time.perf_counter()
+    if verzoegerung is None:
+        # noch zu wenig Messungen für ein p90: kein Hedge möglich, also direkt im aufrufenden Thread
+        return _gemessene_anfrage(endpoint, methode, url, idempotent, kwargs, start)
+    # Ein blockierter Socket lässt sich nicht verlassen: damit der Hedge gewinnen kann, wartet der Aufrufer
+    # auf beide Futures statt selbst in der ersten Anfrage zu stecken.
+    erster = _hedge_pool.submit(_gemessene_anfrage, endpoint, methode, url, idempotent, kwargs, start)
+    fertig, _ = wait([erster], timeout=verzoegerung)
+    if fertig:
+        return erster.result()
+
+    zweiter = _hedge_pool.submit(_gemessene_anfrage, endpoint, methode, url, idempotent, kwargs, time.perf_counter())
+    with _hedge_lock:
+        zaehler["hedges"] += 1
+    offen = {erster, zweiter}
+    while offen:
+        fertig, offen = wait(offen, return_when=FIRST_COMPLETED)
+        # sind beide zugleich fertig, gewinnt die erfolgreiche (zuerst die erste Anfrage)
+        for future in sorted(fertig, key=lambda f: (not _erfolgreich(f), f is zweiter)):
+            # eine fehlgeschlagene Anfrage gewinnt nur, wenn die andere auch fehlschlägt
+            if _erfolgreich(future) or not offen:
+                if future is zweiter and _erfolgreich(future):
+                    with _hedge_lock:
+                        zaehler["hedge_gewonnen"] += 1
+                return future.result()
+
+def hedge_statistik():
+    with _hedge_lock:
+        ergebnis = {}
+        for endpoint, zaehler in hedge_zaehler.items():
+            verzoegerung = _hedge_verzoegerung(endpoint)
+            ergebnis[endpoint] = dict(
+                zaehler,
+                hedge_rate=round(zaehler["hedges"] / zaehler["anfragen"], 4) if zaehler["anfragen"] else 0,
+                p90_ms=round(verzoegerung * 1000, 1) if verzoegerung is not None else None,
+            )
+        return {"aktiv": HEDGING, "endpoints": ergebnis}
+
+# === Zeit-Synchronisation mit BingX für signierte Requests ===
+SERVER_TIME_ENDPOINT = "/openApi/swap/v2/server/time"
+zeit_sync = {
+    "offset_ms": 0.0,  # BingX-Serverzeit minus lokale Zeit
+    "rtt_ms": None,
+    "letzte_sync": None,
+    "messungen": 0,
+    "fehler": 0,
+    "zeit_abgelehnt": 0,  # von BingX wegen timestamp/recvWindow abgelehnte Requests
+}
+_zeit_sync_jetzt = threading.Event()
+_zeit_sync_thread = None
+
+def bingx_timestamp():
+    # lokale Zeit korrigiert um den gemessenen Offset zur BingX-Serverzeit
+    return int(time.time() * 1000 + zeit_sync["offset_ms"])
+
+def zeit_synchronisieren(proben=3):
+    """
+    Misst den Offset zur BingX-Serverzeit. Von mehreren Proben zählt die mit der kleinsten RTT,
+    der Offset wird auf die Mitte der Anfrage bezogen.
+    """
+    beste = None
+    for _ in range(proben):
+        try:
+            t0 = time.time() * 1000
+            response = http_anfrage("GET", f"{BASE_URL}{SERVER_TIME_ENDPOINT}", idempotent=False)
+            t1 = time.time() * 1000
+            server_zeit = float(antwort_json(response)["data"]["serverTime"])
+        except Exception as e:
+            zeit_sync["fehler"] += 1
+            print(f"[Fehler] Zeit-Synchronisation: {e}")
+            continue
+        rtt = t1 - t0
+        if beste is None or rtt < beste[1]:
+            beste = (server_zeit - (t0 + t1) / 2, rtt)
+    if beste is not None:
+        zeit_sync["offset_ms"], zeit_sync["rtt_ms"] = round(beste[0], 1), round(beste[1], 1)
+        zeit_sync["letzte_sync"] = datetime.now(timezone.utc).isoformat()
+        zeit_sync["messungen"] += 1
+    return zeit_sync
+
+def zeit_fehler_melden(antwort):
+    zeit_sync["zeit_abgelehnt"] += 1
+    print(f"[Fehler] BingX hat Request wegen Zeit abgelehnt: {antwort}")
+    _zeit_sync_jetzt.set()  # sofort neu messen
+
+def _zeit_sync_schleife():
+    while True:
+        zeit_synchronisieren()
+        _zeit_sync_jetzt.wait(ZEIT_SYNC_INTERVALL)
+        _zeit_sync_jetzt.clear()
+
+def zeit_sync_starten():
+    global _zeit_sync_thread
+    if _zeit_sync_thread is None:
+        _zeit_sync_thread = threading.Thread(target=_zeit_sync_schleife, name="zeit-sync", daemon=True)
+        _zeit_sync_thread.start()
 
 def generate_signature(secret_key: str, params: str) -> str:
     return hmac.new(secret_key.encode('utf-8'), params.encode('utf-8'), hashlib.sha256).hexdigest()
 
 def get_futures_balance(api_key: str, secret_key: str):
-    timestamp = int(time.time() * 1000)
-    params = f"timestamp={timestamp}"
+    timestamp = bingx_timestamp()
+    params = f"recvWindow={RECV_WINDOW}&timestamp={timestamp}"
     signature = generate_signature(secret_key, params)
     url = f"{BASE_URL}{BALANCE_ENDPOINT}?{params}&signature={signature}"
     headers = {"X-BX-APIKEY": api_key}
-    response = requests.get(url, headers=headers)
-    return response.json()
+    response = http_anfrage("GET", url, headers=headers)
+    return antwort_json(response)
 
 def firebase_speichere_base_order_time(botname, timestamp, firebase_secret):
     url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
     data = timestamp.isoformat()  # nur der String
-    response = requests.put(url, json=data)
+    response = http_anfrage("PUT", url, json=data)
+    if response.status_code == 200:
+        firebase_spiegel.lokal_setzen("base_order_time", botname, data)
     return f"Base-Order-Zeit für {botname} gespeichert: {timestamp}, Status: {response.status_code}"
 
 def get_current_price(symbol: str):
     url = f"{BASE_URL}{PRICE_ENDPOINT}?symbol={symbol}"
-    response = requests.get(url)
-    data = response.json()
+    response = http_anfrage("GET", url, hedge=PRICE_ENDPOINT)
+    data = antwort_json(response)
     if data.get("code") == 0 and "data" in data and "price" in data["data"]:
-        return float(data["data"]["price"])
+        letzte_preise[symbol] = float(data["data"]["price"])
+        return letzte_preise[symbol]
     else:
         return None
 
@@ -108,7 +763,7 @@ def close_open_position(api_key, secret_key, symbol, position_side="LONG"):
     Schließt die offene Position sofort per Market Order.
     position_side: "LONG" oder "SHORT"
     """
-    logs = []
+    logs = RequestLog()
 
     # 1. Aktuelle Positionsgröße und Liquidationspreis abfragen
     position_size, _, liquidation_price = get_current_position(api_key, secret_key, symbol, position_side, logs=logs)
@@ -120,14 +775,16 @@ def close_open_position(api_key, secret_key, symbol, position_side="LONG"):
     # 2. Market Sell/Buy zum Schließen der Position
     side = "SELL" if position_side.upper() == "LONG" else "BUY"
 
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params_dict = {
         "symbol": symbol,
         "side": side,
         "type": "MARKET",
         "quantity": round(position_size, 6),
         "positionSide": position_side.upper(),
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
 
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
@@ -140,22 +797,49 @@ def close_open_position(api_key, secret_key, symbol, position_side="LONG"):
         "Content-Type": "application/json"
     }
 
-    response = requests.post(url, headers=headers, json=params_dict)
+    response = order_posten(url, headers, params_dict, secret_key)
     try:
-        result = response.json()
+        result = antwort_json(response)
     except Exception as e:
         result = {"code": -1, "msg": f"Fehler beim Parsen der API-Antwort: {e}", "raw_response": response.text}
 
-    logs.append(f"Schließen der Position: {result}")
+    logs.ereignis("Schließen der Position", result)
     return {"result": result, "logs": logs}
 
+def place_market_order_close(api_key, secret_key, symbol, position_amt, position_side="LONG"):
+    """
+    Schließt eine Position via MARKET, egal ob LONG (-> SELL) oder SHORT (-> BUY).
+    position_amt: Menge (Vorzeichen wird ignoriert)
+    """
+    side = "SELL" if position_side.upper() == "LONG" else "BUY"
+    timestamp = bingx_timestamp()
+    params = {
+        "symbol": symbol,
+        "side": side,
+        "type": "MARKET",
+        "quantity": round(abs(float(position_amt)), 6),
+        "positionSide": position_side.upper(),
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
+    }
+    query_string = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    params["signature"] = generate_signature(secret_key, query_string)
+    url = f"{BASE_URL}{ORDER_ENDPOINT}"
+    headers = {"X-BX-APIKEY": api_key, "Content-Type": "application/json"}
+    resp = order_posten(url, headers, params, secret_key)
+    try:
+        return antwort_json(resp)
+    except Exception:
+        return {"code": -1, "msg": "Ungültige API-Antwort", "raw": resp.text}
+
 def place_market_order(api_key, secret_key, symbol, usdt_amount, position_side="LONG"):
     price = get_current_price(symbol)
     if price is None:
         return {"code": 99999, "msg": "Failed to get current price"}
 
     quantity = round(usdt_amount / price, 6)
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
 
     params_dict = {
         "symbol": symbol,
@@ -163,7 +847,9 @@ def place_market_order(api_key, secret_key, symbol, usdt_amount, position_side="
         "type": "MARKET",
         "quantity": quantity,
         "positionSide": position_side,
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
 
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
@@ -176,11 +862,11 @@ def place_market_order(api_key, secret_key, symbol, usdt_amount, position_side="
         "Content-Type": "application/json"
     }
 
-    response = requests.post(url, headers=headers, json=params_dict)
-    return response.json()
+    response = order_posten(url, headers, params_dict, secret_key)
+    return antwort_json(response)
 
 def place_stop_loss_order(api_key, secret_key, symbol, quantity, stop_price, position_side="LONG"):
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
 
     params_dict = {
         "symbol": symbol,
@@ -189,7 +875,9 @@ def place_stop_loss_order(api_key, secret_key, symbol, quantity, stop_price, pos
         "stopPrice": round(stop_price, 6),
         "quantity": round(quantity, 6),
         "positionSide": position_side,
+        "clientOrderID": neue_client_order_id(),
         "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW,
         "timeInForce": "GTC"
     }
 
@@ -203,15 +891,16 @@ def place_stop_loss_order(api_key, secret_key, symbol, quantity, stop_price, pos
         "Content-Type": "application/json"
     }
 
-    response = requests.post(url, headers=headers, json=params_dict)
-    return response.json()
+    response = order_posten(url, headers, params_dict, secret_key)
+    return antwort_json(response)
 
 def send_signed_request(http_method, endpoint, api_key, secret_key, params=None):
     if params is None:
         params = {}
 
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params['timestamp'] = timestamp
+    params['recvWindow'] = RECV_WINDOW
 
     query_string = "&".join(f"{k}={params[k]}" for k in sorted(params))
     signature = hmac.new(secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
@@ -221,15 +910,15 @@ def send_signed_request(http_method, endpoint, api_key, secret_key, params=None)
     headers = {"X-BX-APIKEY": api_key}
 
     if http_method == "GET":
-        response = requests.get(url, headers=headers, params=params)
+        response = http_anfrage("GET", url, headers=headers, params=params, hedge=endpoint)
     elif http_method == "POST":
-        response = requests.post(url, headers=headers, json=params)
+        response = http_anfrage("POST", url, headers=headers, json=params)
     elif http_method == "DELETE":
-        response = requests.delete(url, headers=headers, params=params)
+        response = http_anfrage("DELETE", url, headers=headers, params=params)
     else:
         raise ValueError("Unsupported HTTP method")
 
-    return response.json()
+    return antwort_json(response)
 
 def get_current_position(api_key, secret_key, symbol, position_side, logs=None):
     endpoint = "/openApi/swap/v2/user/positions"
@@ -240,7 +929,7 @@ def get_current_position(api_key, secret_key, symbol, position_side, logs=None):
     raw_positions = positions if isinstance(positions, list) else []
 
     if logs is not None:
-        logs.append(f"Positions Rohdaten: {raw_positions}")
+        logs.ereignis("Positions Rohdaten", raw_positions)
 
     position_size = 0
     liquidation_price = None
@@ -249,7 +938,7 @@ def get_current_position(api_key, secret_key, symbol, position_side, logs=None):
         for pos in positions:
             if pos.get("symbol") == symbol and pos.get("positionSide", "").upper() == position_side.upper():
                 if logs is not None:
-                    logs.append(f"Gefundene Position: {pos}")
+                    logs.ereignis("Gefundene Position", pos)
                 try:
                     position_size = float(pos.get("size", 0)) or float(pos.get("positionAmt", 0))
                     liquidation_price = float(pos.get("liquidationPrice", 0))
@@ -267,7 +956,7 @@ def get_current_position(api_key, secret_key, symbol, position_side, logs=None):
     return position_size, raw_positions, liquidation_price
 
 def place_limit_sell_order(api_key, secret_key, symbol, quantity, limit_price, position_side="LONG"):
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
 
     params_dict = {
         "symbol": symbol,
@@ -277,7 +966,9 @@ def place_limit_sell_order(api_key, secret_key, symbol, quantity, limit_price, p
         "price": round(limit_price, 6),
         "timeInForce": "GTC",
         "positionSide": position_side,
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
 
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
@@ -290,15 +981,16 @@ def place_limit_sell_order(api_key, secret_key, symbol, quantity, limit_price, p
         "Content-Type": "application/json"
     }
 
-    response = requests.post(url, headers=headers, json=params_dict)
-    return response.json()
+    response = order_posten(url, headers, params_dict, secret_key)
+    return antwort_json(response)
 
 def firebase_loesche_base_order_time(botname, firebase_secret):
     #    Löscht den Base-Order-Zeitpunkt eines Bots in Firebase.
     try:
         url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
-        response = requests.delete(url)
+        response = http_anfrage("DELETE", url)
         response.raise_for_status()
+        firebase_spiegel.lokal_setzen("base_order_time", botname, None)
         return f"Base-Order-Zeitpunkt für {botname} gelöscht, Status: {response.status_code}"
     except Exception as e:
         return f"Fehler beim Löschen des Base-Order-Zeitpunkts für {botname}: {e}"
@@ -310,7 +1002,10 @@ def sende_telegram_nachricht(botname, text):
     full_text = f"[{botname}] {text}"
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     payload = {"chat_id": TELEGRAM_CHAT_ID, "text": full_text}
-    response = requests.post(url, json=payload)
+    try:
+        response = http_anfrage("POST", url, json=payload)
+    except Exception as e:
+        return f"Telegram Fehler: {e}"
     return f"Telegram Antwort: {response.status_code}"
 
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
@@ -323,47 +1018,56 @@ def sende_telegram_nachricht(botname, text):
         "Content-Type": "application/json"
     }
 
-    response = requests.post(url, headers=headers, json=params_dict)
-    return response.json()
+    response = order_posten(url, headers, params_dict, secret_key)
+    return antwort_json(response)
 
 def get_open_orders(api_key, secret_key, symbol):
-    timestamp = int(time.time() * 1000)
-    params = f"symbol={symbol}&timestamp={timestamp}"
+    timestamp = bingx_timestamp()
+    params = f"symbol={symbol}&recvWindow={RECV_WINDOW}&timestamp={timestamp}"
     signature = generate_signature(secret_key, params)
     url = f"{BASE_URL}{OPEN_ORDERS_ENDPOINT}?{params}&signature={signature}"
     headers = {"X-BX-APIKEY": api_key}
-    response = requests.get(url, headers=headers)
+    response = http_anfrage("GET", url, headers=headers, hedge=OPEN_ORDERS_ENDPOINT)
 
     try:
-        data = response.json()
+        data = antwort_json(response)
     except ValueError:
         return {"code": -1, "msg": "Ungültige API-Antwort", "raw_response": response.text}
 
     return data
 
 def cancel_order(api_key, secret_key, symbol, order_id):
-    timestamp = int(time.time() * 1000)
-    params = f"symbol={symbol}&orderId={order_id}&timestamp={timestamp}"
+    timestamp = bingx_timestamp()
+    params = f"symbol={symbol}&orderId={order_id}&recvWindow={RECV_WINDOW}&timestamp={timestamp}"
     signature = generate_signature(secret_key, params)
     url = f"{BASE_URL}{ORDER_ENDPOINT}?{params}&signature={signature}"
     headers = {"X-BX-APIKEY": api_key}
-    response = requests.delete(url, headers=headers)
-    return response.json()
+    response = http_anfrage("DELETE", url, headers=headers)
+    return antwort_json(response)
 
 # --- Firebase Funktionen jetzt mit botname statt asset ---
 def firebase_speichere_ordergroesse(botname, betrag, firebase_secret):
     url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
     data = {"usdt_amount": betrag}
-    response = requests.put(url, json=data)
+    try:
+        response = http_anfrage("PUT", url, json=data, headers=ETAG_HEADER)
+    except Exception as e:
+        return f"Fehler beim Speichern der Ordergröße für {botname}: {e}"
+    if response.status_code == 200:
+        firebase_spiegel.lokal_setzen("ordergroesse", botname, data)
+    _etag_merken(f"ordergroesse/{botname}", response)
     return f"Ordergröße für {botname} gespeichert: {betrag}, Status: {response.status_code}"
 
 def firebase_lese_ordergroesse(botname, firebase_secret):
-    url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return None
+    gespiegelt, data = firebase_spiegel.lesen("ordergroesse", botname)
+    if not gespiegelt:
+        url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
+        response = http_anfrage("GET", url)
+        if response.status_code != 200:
+            return None
     try:
-        data = response.json()
+        if not gespiegelt:
+            data = antwort_json(response)
         if isinstance(data, dict) and "usdt_amount" in data:
             return float(data["usdt_amount"])
         elif isinstance(data, (int, float)):
@@ -374,53 +1078,231 @@ def firebase_lese_ordergroesse(botname, firebase_secret):
 
 def firebase_loesche_ordergroesse(botname, firebase_secret):
     url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
-    response = requests.delete(url)
+    response = http_anfrage("DELETE", url)
+    if response.status_code == 200:
+        firebase_spiegel.lokal_setzen("ordergroesse", botname, None)
+    firebase_etags.pop(f"ordergroesse/{botname}", None)
     return f"Ordergröße für {botname} gelöscht, Status: {response.status_code}"
 
-def firebase_speichere_kaufpreis(botname, price, usdt_amount, firebase_secret):
-    import requests
+# === Compare-and-set mit ETag: Ordergröße ohne globale Sperre, auch wenn mehrere Prozesse denselben Bot bedienen ===
+# Das ETag des letzten eigenen Schreibzugriffs wird gemerkt, der bedingte PUT braucht dann keinen GET vorher.
+# Bei 412 liefert Firebase aktuellen Wert und ETag gleich mit, es wird sofort neu gerechnet.
+ETAG_HEADER = {"X-Firebase-ETag": "true"}
+firebase_etags = {}  # pfad -> ETag des zuletzt gesehenen Werts
+bot_zustaende.verdraengen_abonnenten.append(lambda botname: firebase_etags.pop(f"ordergroesse/{botname}", None))
+cas_statistik = {"geschrieben": 0, "konflikte": 0, "etag_gelesen": 0, "aufgegeben": 0}
+
+def _etag_merken(pfad, response):
+    etag = response.headers.get("ETag") if response.status_code == 200 else None
+    if etag:
+        firebase_etags[pfad] = etag
+    else:
+        firebase_etags.pop(pfad, None)
 
+def firebase_lese_mit_etag(pfad, firebase_secret):
+    url = f"{FIREBASE_URL}/{pfad}.json?auth={firebase_secret}"
+    response = http_anfrage("GET", url, headers=ETAG_HEADER)
+    response.raise_for_status()
+    cas_statistik["etag_gelesen"] += 1
+    return antwort_json(response), response.headers.get("ETag")
 
+def firebase_schreibe_wenn_unveraendert(pfad, wert, etag, firebase_secret):
+    """
+    PUT mit if-match. Rückgabe (True, wert, neues ETag) oder bei Konflikt (False, aktueller Wert, aktuelles ETag).
+    Nicht automatisch wiederholt: nach einem Timeout ist unklar, ob der erste Versuch geschrieben hat.
+    """
+    url = f"{FIREBASE_URL}/{pfad}.json?auth={firebase_secret}"
+    response = http_anfrage("PUT", url, idempotent=False, json=wert, headers={"if-match": etag, **ETAG_HEADER})
+    if response.status_code == 412:
+        return False, antwort_json(response), response.headers.get("ETag")
+    response.raise_for_status()
+    return True, wert, response.headers.get("ETag")
+
+def _betrag(wert):
+    if isinstance(wert, dict):
+        wert = wert.get("usdt_amount")
+    try:
+        return float(wert) if wert is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def ordergroesse_cas(botname, betrag, faktor, firebase_secret):
+    """
+    Schreibt die nächste Ordergröße betrag (= vorherige * faktor) nur, wenn in Firebase noch die vorherige steht.
+    Hat ein anderer Worker schon erhöht, wird von dessen Wert aus weitergerechnet. Rückgabe: (Betrag, Versuche).
+    """
+    pfad = f"ordergroesse/{botname}"
+    basis = betrag / (faktor or 1.0)
+
+    def neu_rechnen(aktuell):
+        aktuell = _betrag(aktuell)
+        if aktuell is None or abs(aktuell - basis) <= 1e-9 * max(abs(basis), 1.0):
+            return betrag
+        return aktuell * (faktor or 1.0)
+
+    etag = firebase_etags.get(pfad)
+    if etag is None:
+        aktuell, etag = firebase_lese_mit_etag(pfad, firebase_secret)
+        betrag = neu_rechnen(aktuell)
+    for versuch in range(1, FIREBASE_CAS_VERSUCHE + 1):
+        daten = {"usdt_amount": betrag}
+        ok, aktuell, etag = firebase_schreibe_wenn_unveraendert(pfad, daten, etag, firebase_secret)
+        if ok:
+            if etag:
+                firebase_etags[pfad] = etag
+            else:
+                firebase_etags.pop(pfad, None)
+            firebase_spiegel.lokal_setzen("ordergroesse", botname, daten)
+            cas_statistik["geschrieben"] += 1
+            return betrag, versuch
+        cas_statistik["konflikte"] += 1
+        betrag = neu_rechnen(aktuell)
+        # kurzer Jitter, damit zwei Worker im Gleichtakt nicht immer wieder kollidieren
+        time.sleep(random.uniform(0, 0.02 * versuch))
+    firebase_etags.pop(pfad, None)
+    cas_statistik["aufgegeben"] += 1
+    raise Exception(f"Ordergröße für {botname} nach {FIREBASE_CAS_VERSUCHE} Konflikten nicht geschrieben")
+
+def ordergroesse_reservieren(botname, betrag, faktor, firebase_secret, logs):
+    """
+    Vor der Market-Order eines Nachkaufs: Ordergröße per Compare-and-set in Firebase festschreiben.
+    Rückgabe (Betrag, gespeichert). Ohne Firebase oder bei Fehlern bleibt es beim Betrag aus dem Speicher,
+    er wird dann wie bisher nach der Order gespeichert.
+    """
+    if not FIREBASE_URL or not firebase_secret or not betrag:
+        return betrag, False
+    try:
+        neu, versuche = ordergroesse_cas(botname, float(betrag), float(faktor or 1.0), firebase_secret)
+    except Exception as e:
+        logs.append(f"Ordergröße nicht per Compare-and-set gespeichert: {e}")
+        return betrag, False
+    if versuche > 1 or abs(neu - betrag) > 1e-9 * max(abs(betrag), 1.0):
+        logs.append(f"Ordergröße von anderem Worker geändert → {neu} statt {betrag} ({versuche} Versuche)")
+    saved_usdt_amounts[botname] = neu
+    return neu, True
+
+def ordergroesse_zuruecknehmen(botname, betrag, faktor, firebase_secret, logs):
+    """
+    Market-Order nach ordergroesse_reservieren fehlgeschlagen: vorherige Größe wieder eintragen, sonst wird beim
+    nächsten Alarm (oder nach einem Neustart) nochmals mit faktor multipliziert. Bedingt auf das eigene ETag,
+    hat inzwischen ein anderer Worker erhöht, bleibt dessen Wert stehen.
+    """
+    vorher = float(betrag) / float(faktor or 1.0)
+    saved_usdt_amounts[botname] = vorher
+    pfad = f"ordergroesse/{botname}"
+    etag = firebase_etags.get(pfad)
+    if not etag:
+        logs.append("Ordergröße in Firebase nicht zurückgesetzt (kein ETag)")
+        return
+    daten = {"usdt_amount": vorher}
+    try:
+        ok, _, neues_etag = firebase_schreibe_wenn_unveraendert(pfad, daten, etag, firebase_secret)
+    except Exception as e:
+        firebase_etags.pop(pfad, None)
+        logs.append(f"Ordergröße in Firebase nicht zurückgesetzt: {e}")
+        return
+    if neues_etag:
+        firebase_etags[pfad] = neues_etag
+    if ok:
+        firebase_spiegel.lokal_setzen("ordergroesse", botname, daten)
+        logs.append(f"Ordergröße nach fehlgeschlagener Order auf {vorher} zurückgesetzt")
+    else:
+        cas_statistik["konflikte"] += 1
+        logs.append("Ordergröße inzwischen von anderem Worker geändert, nicht zurückgesetzt")
+
+def firebase_speichere_kaufpreis(botname, price, usdt_amount, firebase_secret):
     # Daten, die gespeichert werden sollen
     data = {
         "price": price,
-        "usdt_amount": usdt_amount
+        "usdt_amount": usdt_amount,
+        "zeit": datetime.now(timezone.utc).isoformat()
     }
 
     # URL zusammenbauen mit Authentifizierung
     url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
 
     # HTTP PUT oder POST, je nach Bedarf
-    response = requests.post(url, json=data)
+    response = http_anfrage("POST", url, json=data)
 
     if response.status_code == 200:
+        _kaufpreis_spiegeln(botname, response, data)
         return f"Kaufpreis für {botname} erfolgreich gespeichert."
     else:
         raise Exception(f"Fehler beim Speichern: {response.text}")
 
 def firebase_loesche_kaufpreise(botname, firebase_secret):
     url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
-    response = requests.delete(url)
+    response = http_anfrage("DELETE", url)
     if response.status_code == 200:
+        firebase_spiegel.lokal_setzen("kaufpreise", botname, None)
         return f"Kaufpreise für {botname} gelöscht."
     return f"Fehler beim Löschen der Kaufpreise für {botname}: Status {response.status_code}"
 
 def firebase_lese_kaufpreise(botname, firebase_secret):
     try:
-        url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
-        r = requests.get(url)
-        print(f"Firebase Antwort Status: {r.status_code}")
-        print(f"Firebase Antwort Inhalt: {r.text}")
-        daten = r.json()
+        gespiegelt, daten = firebase_spiegel.lesen("kaufpreise", botname)
+        if not gespiegelt:
+            url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
+            r = http_anfrage("GET", url)
+            print(f"Firebase Antwort Status: {r.status_code}")
+            print(f"Firebase Antwort Inhalt: {r.text}")
+            daten = antwort_json(r)
         if not daten:
             print("Keine Daten unter kaufpreise/{botname} gefunden")
             return []
         # Werte in Liste umwandeln
-        return [{"price": float(v.get("price", 0)), "usdt_amount": float(v.get("usdt_amount", 0))} for v in daten.values()]
+        return kaufpreise_aus_knoten(daten)
     except Exception as e:
         print(f"Fehler beim Lesen der Kaufpreise: {e}")
         return []
 
+# === Kaufpreise: Snapshot + Deltas ===
+# kaufpreise/<bot>/snapshot fasst alle verdichteten Käufe zusammen (Summe, gewichteter Preis, Anzahl, erste/letzte Zeit),
+# neue Käufe kommen wie bisher als Push-Kinder dazu. Der Kompaktierer faltet die Deltas regelmäßig in den Snapshot,
+# damit ein Lesezugriff auch bei tiefer Leiter nur wenige Kinder holt.
+KAUFPREISE_SNAPSHOT = "snapshot"
+
+def kaufpreise_aus_knoten(daten):
+    """Snapshot und Deltas eines kaufpreise/<bot>-Knotens als Liste; der Snapshot-Eintrag trägt "anzahl"."""
+    if not isinstance(daten, dict):
+        return []
+    kaeufe = []
+    for schluessel, v in daten.items():
+        if not isinstance(v, dict):
+            continue
+        eintrag = {"price": float(v.get("price", 0)), "usdt_amount": float(v.get("usdt_amount", 0))}
+        if schluessel == KAUFPREISE_SNAPSHOT:
+            eintrag["anzahl"] = int(v.get("anzahl", 1))
+        kaeufe.append(eintrag)
+    return kaeufe
+
+def anzahl_kaeufe(kaeufe):
+    return sum(kauf.get("anzahl", 1) for kauf in kaeufe or [])
+
+def kaufpreise_falten(daten):
+    """Faltet alle Deltas eines Knotens in einen Snapshot. Rückgabe: neuer Snapshot oder None, wenn nichts da ist."""
+    if not isinstance(daten, dict):
+        return None
+    alt = daten.get(KAUFPREISE_SNAPSHOT) if isinstance(daten.get(KAUFPREISE_SNAPSHOT), dict) else {}
+    menge = float(alt.get("usdt_amount", 0))
+    wert = float(alt.get("price", 0)) * menge
+    anzahl = int(alt.get("anzahl", 0))
+    zeiten = [z for z in (alt.get("erste"), alt.get("letzte")) if z]
+    for schluessel, v in daten.items():
+        if schluessel == KAUFPREISE_SNAPSHOT or not isinstance(v, dict):
+            continue
+        m = float(v.get("usdt_amount", 0))
+        menge += m
+        wert += float(v.get("price", 0)) * m
+        anzahl += 1
+        if v.get("zeit"):
+            zeiten.append(v["zeit"])
+    if not anzahl:
+        return None
+    zeiten.sort()  # ISO-Zeiten in UTC sortieren lexikographisch richtig
+    return {"price": round(wert / menge, 10) if menge else 0.0, "usdt_amount": menge, "anzahl": anzahl,
+            "erste": zeiten[0] if zeiten else None, "letzte": zeiten[-1] if zeiten else None}
+
 def berechne_durchschnittspreis(käufe):
     if not käufe:
         return None
@@ -441,16 +1323,330 @@ def berechne_durchschnittspreis(käufe):
 
 def firebase_lese_base_order_time(botname, firebase_secret):
     try:
-        url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if data:
-            return data.get("base_order_time")  # ISO-Zeitstring
+        gespiegelt, data = firebase_spiegel.lesen("base_order_time", botname)
+        if not gespiegelt:
+            url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
+            response = http_anfrage("GET", url)
+            response.raise_for_status()
+            data = antwort_json(response)
+        if isinstance(data, dict):
+            return data.get("base_order_time")  # ISO-Zeitstring (SHORT speichert als Objekt)
+        if isinstance(data, str):
+            return data  # LONG speichert nur den String
         return None
     except Exception as e:
         print(f"Fehler beim Lesen des Base-Order-Zeitpunkts aus Firebase für {botname}: {e}")
         return None
+
+# === Firebase-Spiegel: ordergroesse, base_order_time und kaufpreise per REST-Stream (Server-Sent Events) im Speicher ===
+# Der erste put nach jedem Verbindungsaufbau enthält den ganzen Baum (Resync), danach kommen nur Änderungen.
+# Lesefunktionen nehmen den Spiegel, solange er synchron ist, sonst wie bisher einen GET.
+# Eigene Schreibzugriffe werden sofort eingetragen, damit ein Lesen direkt danach nicht auf das Stream-Echo warten muss.
+# Speicher: ohne Filter liegen die drei Bäume komplett im Prozess, auch Bots, die hier nie einen Alarm schicken
+# (grob einige hundert Byte pro Bot und Kauf als Python-dicts, pro Shard bzw. Worker einmal). Wer viele fremde
+# oder alte Bots in derselben Datenbank hat, setzt FIREBASE_STREAM_NUR_REGISTRY=1; /stats zeigt die Bots pro Baum.
+# lesen() kopiert nur den Teilbaum des gefragten Bots (ein paar Einträge), nicht den ganzen Baum.
+SPIEGEL_BAEUME = ("ordergroesse", "base_order_time", "kaufpreise")
+
+def sse_ereignisse_parsen(zeilen):
+    """
+    Zerlegt einen SSE-Zeilenstrom (str oder bytes, ohne Zeilenende) in (event, data).
+    data ist JSON-dekodiert, bei ungültigem JSON der Rohtext. Kommentarzeilen (":...") werden übersprungen.
+    """
+    event, daten = None, []
+    for zeile in zeilen:
+        if isinstance(zeile, bytes):
+            zeile = zeile.decode("utf-8")
+        zeile = zeile.rstrip("\r")
+        if not zeile:
+            if event is not None or daten:
+                text = "\n".join(daten)
+                try:
+                    wert = json_loads(text) if text else None
+                except ValueError:
+                    wert = text
+                yield event or "message", wert
+            event, daten = None, []
+            continue
+        if zeile.startswith(":"):
+            continue
+        feld, _, wert = zeile.partition(":")
+        if wert.startswith(" "):
+            wert = wert[1:]
+        if feld == "event":
+            event = wert
+        elif feld == "data":
+            daten.append(wert)
+
+def _pfad_teile(pfad):
+    return [teil for teil in str(pfad).split("/") if teil]
+
+def spiegel_setzen(wurzel, teile, wert):
+    """Setzt wert unter teile (None löscht, leere Knoten verschwinden wie in Firebase) und gibt die neue Wurzel zurück."""
+    if not teile:
+        return wert if wert != {} else None
+    if not isinstance(wurzel, dict):
+        wurzel = {}
+    neu = spiegel_setzen(wurzel.get(teile[0]), teile[1:], wert)
+    if neu is None:
+        wurzel.pop(teile[0], None)
+    else:
+        wurzel[teile[0]] = neu
+    return wurzel or None
+
+def spiegel_ereignis_anwenden(wurzel, event, daten):
+    """Wendet ein put/patch-Ereignis ({"path", "data"}) auf wurzel an; gibt (neue Wurzel, Resync ja/nein) zurück."""
+    teile = _pfad_teile(daten.get("path", "/"))
+    if event == "put":
+        return spiegel_setzen(wurzel, teile, daten.get("data")), not teile
+    if event == "patch":
+        for unterpfad, wert in (daten.get("data") or {}).items():
+            wurzel = spiegel_setzen(wurzel, teile + _pfad_teile(unterpfad), wert)
+        return wurzel, False
+    return wurzel, False
+
+def spiegel_ereignis_filtern(event, daten, behalten):
+    """
+    Entfernt aus einem put/patch-Ereignis alle Bots (erste Pfadebene), für die behalten(botname) falsch ist.
+    Gibt das gefilterte Ereignis zurück oder None, wenn nichts übrig bleibt.
+    """
+    teile = _pfad_teile(daten.get("path", "/"))
+    if teile:
+        return daten if behalten(teile[0]) else None
+    wert = daten.get("data")
+    if not isinstance(wert, dict):
+        return daten
+    if event == "patch":
+        wert = {unterpfad: w for unterpfad, w in wert.items() if _pfad_teile(unterpfad) and behalten(_pfad_teile(unterpfad)[0])}
+        return dict(daten, data=wert) if wert else None
+    return dict(daten, data={name: w for name, w in wert.items() if behalten(name)})
+
+class FirebaseSpiegel:
+    """
+    Hält je Baum eine Kopie aus dem Firebase-Stream. Ein Thread pro Baum verbindet sich,
+    wendet die Ereignisse an und verbindet sich bei Abbruch mit exponentiellem Backoff neu.
+    behalten: optional botname -> bool; andere Bots werden nicht gespiegelt und per REST gelesen (Sharding).
+    """
+
+    def __init__(self, baeume=SPIEGEL_BAEUME):
+        self.baeume = tuple(baeume)
+        self._daten = dict.fromkeys(self.baeume)
+        self._synchron = dict.fromkeys(self.baeume, False)
+        self._lock = threading.Lock()
+        self._stopp = threading.Event()
+        self._threads = []
+        self.statistik = {baum: {"verbindungen": 0, "ereignisse": 0, "resyncs": 0, "fehler": 0, "letztes_ereignis": None}
+                          for baum in self.baeume}
+        self.lesezugriffe = {"spiegel": 0, "rest": 0}
+        self.behalten = None
+
+    def _gespiegelt(self, pfad):
+        teile = _pfad_teile(pfad)
+        return self.behalten is None or not teile or self.behalten(teile[0])
+
+    def synchron(self, baum):
+        return self._synchron.get(baum, False)
+
+    def anwenden(self, baum, event, daten):
+        """Verarbeitet ein Stream-Ereignis; cancel/auth_revoked lösen eine neue Verbindung aus."""
+        if event in ("cancel", "auth_revoked"):
+            raise ConnectionError(f"Firebase-Stream {baum}: {event} {daten}")
+        if event not in ("put", "patch") or not isinstance(daten, dict):
+            return  # keep-alive
+        if self.behalten is not None:
+            daten = spiegel_ereignis_filtern(event, daten, self.behalten)
+            if daten is None:
+                return
+        with self._lock:
+            self._daten[baum], resync = spiegel_ereignis_anwenden(self._daten[baum], event, daten)
+            if resync:
+                self._synchron[baum] = True
+        statistik = self.statistik[baum]
+        statistik["ereignisse"] += 1
+        statistik["resyncs"] += resync
+        statistik["letztes_ereignis"] = datetime.now(timezone.utc).isoformat()
+
+    def lokal_setzen(self, baum, pfad, wert):
+        if baum not in self._daten or not self._gespiegelt(pfad):
+            return
+        with self._lock:
+            self._daten[baum] = spiegel_setzen(self._daten[baum], _pfad_teile(pfad), wert)
+
+    def lesen(self, baum, pfad):
+        """(True, Kopie des Werts) aus dem Spiegel oder (False, None), wenn der Baum nicht synchron ist."""
+        if not self._synchron.get(baum) or not self._gespiegelt(pfad):
+            self.lesezugriffe["rest"] += 1
+            return False, None
+        with self._lock:
+            wert = self._daten[baum]
+            for teil in _pfad_teile(pfad):
+                wert = wert.get(teil) if isinstance(wert, dict) else None
+            wert = copy.deepcopy(wert)
+        self.lesezugriffe["spiegel"] += 1
+        return True, wert
+
+    def kinder_zaehlen(self, baum, ohne=()):
+        """{schluessel: Anzahl Kinder ohne die Namen in ohne} der ersten Ebene, None solange der Baum nicht synchron ist."""
+        if not self._synchron.get(baum):
+            return None
+        with self._lock:
+            return {name: sum(1 for kind in wert if kind not in ohne)
+                    for name, wert in (self._daten[baum] or {}).items() if isinstance(wert, dict)}
+
+    def _verbinden(self, baum, firebase_secret):
+        url = f"{FIREBASE_URL}/{baum}.json?auth={firebase_secret}"
+        with requests.Session() as session:
+            with session.get(url, headers={"Accept": "text/event-stream"}, stream=True,
+                             timeout=(HTTP_TIMEOUTS["firebase"][0], FIREBASE_STREAM_TIMEOUT)) as antwort:
+                antwort.raise_for_status()
+                self.statistik[baum]["verbindungen"] += 1
+                for event, daten in sse_ereignisse_parsen(antwort.iter_lines()):
+                    if self._stopp.is_set():
+                        return
+                    self.anwenden(baum, event, daten)
+
+    def _schleife(self, baum, firebase_secret):
+        pause = 1.0
+        while not self._stopp.is_set():
+            resyncs = self.statistik[baum]["resyncs"]
+            try:
+                self._verbinden(baum, firebase_secret)
+            except Exception as e:
+                self.statistik[baum]["fehler"] += 1
+                print(f"[Fehler] Firebase-Stream {baum}: {e}")
+            # bis zum nächsten vollständigen put wieder per REST lesen
+            self._synchron[baum] = False
+            if self.statistik[baum]["resyncs"] > resyncs:
+                pause = 1.0  # Verbindung lief, nach Abbruch schnell neu verbinden
+            self._stopp.wait(pause * random.uniform(0.5, 1.0))
+            pause = min(pause * 2, 60.0)
+
+    def starten(self, firebase_secret, warten=0):
+        """Startet die Stream-Threads und wartet höchstens warten Sekunden auf den ersten Resync aller Bäume."""
+        if self._threads:
+            return
+        for baum in self.baeume:
+            thread = threading.Thread(target=self._schleife, args=(baum, firebase_secret), name=f"firebase-stream-{baum}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        ende = time.monotonic() + warten
+        while time.monotonic() < ende and not all(self._synchron.values()):
+            time.sleep(0.05)
+
+    def stoppen(self):
+        self._stopp.set()
+
+    def status(self):
+        return {"aktiv": bool(self._threads), "lesezugriffe": dict(self.lesezugriffe),
+                "baeume": {baum: dict(self.statistik[baum], synchron=self._synchron[baum], bots=len(self._daten[baum] or {}))
+                           for baum in self.baeume}}
+
+firebase_spiegel = FirebaseSpiegel()
+
+def _kaufpreis_spiegeln(botname, antwort, data):
+    # POST liefert den Push-Schlüssel {"name": "-N..."}, unter dem Firebase den Kauf abgelegt hat
+    try:
+        schluessel = (antwort_json(antwort) or {}).get("name")
+    except Exception:
+        schluessel = None
+    if schluessel:
+        firebase_spiegel.lokal_setzen("kaufpreise", f"{botname}/{schluessel}", data)
+
+def firebase_spiegel_starten(firebase_secret=None, warten=10):
+    firebase_secret = firebase_secret or FIREBASE_SECRET
+    if FIREBASE_STREAM and FIREBASE_URL and firebase_secret:
+        firebase_spiegel.starten(firebase_secret, warten)
+
+# === Warm-up beim Start: ganzen Zustand mit einem Lesezugriff pro Baum aus Firebase laden ===
+FIREBASE_SECRET = os.environ.get("FIREBASE_SECRET", "")
+warmup_status = {"fertig": False}
+
+def firebase_baum_lesen(baum, firebase_secret):
+    url = f"{FIREBASE_URL}/{baum}.json?auth={firebase_secret}"
+    response = http_anfrage("GET", url, timeout=30)
+    response.raise_for_status()
+    return antwort_json(response) or {}
+
+def _iso_zeit_parsen(wert):
+    if isinstance(wert, dict):
+        wert = wert.get("base_order_time")
+    if not wert:
+        return None
+    zeit = datetime.fromisoformat(wert)
+    if zeit.tzinfo is None:
+        zeit = zeit.replace(tzinfo=timezone.utc)
+    return zeit
+
+def startup_warmup(firebase_secret=None):
+    """
+    Lädt ordergroesse, base_order_time und kaufpreise aller Bots in je einem Lesezugriff (parallel)
+    und füllt saved_usdt_amounts, base_order_times, alarm_counter und status_fuer_alle.
+    Bereits vorhandene Einträge im Speicher werden nicht überschrieben.
+    """
+    firebase_secret = firebase_secret or FIREBASE_SECRET
+    if not FIREBASE_URL or not firebase_secret:
+        warmup_status.update({"fertig": True, "msg": "Firebase nicht konfiguriert, kein Warm-up"})
+        return warmup_status
+
+    start = time.perf_counter()
+    fehler = {}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        baeume = {}
+        futures = {}
+        for baum in ("ordergroesse", "base_order_time", "kaufpreise", "deadlines"):
+            gespiegelt, inhalt = firebase_spiegel.lesen(baum, "")
+            if gespiegelt:
+                baeume[baum] = inhalt or {}  # schon per Stream geladen
+            else:
+                futures[baum] = pool.submit(firebase_baum_lesen, baum, firebase_secret)
+        for baum, future in futures.items():
+            try:
+                baeume[baum] = future.result()
+            except Exception as e:
+                baeume[baum] = {}
+                fehler[baum] = str(e)
+    if shard_index is not None:
+        # nur Bots dieses Shards (und solche, deren Konto erst mit dem Alarm bekannt wird)
+        baeume = {baum: {name: wert for name, wert in inhalt.items() if bot_im_shard(name) is not False}
+                  for baum, inhalt in baeume.items()}
+
+    for botname, wert in baeume["ordergroesse"].items():
+        try:
+            betrag = float(wert["usdt_amount"]) if isinstance(wert, dict) else float(wert)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if betrag > 0:
+            saved_usdt_amounts.setdefault(botname, betrag)
+
+    for botname, wert in baeume["base_order_time"].items():
+        try:
+            zeit = _iso_zeit_parsen(wert)
+        except (TypeError, ValueError):
+            continue
+        if zeit:
+            base_order_times.setdefault(botname, zeit)
+
+    for botname, kaeufe in baeume["kaufpreise"].items():
+        if not isinstance(kaeufe, dict) or not kaeufe:
+            continue
+        # wie beim Zählen im Webhook: Anzahl Nachkäufe = Anzahl Käufe - 1
+        alarm_counter.setdefault(botname, anzahl_kaeufe(kaufpreise_aus_knoten(kaeufe)) - 1)
+        status_fuer_alle.setdefault(botname, "OK")
+
+    deadlines_laden(baeume["deadlines"], firebase_secret)
+
+    dauer = time.perf_counter() - start
+    warmup_status.update({
+        "fertig": True,
+        "dauer_s": round(dauer, 3),
+        "ordergroesse": len(baeume["ordergroesse"]),
+        "base_order_time": len(baeume["base_order_time"]),
+        "kaufpreise": len(baeume["kaufpreise"]),
+        "deadlines": len(baeume["deadlines"]),
+        "fehler": fehler
+    })
+    print(f"Warm-up aus Firebase in {dauer:.3f}s: {warmup_status}")
+    return warmup_status
     
 def set_leverage(api_key, secret_key, symbol, leverage, position_side="LONG"):
     endpoint = "/openApi/swap/v2/trade/leverage"
@@ -478,8 +1674,9 @@ def SHORT_generate_signature(secret_key: str, params: str) -> str:
 def SHORT_send_signed_request(http_method, endpoint, api_key, secret_key, params=None):
     if params is None:
         params = {}
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params['timestamp'] = timestamp
+    params['recvWindow'] = RECV_WINDOW
     # create canonical query string by sorting keys
     query_string = "&".join(f"{k}={params[k]}" for k in sorted(params))
     signature = hmac.new(secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
@@ -487,37 +1684,38 @@ def SHORT_send_signed_request(http_method, endpoint, api_key, secret_key, params
     url = f"{BASE_URL}{endpoint}"
     headers = {"X-BX-APIKEY": api_key}
     if http_method == "GET":
-        response = requests.get(url, headers=headers, params=params)
+        response = http_anfrage("GET", url, headers=headers, params=params, hedge=endpoint)
     elif http_method == "POST":
-        response = requests.post(url, headers=headers, json=params)
+        response = http_anfrage("POST", url, headers=headers, json=params)
     elif http_method == "DELETE":
-        response = requests.delete(url, headers=headers, params=params)
+        response = http_anfrage("DELETE", url, headers=headers, params=params)
     else:
         raise ValueError("Unsupported HTTP method")
     try:
-        return response.json()
+        return antwort_json(response)
     except Exception:
         return {"code": -1, "msg": "Ungültige API-Antwort", "raw": response.text}
 
 def SHORT_get_futures_balance(api_key: str, secret_key: str):
-    timestamp = int(time.time() * 1000)
-    params = f"timestamp={timestamp}"
+    timestamp = bingx_timestamp()
+    params = f"recvWindow={RECV_WINDOW}&timestamp={timestamp}"
     signature = generate_signature(secret_key, params)
     url = f"{BASE_URL}{BALANCE_ENDPOINT}?{params}&signature={signature}"
     headers = {"X-BX-APIKEY": api_key}
-    resp = requests.get(url, headers=headers)
+    resp = http_anfrage("GET", url, headers=headers)
     try:
-        return resp.json()
+        return antwort_json(resp)
     except Exception:
         return {"code": -1, "msg": "Ungültige Balance-Antwort", "raw": resp.text}
 
 def SHORT_get_current_price(symbol: str):
     url = f"{BASE_URL}{PRICE_ENDPOINT}?symbol={symbol}"
-    resp = requests.get(url)
+    resp = http_anfrage("GET", url, hedge=PRICE_ENDPOINT)
     try:
-        data = resp.json()
+        data = antwort_json(resp)
         if data.get("code") == 0 and "data" in data and "price" in data["data"]:
-            return float(data["data"]["price"])
+            letzte_preise[symbol] = float(data["data"]["price"])
+            return letzte_preise[symbol]
     except Exception:
         pass
     return None
@@ -527,7 +1725,9 @@ def SHORT_firebase_speichere_base_order_time(botname, timestamp, firebase_secret
     try:
         url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
         data = {"base_order_time": timestamp.isoformat()}
-        response = requests.put(url, json=data)
+        response = http_anfrage("PUT", url, json=data)
+        if response.status_code == 200:
+            firebase_spiegel.lokal_setzen("base_order_time", botname, data)
         return f"Base-Order-Zeit für {botname} gespeichert: {timestamp}, Status: {response.status_code}"
     except Exception as e:
         return f"Fehler beim Speichern der Base-Order-Zeit: {e}"
@@ -535,7 +1735,9 @@ def SHORT_firebase_speichere_base_order_time(botname, timestamp, firebase_secret
 def SHORT_firebase_loesche_base_order_time(botname, firebase_secret):
     try:
         url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
-        r = requests.delete(url)
+        r = http_anfrage("DELETE", url)
+        if r.status_code == 200:
+            firebase_spiegel.lokal_setzen("base_order_time", botname, None)
         return f"Base-Order-Zeitpunkt für {botname} gelöscht, Status: {r.status_code}"
     except Exception as e:
         return f"Fehler beim Löschen base_order_time: {e}"
@@ -544,18 +1746,23 @@ def SHORT_firebase_speichere_ordergroesse(botname, betrag, firebase_secret):
     try:
         url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
         data = {"usdt_amount": betrag}
-        r = requests.put(url, json=data)
+        r = http_anfrage("PUT", url, json=data, headers=ETAG_HEADER)
+        if r.status_code == 200:
+            firebase_spiegel.lokal_setzen("ordergroesse", botname, data)
+        _etag_merken(f"ordergroesse/{botname}", r)
         return f"Ordergröße für {botname} gespeichert: {betrag}, Status: {r.status_code}"
     except Exception as e:
         return f"Fehler beim Speichern ordergroesse: {e}"
 
 def SHORT_firebase_lese_ordergroesse(botname, firebase_secret):
     try:
-        url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
-        r = requests.get(url)
-        if r.status_code != 200:
-            return None
-        data = r.json()
+        gespiegelt, data = firebase_spiegel.lesen("ordergroesse", botname)
+        if not gespiegelt:
+            url = f"{FIREBASE_URL}/ordergroesse/{botname}.json?auth={firebase_secret}"
+            r = http_anfrage("GET", url)
+            if r.status_code != 200:
+                return None
+            data = antwort_json(r)
         if isinstance(data, dict) and "usdt_amount" in data:
             return float(data["usdt_amount"])
         elif isinstance(data, (int, float)):
@@ -567,9 +1774,10 @@ def SHORT_firebase_lese_ordergroesse(botname, firebase_secret):
 def SHORT_firebase_speichere_kaufpreis(botname, price, usdt_amount, firebase_secret):
     try:
         url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
-        data = {"price": price, "usdt_amount": usdt_amount}
-        r = requests.post(url, json=data)
+        data = {"price": price, "usdt_amount": usdt_amount, "zeit": datetime.now(timezone.utc).isoformat()}
+        r = http_anfrage("POST", url, json=data)
         if r.status_code == 200:
+            _kaufpreis_spiegeln(botname, r, data)
             return f"Kaufpreis für {botname} erfolgreich gespeichert."
         else:
             return f"Fehler beim Speichern Kaufpreis: {r.status_code} {r.text}"
@@ -579,8 +1787,9 @@ def SHORT_firebase_speichere_kaufpreis(botname, price, usdt_amount, firebase_sec
 def SHORT_firebase_loesche_kaufpreise(botname, firebase_secret):
     try:
         url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
-        r = requests.delete(url)
+        r = http_anfrage("DELETE", url)
         if r.status_code == 200:
+            firebase_spiegel.lokal_setzen("kaufpreise", botname, None)
             return f"Kaufpreise für {botname} gelöscht."
         return f"Fehler beim Löschen Kaufpreise: Status {r.status_code}"
     except Exception as e:
@@ -588,14 +1797,16 @@ def SHORT_firebase_loesche_kaufpreise(botname, firebase_secret):
 
 def SHORT_firebase_lese_kaufpreise(botname, firebase_secret):
     try:
-        url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
-        r = requests.get(url)
-        if r.status_code != 200:
-            return []
-        daten = r.json()
+        gespiegelt, daten = firebase_spiegel.lesen("kaufpreise", botname)
+        if not gespiegelt:
+            url = f"{FIREBASE_URL}/kaufpreise/{botname}.json?auth={firebase_secret}"
+            r = http_anfrage("GET", url)
+            if r.status_code != 200:
+                return []
+            daten = antwort_json(r)
         if not daten:
             return []
-        return [{"price": float(v.get("price", 0)), "usdt_amount": float(v.get("usdt_amount", 0))} for v in daten.values()]
+        return kaufpreise_aus_knoten(daten)
     except Exception:
         return []
 
@@ -621,7 +1832,7 @@ def SHORT_sende_telegram_nachricht(botname, text):
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     payload = {"chat_id": TELEGRAM_CHAT_ID, "text": full_text}
     try:
-        r = requests.post(url, json=payload, timeout=10)
+        r = http_anfrage("POST", url, json=payload, timeout=10)
         return f"Telegram Antwort: {r.status_code}"
     except Exception as e:
         return f"Telegram Fehler: {e}"
@@ -648,22 +1859,24 @@ def SHORT_place_market_order(api_key, secret_key, symbol, usdt_amount, position_
     if price is None:
         return {"code": 99999, "msg": "Failed to get current price"}
     quantity = round(float(usdt_amount) / price, 6)
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params_dict = {
         "symbol": symbol,
         "side": "SELL",  # SHORT eröffnen
         "type": "MARKET",
         "quantity": quantity,
         "positionSide": position_side.upper(),
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
     params_dict["signature"] = generate_signature(secret_key, query_string)
     url = f"{BASE_URL}{ORDER_ENDPOINT}"
     headers = {"X-BX-APIKEY": api_key, "Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, json=params_dict)
+    resp = order_posten(url, headers, params_dict, secret_key)
     try:
-        return resp.json()
+        return antwort_json(resp)
     except Exception:
         return {"code": -1, "msg": "Ungültige API-Antwort", "raw": resp.text}
 
@@ -673,22 +1886,24 @@ def SHORT_place_market_order_close(api_key, secret_key, symbol, position_amt, po
     position_amt: Menge (positiv)
     """
     side = "BUY"  # Short schließen = buy
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params = {
         "symbol": symbol,
         "side": side,
         "type": "MARKET",
         "quantity": round(abs(position_amt), 6),
         "positionSide": position_side.upper(),
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
     query_string = "&".join(f"{k}={params[k]}" for k in sorted(params))
     params["signature"] = generate_signature(secret_key, query_string)
     url = f"{BASE_URL}{ORDER_ENDPOINT}"
     headers = {"X-BX-APIKEY": api_key, "Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, json=params)
+    resp = order_posten(url, headers, params, secret_key)
     try:
-        return resp.json()
+        return antwort_json(resp)
     except Exception:
         return {"code": -1, "msg": "Ungültige API-Antwort", "raw": resp.text}
 
@@ -696,7 +1911,7 @@ def SHORT_place_limit_buy_order(api_key, secret_key, symbol, quantity, limit_pri
     """
     TP für SHORT: BUY Limit (unter Entry).
     """
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params_dict = {
         "symbol": symbol,
         "side": "BUY",        # um Short zu schließen -> BUY
@@ -705,15 +1920,17 @@ def SHORT_place_limit_buy_order(api_key, secret_key, symbol, quantity, limit_pri
         "price": round(limit_price, 6),
         "timeInForce": "GTC",
         "positionSide": position_side.upper(),
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
     params_dict["signature"] = generate_signature(secret_key, query_string)
     url = f"{BASE_URL}{ORDER_ENDPOINT}"
     headers = {"X-BX-APIKEY": api_key, "Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, json=params_dict)
+    resp = order_posten(url, headers, params_dict, secret_key)
     try:
-        return resp.json()
+        return antwort_json(resp)
     except Exception:
         return {"code": -1, "msg": "Ungültige API-Antwort", "raw": resp.text}
 
@@ -721,7 +1938,7 @@ def SHORT_place_stoploss_buy_order(api_key, secret_key, symbol, quantity, stop_p
     """
     SL für SHORT: BUY STOP_MARKET (über Entry) zum Schließen
     """
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params_dict = {
         "symbol": symbol,
         "side": "BUY",  # Short schließen = buy
@@ -729,39 +1946,41 @@ def SHORT_place_stoploss_buy_order(api_key, secret_key, symbol, quantity, stop_p
         "quantity": round(quantity, 6),
         "stopPrice": round(stop_price, 6),
         "positionSide": position_side.upper(),
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
     params_dict["signature"] = generate_signature(secret_key, query_string)
     url = f"{BASE_URL}{ORDER_ENDPOINT}"
     headers = {"X-BX-APIKEY": api_key, "Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, json=params_dict)
+    resp = order_posten(url, headers, params_dict, secret_key)
     try:
-        return resp.json()
+        return antwort_json(resp)
     except Exception:
         return {"code": -1, "msg": "Ungültige API-Antwort", "raw": resp.text}
 
 def SHORT_get_open_orders(api_key, secret_key, symbol):
-    timestamp = int(time.time() * 1000)
-    params = f"symbol={symbol}&timestamp={timestamp}"
+    timestamp = bingx_timestamp()
+    params = f"symbol={symbol}&recvWindow={RECV_WINDOW}&timestamp={timestamp}"
     signature = generate_signature(secret_key, params)
     url = f"{BASE_URL}{OPEN_ORDERS_ENDPOINT}?{params}&signature={signature}"
     headers = {"X-BX-APIKEY": api_key}
-    r = requests.get(url, headers=headers)
+    r = http_anfrage("GET", url, headers=headers, hedge=OPEN_ORDERS_ENDPOINT)
     try:
-        return r.json()
+        return antwort_json(r)
     except Exception:
         return {"code": -1, "msg": "Ungültige Antwort Open Orders", "raw": r.text}
 
 def SHORT_cancel_order(api_key, secret_key, symbol, order_id):
-    timestamp = int(time.time() * 1000)
-    params = f"symbol={symbol}&orderId={order_id}&timestamp={timestamp}"
+    timestamp = bingx_timestamp()
+    params = f"symbol={symbol}&orderId={order_id}&recvWindow={RECV_WINDOW}&timestamp={timestamp}"
     signature = generate_signature(secret_key, params)
     url = f"{BASE_URL}{ORDER_ENDPOINT}?{params}&signature={signature}"
     headers = {"X-BX-APIKEY": api_key}
-    r = requests.delete(url, headers=headers)
+    r = http_anfrage("DELETE", url, headers=headers)
     try:
-        return r.json()
+        return antwort_json(r)
     except Exception:
         return {"code": -1, "msg": "Ungültige Antwort Cancel", "raw": r.text}
 
@@ -775,7 +1994,7 @@ def SHORT_get_current_position(api_key, secret_key, symbol, position_side, logs=
     position_size = 0.0
     liquidation_price = None
     if logs is not None:
-        logs.append(f"Positions Rohdaten: {raw_positions}")
+        logs.ereignis("Positions Rohdaten", raw_positions)
     if response.get("code") == 0:
         for pos in positions:
             if pos.get("symbol") == symbol and pos.get("positionSide", "").upper() == position_side.upper():
@@ -796,178 +2015,785 @@ def SHORT_get_current_position(api_key, secret_key, symbol, position_side, logs=
 
 # === Schließen aller Positionen (nur SHORT relevant) ===
 def SHORT_close_all_positions(api_key, secret_key):
+    return close_all_positions(api_key, secret_key, nur_position_side="SHORT")
+
+def SHORT_get_open_positions_for_all_symbols(api_key, secret_key):
+    endpoint = "/openApi/swap/v2/user/positions"
+    response = send_signed_request("GET", endpoint, api_key, secret_key, {})
+    if response.get("code") != 0:
+        return {"error": True, "msg": response.get("msg", "Fehler beim Abrufen der Positionen"), "data": []}
+    positions = response.get("data", []) or []
+    return {"error": False, "data": positions}
+
+# === Konto-Snapshot: Positionen + Balance einmal pro API-Key, für alle Bots ===
+konto_snapshots = {}  # api_key -> {"zeit", "positionen": {(symbol, side): pos}, "balance"}
+_snapshot_locks = {}
+_snapshot_locks_lock = threading.Lock()
+_snapshot_pool = ThreadPoolExecutor(max_workers=4)
+
+def _snapshot_lock(api_key):
+    with _snapshot_locks_lock:
+        lock = _snapshot_locks.get(api_key)
+        if lock is None:
+            lock = _snapshot_locks[api_key] = threading.Lock()
+        return lock
+
+def konto_snapshot(api_key, secret_key, max_alter=None, erzwingen=False):
+    """
+    Liefert den Snapshot (alle Positionen + Balance) eines Kontos.
+    Innerhalb von max_alter Sekunden teilen sich alle Bots desselben API-Keys einen Snapshot;
+    gleichzeitige Anfragen warten auf denselben Abruf statt selbst abzufragen.
+    """
+    if max_alter is None:
+        max_alter = SNAPSHOT_MAX_ALTER
+    snapshot = konto_snapshots.get(api_key)
+    if not erzwingen and snapshot and time.monotonic() - snapshot["zeit"] <= max_alter:
+        return snapshot
+
+    with _snapshot_lock(api_key):
+        # evtl. hat ein anderer Thread inzwischen abgefragt
+        snapshot = konto_snapshots.get(api_key)
+        if not erzwingen and snapshot and time.monotonic() - snapshot["zeit"] <= max_alter:
+            return snapshot
+
+        zeit = time.monotonic()
+        positions_future = _snapshot_pool.submit(send_signed_request, "GET", "/openApi/swap/v2/user/positions", api_key, secret_key, {})
+        balance_future = _snapshot_pool.submit(get_futures_balance, api_key, secret_key)
+        positions_resp = positions_future.result()
+        balance_resp = balance_future.result()
+
+        positionen = {}
+        if positions_resp.get("code") == 0:
+            for pos in positions_resp.get("data", []) or []:
+                positionen[(pos.get("symbol"), pos.get("positionSide", "").upper())] = pos
+                if pos.get("markPrice"):
+                    letzte_preise[pos.get("symbol")] = _zahl_oder_0(pos.get("markPrice")) or letzte_preise.get(pos.get("symbol"))
+        snapshot = {
+            "zeit": zeit,
+            "ok": positions_resp.get("code") == 0,
+            "code": positions_resp.get("code"),
+            "positionen": positionen,
+            "balance": balance_resp
+        }
+        # Fehlerhafte Abfragen nicht cachen, damit der nächste Bot neu fragt
+        if snapshot["ok"] and balance_resp.get("code") == 0:
+            konto_snapshots[api_key] = snapshot
+        else:
+            konto_snapshots.pop(api_key, None)
+        return snapshot
+
+def konto_snapshot_invalidieren(api_key):
+    # nach eigenen Orders aufrufen, damit niemand mit veralteten Positionen rechnet
+    konto_snapshots.pop(api_key, None)
+
+def snapshot_position(api_key, secret_key, symbol, position_side, logs=None):
+    """
+    Wie get_current_position, aber aus dem Konto-Snapshot.
+    Rückgabe: (position_size, raw_positions des Symbols, liquidation_price)
+    """
+    snapshot = konto_snapshot(api_key, secret_key)
+    raw_positions = [pos for (pos_symbol, _), pos in snapshot["positionen"].items() if pos_symbol == symbol]
+    if logs is not None:
+        logs.ereignis("Positions Rohdaten (Snapshot)", raw_positions)
+
+    position_size = 0
+    liquidation_price = None
+    if not snapshot["ok"]:
+        if logs is not None:
+            logs.append(f"API Antwort Fehlercode: {snapshot['code']}")
+        return position_size, raw_positions, liquidation_price
+
+    pos = snapshot["positionen"].get((symbol, position_side.upper()))
+    if pos:
+        try:
+            position_size = float(pos.get("size", 0)) or float(pos.get("positionAmt", 0))
+            liquidation_price = float(pos.get("liquidationPrice", 0)) if pos.get("liquidationPrice") else None
+            if logs is not None:
+                logs.append(f"Position size: {position_size}, Liquidation price: {liquidation_price}")
+        except (ValueError, TypeError) as e:
+            position_size = 0
+            if logs is not None:
+                logs.append(f"Fehler beim Parsen: {e}")
+    return position_size, raw_positions, liquidation_price
+
+def snapshot_balance(api_key, secret_key):
+    # gleiche Struktur wie get_futures_balance
+    return konto_snapshot(api_key, secret_key)["balance"]
+
+# === Notfall: alle Positionen eines Kontos parallel schließen ===
+def _position_menge(pos):
+    try:
+        return abs(float(pos.get("positionAmt", 0) or pos.get("size", 0) or 0))
+    except (ValueError, TypeError):
+        return 0.0
+
+def _schliess_orders_filtern(open_orders, position_side):
+    # TP (LIMIT) und SL (STOP_MARKET etc.) stehen immer auf der schließenden Seite
+    schliess_side = "SELL" if position_side == "LONG" else "BUY"
+    if not isinstance(open_orders, dict) or open_orders.get("code") != 0:
+        return []
+    return [
+        order for order in open_orders.get("data", {}).get("orders", [])
+        if order.get("positionSide") == position_side and order.get("side") == schliess_side
+    ]
+
+def bot_zustand_loeschen(botname, firebase_secret=None):
+    """
+    Setzt den lokalen Zustand eines Bots zurück (wie bei action=close)
+    und löscht optional Kaufpreise, Ordergröße und Base-Order-Zeit in Firebase.
+    """
+    logs = []
+    saved_usdt_amounts.pop(botname, None)
+    status_fuer_alle.pop(botname, None)
+    alarm_counter.pop(botname, None)
+    base_order_times.pop(botname, None)
+    bot_positionen.pop(botname, None)
+    bot_index_schliessen(botname)
+    _ladder_cache.pop(botname, None)
+    deadline_entfernen(botname, firebase_secret)
+    if firebase_secret:
+        try:
+            logs.append(firebase_loesche_kaufpreise(botname, firebase_secret))
+            logs.append(firebase_loesche_ordergroesse(botname, firebase_secret))
+            logs.append(firebase_loesche_base_order_time(botname, firebase_secret))
+        except Exception as e:
+            logs.append(f"Fehler beim Löschen in Firebase für {botname}: {e}")
+    return logs
+
+def _close_all_bots(api_key, geschlossen, firebase_secret, logs):
+    """
+    Bots des Kontos, deren Position (symbol, seite) geschlossen wurde: botname -> ((symbol, seite), firebase_secret).
+    Nicht nur aus bot_positionen (nach Neustart oder Verdrängen leer), sondern auch aus der Registry
+    und den Deadlines (im Speicher und in Firebase, über den Konto-Schlüssel zugeordnet).
+    """
+    konto = _konto_schluessel(api_key)
+    betroffen = {}
+
+    def pruefen(botname, symbol, seite, secret):
+        schluessel = (symbol, (seite or "LONG").upper())
+        if schluessel in geschlossen and botname not in betroffen:
+            betroffen[botname] = (schluessel, secret or firebase_secret or FIREBASE_SECRET)
+
+    for botname, info in list(bot_positionen.items()):
+        if info.get("api_key") == api_key:
+            pruefen(botname, info.get("symbol"), info.get("position_side"), info.get("firebase_secret"))
+    for botname, cfg in list(bot_registry.items()):
+        if cfg.api_key == api_key:
+            pruefen(botname, cfg.symbol, cfg.position_side, cfg.firebase_secret)
+    with _deadline_bedingung:
+        gemerkt = [(botname, dict(eintrag)) for botname, eintrag in deadlines.items()]
+    for botname, eintrag in gemerkt:
+        if eintrag.get("konto") == konto:
+            pruefen(botname, eintrag.get("symbol"), eintrag.get("position_side"), eintrag.get("firebase_secret"))
+    firebase_secret = firebase_secret or FIREBASE_SECRET
+    if FIREBASE_URL and firebase_secret:
+        # Deadlines anderer Shards oder vor dem Warm-up: nur in Firebase
+        try:
+            baum = firebase_baum_lesen("deadlines", firebase_secret)
+        except Exception as e:
+            logs.append(f"Fehler beim Lesen der Deadlines aus Firebase: {e}")
+            baum = {}
+        for botname, wert in baum.items():
+            if isinstance(wert, dict) and wert.get("konto") == konto:
+                pruefen(botname, wert.get("symbol"), wert.get("position_side"), None)
+    return betroffen
+
+def _bot_zuruecksetzen(botname, firebase_secret):
+    # unter der Bot-Sperre, damit kein laufender Alarm den Zustand zwischen Schließen und Zurücksetzen neu schreibt
+    with bot_sperre(botname):
+        nur_in_firebase = botname not in deadlines
+        logs = bot_zustand_loeschen(botname, firebase_secret)
+        if nur_in_firebase and FIREBASE_URL and firebase_secret:
+            # deadline_entfernen löscht in Firebase nur, was im Speicher geplant war
+            try:
+                firebase_loesche_deadline(botname, firebase_secret)
+            except Exception as e:
+                logs.append(f"Fehler beim Löschen der Deadline von {botname} in Firebase: {e}")
+        return logs
+
+def close_all_positions(api_key, secret_key, firebase_secret=None, nur_position_side=None):
+    """
+    Schließt alle offenen Positionen eines Kontos (LONG und SHORT) parallel.
+    1. Alle Positionen mit einem einzigen Aufruf holen
+    2. Market-Close und Abfrage der offenen Orders pro Symbol parallel
+    3. TP/SL-Orders parallel löschen, passenden Bot-Zustand zurücksetzen
+    nur_position_side: optional "LONG" oder "SHORT", sonst beide Seiten
+    """
+    start = time.perf_counter()
     logs = []
-    closed_positions = []
-    positions_resp = get_open_positions_for_all_symbols(api_key, secret_key)
+    positions_resp = SHORT_get_open_positions_for_all_symbols(api_key, secret_key)
     if positions_resp.get("error"):
         sende_telegram_nachricht("BingX Bot", f"Fehler beim Abrufen der Positionen: {positions_resp.get('msg')}")
         logs.append("Fehler beim Abrufen der Positionen")
         return {"error": True, "msg": "Konnte offene Positionen nicht abrufen", "logs": logs}
-    positions = positions_resp.get("data", [])
-    if not positions:
-        logs.append("Keine offenen Positionen")
-        return {"error": False, "msg": "Keine offenen Positionen", "closed": [], "logs": logs}
-    for pos in positions:
+
+    ziele = []
+    markpreise = {}
+    for pos in positions_resp.get("data", []):
         symbol = pos.get("symbol")
         position_side = pos.get("positionSide", "").upper()
-        qty = float(pos.get("positionAmt", 0) or pos.get("size", 0) or 0)
-        if position_side != "SHORT":
-            continue  # nur SHORTs schließen
-        if qty == 0:
+        qty = _position_menge(pos)
+        if not symbol or qty == 0 or position_side not in ("LONG", "SHORT"):
             continue
-        try:
-            resp = place_market_order_close(api_key, secret_key, symbol, qty, position_side)
-            logs.append(f"Closed {symbol} {position_side} ({qty}) → {resp}")
-            closed_positions.append({
-                "symbol": symbol,
-                "side": position_side,
-                "quantity": qty,
-                "response": resp
-            })
-        except Exception as e:
-            message = f"⚠️ Fehler beim Schließen von {symbol} {position_side}: {e}"
-            sende_telegram_nachricht("BingX Bot", message)
-            logs.append(message)
-    return {"error": False, "closed": closed_positions, "logs": logs}
+        if nur_position_side and position_side != nur_position_side.upper():
+            continue
+        ziele.append((symbol, position_side, qty))
+        markpreise[(symbol, position_side)] = _zahl_oder_0(pos.get("markPrice"))
 
-def SHORT_get_open_positions_for_all_symbols(api_key, secret_key):
-    endpoint = "/openApi/swap/v2/user/positions"
-    response = send_signed_request("GET", endpoint, api_key, secret_key, {})
-    if response.get("code") != 0:
-        return {"error": True, "msg": response.get("msg", "Fehler beim Abrufen der Positionen"), "data": []}
-    positions = response.get("data", []) or []
-    return {"error": False, "data": positions}
+    if not ziele:
+        logs.append("Keine offenen Positionen")
+        return {"error": False, "msg": "Keine offenen Positionen", "closed": [], "logs": logs,
+                "dauer_bis_flat_s": round(time.perf_counter() - start, 3)}
+
+    ergebnisse = {(symbol, side): {"symbol": symbol, "side": side, "quantity": qty} for symbol, side, qty in ziele}
+    symbole = sorted({symbol for symbol, _, _ in ziele})
+
+    with ThreadPoolExecutor(max_workers=FLATTEN_MAX_WORKERS) as pool:
+        # Schließen zuerst abschicken – hier zählt jede Sekunde
+        close_futures = {
+            (symbol, side): pool.submit(place_market_order_close, api_key, secret_key, symbol, qty, side)
+            for symbol, side, qty in ziele
+        }
+        order_futures = {symbol: pool.submit(get_open_orders, api_key, secret_key, symbol) for symbol in symbole}
+
+        for key, future in close_futures.items():
+            try:
+                resp = future.result()
+                ergebnisse[key]["response"] = resp
+                ergebnisse[key]["closed"] = isinstance(resp, dict) and resp.get("code") == 0
+            except Exception as e:
+                ergebnisse[key]["response"] = None
+                ergebnisse[key]["closed"] = False
+                ergebnisse[key]["error"] = str(e)
+        flat_zeit = time.perf_counter() - start
+
+        cancel_futures = {}
+        for symbol, future in order_futures.items():
+            try:
+                open_orders = future.result()
+            except Exception as e:
+                logs.append(f"Fehler beim Abrufen der offenen Orders für {symbol}: {e}")
+                continue
+            for symbol_side in ("LONG", "SHORT"):
+                if (symbol, symbol_side) not in ergebnisse:
+                    continue
+                for order in _schliess_orders_filtern(open_orders, symbol_side):
+                    order_id = str(order.get("orderId"))
+                    cancel_futures[(symbol, symbol_side, order_id)] = pool.submit(cancel_order, api_key, secret_key, symbol, order_id)
+
+        geschlossen = {schluessel for schluessel, r in ergebnisse.items() if r.get("closed")}
+        betroffene = _close_all_bots(api_key, geschlossen, firebase_secret, logs)
+        betroffene_bots = sorted(betroffene)
+        for botname in betroffene_bots:
+            schluessel, _ = betroffene[botname]
+            order = ((ergebnisse[schluessel].get("response") or {}).get("data") or {}).get("order") or {}
+            handel_ereignis("close", botname, schluessel[0], schluessel[1], ergebnisse[schluessel]["quantity"],
+                            _zahl_oder_0(order.get("avgPrice")) or markpreise.get(schluessel), api_key=api_key)
+        reset_futures = {botname: pool.submit(_bot_zuruecksetzen, botname, betroffene[botname][1]) for botname in betroffene_bots}
+
+        for (symbol, side, order_id), future in cancel_futures.items():
+            try:
+                resp = future.result()
+            except Exception as e:
+                resp = {"code": -1, "msg": str(e)}
+            ergebnisse[(symbol, side)].setdefault("cancelled_orders", []).append({"orderId": order_id, "response": resp})
+        for botname, future in reset_futures.items():
+            try:
+                logs.extend(future.result())
+            except Exception as e:
+                logs.append(f"Fehler beim Zurücksetzen von {botname}: {e}")
+
+    konto_snapshot_invalidieren(api_key)
+    fehler = [r for r in ergebnisse.values() if not r.get("closed")]
+    gesamt_zeit = time.perf_counter() - start
+    logs.append(f"{len(ergebnisse) - len(fehler)}/{len(ergebnisse)} Positionen geschlossen in {flat_zeit:.3f}s (gesamt {gesamt_zeit:.3f}s)")
+    if fehler:
+        sende_telegram_nachricht("BingX Bot", "⚠️ Notfall-Schließen unvollständig: " + ", ".join(f"{r['symbol']} {r['side']}" for r in fehler))
+    return {
+        "error": bool(fehler),
+        "closed": list(ergebnisse.values()),
+        "bots_zurueckgesetzt": betroffene_bots,
+        "dauer_bis_flat_s": round(flat_zeit, 3),
+        "dauer_gesamt_s": round(gesamt_zeit, 3),
+        "logs": logs
+    }
 
 # === Close helper für webhook 'close' action ===
 def SHORT_close_open_position(api_key, secret_key, symbol, position_side="SHORT"):
-    logs = []
+    logs = RequestLog()
     position_size, _, liquidation_price = get_current_position(api_key, secret_key, symbol, position_side, logs=logs)
     if position_size == 0:
         logs.append(f"Keine offene Position für {symbol} ({position_side}) gefunden.")
         return {"code": 1, "msg": "Keine offene Position", "logs": logs}
     side = "BUY"  # Short schließen
-    timestamp = int(time.time() * 1000)
+    timestamp = bingx_timestamp()
     params_dict = {
         "symbol": symbol,
         "side": side,
         "type": "MARKET",
         "quantity": round(position_size, 6),
         "positionSide": position_side.upper(),
-        "timestamp": timestamp
+        "clientOrderID": neue_client_order_id(),
+        "timestamp": timestamp,
+        "recvWindow": RECV_WINDOW
     }
     query_string = "&".join(f"{k}={params_dict[k]}" for k in sorted(params_dict))
     params_dict["signature"] = generate_signature(secret_key, query_string)
     url = f"{BASE_URL}{ORDER_ENDPOINT}"
     headers = {"X-BX-APIKEY": api_key, "Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, json=params_dict)
+    resp = order_posten(url, headers, params_dict, secret_key)
     try:
-        result = resp.json()
+        result = antwort_json(resp)
     except Exception as e:
         result = {"code": -1, "msg": f"Fehler beim Parsen der API-Antwort: {e}", "raw_response": resp.text}
-    logs.append(f"Schließen der Position: {result}")
+    logs.ereignis("Schließen der Position", result)
     return {"result": result, "logs": logs}
 
 
 
-@app.route('/webhook', methods=['POST'])
-def webhook():
+# === Bot-Registry: Konfigurationen einmal laden statt RENDER bei jedem Alarm zu parsen ===
+class BotConfig:
+    """
+    Feste Konfiguration eines Bots (alles aus RENDER außer price/base_time2).
+    Wird beim Laden validiert und in die richtigen Typen umgewandelt.
+    """
+    __slots__ = (
+        "botname", "api_key", "secret_key", "symbol", "position_side", "firebase_secret",
+        "pyramiding", "leverage", "sicherheit", "sell_percentage", "sell_percentage2",
+        "usdt_factor", "bo_factor", "after_h", "after_so", "beenden", "sl", "alarm", "so_abstand", "webhook_token"
+    )
+
+    @staticmethod
+    def _zahl(render, feld, default=None):
+        wert = render.get(feld, default)
+        if wert is None or wert == "":
+            return default
+        try:
+            return float(wert)
+        except (TypeError, ValueError):
+            raise ValueError(f"{feld} muss eine Zahl sein, erhalten: {wert!r}")
+
+    @classmethod
+    def aus_dict(cls, render, botname=None, streng=False):
+        """
+        Baut die Konfiguration aus einem RENDER-Block.
+        streng=True (Registry): api_key, secret_key, symbol und webhook_token sind Pflicht.
+        """
+        cfg = cls()
+        cfg.botname = botname or render.get("botname")
+        cfg.api_key = render.get("api_key")
+        cfg.secret_key = render.get("secret_key")
+        cfg.symbol = render.get("symbol", "")
+        cfg.position_side = (render.get("position_side") or render.get("positionSide") or "LONG").upper()
+        cfg.firebase_secret = render.get("FIREBASE_SECRET")
+        cfg.pyramiding = cls._zahl(render, "pyramiding", 1.0)
+        cfg.leverage = cls._zahl(render, "leverage", 1.0)
+        cfg.sicherheit = cls._zahl(render, "sicherheit", 0.0)
+        cfg.sell_percentage = cls._zahl(render, "sell_percentage")
+        cfg.sell_percentage2 = cls._zahl(render, "sell_percentage2")
+        cfg.usdt_factor = cls._zahl(render, "usdt_factor", 1.0)
+        cfg.bo_factor = cls._zahl(render, "bo_factor", 0.0001)
+        cfg.after_h = cls._zahl(render, "after_h", 48.0)
+        cfg.after_so = cls._zahl(render, "after_so", 14.0)
+        cfg.beenden = str(render.get("beenden", "nein") or "nein")
+        cfg.sl = cls._zahl(render, "sl")
+        cfg.alarm = int(cls._zahl(render, "alarm", 0.0))
+        cfg.so_abstand = cls._zahl(render, "so_abstand")
+        cfg.webhook_token = render.get("webhook_token")
+
+        if not cfg.botname:
+            raise ValueError("botname ist erforderlich")
+        if cfg.position_side not in ("LONG", "SHORT"):
+            raise ValueError(f"Unbekannte position_side: {cfg.position_side}")
+        if streng:
+            if not cfg.api_key or not cfg.secret_key:
+                raise ValueError(f"{cfg.botname}: api_key und secret_key sind erforderlich")
+            if not cfg.symbol:
+                raise ValueError(f"{cfg.botname}: symbol ist erforderlich")
+            if not cfg.webhook_token:
+                raise ValueError(f"{cfg.botname}: webhook_token ist erforderlich (muss im Alarm als \"token\" mitkommen)")
+        return cfg
+
+class ZugriffVerweigert(ValueError):
+    pass
+
+def _env_aufloesen(render):
+    # "env:NAME" -> Umgebungsvariable NAME, damit Secrets nicht in der Datei stehen. Nur für die Registry-Datei!
+    return {k: (os.environ.get(v[4:], "") if isinstance(v, str) and v.startswith("env:") else v) for k, v in render.items()}
+
+bot_registry = {}  # botname -> BotConfig
+
+def bot_registry_laden(pfad=None):
+    """
+    Lädt alle Bots aus einer JSON-Datei {"Baby_Bot": {RENDER-Felder}, ...}.
+    Ungültige Einträge brechen das Laden ab, damit Fehler beim Start auffallen und nicht beim ersten Alarm.
+    """
+    pfad = pfad or BOT_REGISTRY_DATEI
+    if not pfad:
+        return bot_registry
+    with open(pfad, encoding="utf-8") as f:
+        eintraege = json.load(f)
+    neu = {botname: BotConfig.aus_dict(_env_aufloesen(render), botname=botname, streng=True) for botname, render in eintraege.items()}
+    bot_registry.clear()
+    bot_registry.update(neu)
+    print(f"Bot-Registry geladen: {len(bot_registry)} Bots aus {pfad}")
+    return bot_registry
+
+def bot_config_fuer_alarm(data):
+    """
+    Registry-Bots brauchen im Alarm nur botname und token (+ price, vyn); alle anderen werden wie bisher aus RENDER gelesen.
+    Ohne passenden token werden die gespeicherten Zugangsdaten nicht verwendet (ZugriffVerweigert).
+    """
+    render = data.get("RENDER") or {}
+    cfg = bot_registry.get(render.get("botname"))
+    if cfg is not None:
+        token = render.get("token")
+        if not isinstance(token, str) or not hmac.compare_digest(token.encode(), str(cfg.webhook_token).encode()):
+            raise ZugriffVerweigert(f"{cfg.botname}: token fehlt oder ist falsch")
+        return cfg
+    return BotConfig.aus_dict(render)
+
+# === SO-Leiter: Ordergrößen, Kapitalbedarf und Liquidationsabstand im Voraus berechnen ===
+_ladder_cache = {}  # botname -> (eingaben, leiter)
+bot_zustaende.verdraengen_abonnenten.append(lambda botname: _ladder_cache.pop(botname, None))
+
+def _geom_summe(q, n):
+    # 1 + q + q^2 + ... + q^(n-1)
+    if n <= 0:
+        return 0.0
+    if abs(q - 1) < 1e-12:
+        return float(n)
+    return (q ** n - 1) / (q - 1)
+
+def ladder_berechnen(bo_usdt, usdt_factor, anzahl_so, position_side="LONG", preis=None, so_abstand=None, kapital=None):
+    """
+    Leiter aus BO und anzahl_so Nachkäufen, Ordergröße SO k = bo_usdt * usdt_factor^k.
+    Kumulierter Einsatz und Menge über die geschlossene Form der geometrischen Reihe.
+    Mit preis und so_abstand (Prozent, fester Abstand pro SO) zusätzlich erwarteter Durchschnittspreis,
+    mit kapital (Margin ohne Hebel) ungefähr Liquidationspreis bei Cross-Margin: avg ∓ kapital / menge.
+    """
+    f = float(usdt_factor)
+    r = None
+    if preis and so_abstand:
+        r = 1 - so_abstand / 100 if position_side == "LONG" else 1 + so_abstand / 100
+    stufen = []
+    for k in range(anzahl_so + 1):
+        stufe = {
+            "so": k,
+            "usdt": round(bo_usdt * f ** k, 4),
+            "kumuliert_usdt": round(bo_usdt * _geom_summe(f, k + 1), 4),
+        }
+        if r is not None:
+            stufe["preis"] = round(preis * r ** k, 8)
+            menge = bo_usdt / preis * _geom_summe(f / r, k + 1)
+            durchschnitt = bo_usdt * _geom_summe(f, k + 1) / menge
+            stufe["durchschnittspreis"] = round(durchschnitt, 8)
+            if kapital:
+                liq = max(durchschnitt - kapital / menge, 0.0) if position_side == "LONG" else durchschnitt + kapital / menge
+                stufe["liq_preis"] = round(liq, 8)
+                stufe["liq_abstand_pct"] = round(abs(stufe["preis"] - liq) / stufe["preis"] * 100, 2)
+        stufen.append(stufe)
+    return {
+        "bo_usdt": round(bo_usdt, 4),
+        "usdt_factor": f,
+        "anzahl_so": anzahl_so,
+        "gesamt_usdt": round(bo_usdt * _geom_summe(f, anzahl_so + 1), 4),
+        "stufen": stufen,
+    }
+
+def bot_ladder(botname, cfg, usdt_amount, so_index, available_usdt, preis):
+    """
+    Leiter eines Bots aus der aktuellen Order (SO so_index) ableiten und cachen.
+    Neu gerechnet wird nur, wenn sich die Eingaben ändern; Startpreis und Kapital stammen von der BO.
+    """
+    f = cfg.usdt_factor or 1.0
+    bo_usdt = usdt_amount / f ** so_index
+    alt = _ladder_cache.get(botname)
+    if so_index == 0 or alt is None:
+        hebel = cfg.leverage or 1.0
+        start_preis = float(preis) if preis else None
+        kapital = available_usdt / hebel if available_usdt else None
+    else:
+        start_preis, kapital = alt[0][4], alt[0][6]
+    eingaben = (round(bo_usdt, 8), f, max(int(cfg.pyramiding or 1) - 1, 0), cfg.position_side, start_preis, cfg.so_abstand, kapital)
+    if alt is not None and alt[0] == eingaben:
+        return alt[1]
+    leiter = ladder_berechnen(*eingaben)
+    leiter["verfuegbar_bei_bo"] = available_usdt if so_index == 0 else (alt[1].get("verfuegbar_bei_bo") if alt else None)
+    _ladder_cache[botname] = (eingaben, leiter)
+    return leiter
+
+def margin_pruefen(botname, cfg, usdt_amount, available_usdt, preis, logs, telegram):
+    """
+    Vor der Market-Order: passt die Order in die freie Margin, reicht das Kapital für die restliche Leiter?
+    Rückgabe: None oder eine Fehlerantwort (nur bei LADDER_PRUEFUNG=ablehnen).
+    """
+    if LADDER_PRUEFUNG == "aus" or not usdt_amount:
+        return None
+    so_index = alarm_counter.get(botname, -1) + 1
+    try:
+        leiter = bot_ladder(botname, cfg, float(usdt_amount), so_index, available_usdt, preis)
+    except (TypeError, ValueError, ZeroDivisionError) as e:
+        logs.append(f"Leiter konnte nicht berechnet werden: {e}")
+        return None
+    if so_index == 0 and available_usdt:
+        zu_gross = next((s for s in leiter["stufen"] if s["kumuliert_usdt"] > available_usdt), None)
+        if zu_gross is not None:
+            logs.append(f"⚠️ Leiter mit {leiter['anzahl_so']} SO braucht {leiter['gesamt_usdt']} USDT, frei {available_usdt} → reicht nur bis SO {zu_gross['so'] - 1}")
+            telegram(botname, f"⚠️ Kapital reicht nur bis SO {zu_gross['so'] - 1} (Leiter {leiter['gesamt_usdt']} USDT, frei {round(available_usdt, 2)} USDT)")
+    if not available_usdt or float(usdt_amount) <= available_usdt:
+        return None
+
+    text = f"Order {round(float(usdt_amount), 2)} USDT (SO {so_index}) größer als freie Margin {round(available_usdt, 2)} USDT"
+    if LADDER_PRUEFUNG != "ablehnen":
+        logs.append(f"⚠️ {text}")
+        telegram(botname, f"⚠️ {text}")
+        return None
+    # Ordergröße zurücksetzen, sonst wird beim nächsten Alarm nochmals mit usdt_factor multipliziert
+    if so_index > 0:
+        saved_usdt_amounts[botname] = float(usdt_amount) / (cfg.usdt_factor or 1.0)
+    else:
+        saved_usdt_amounts.pop(botname, None)
+    logs.append(f"❌ {text} → keine Order gesetzt")
+    telegram(botname, f"❌ {text} → Order abgelehnt")
+    return {"error": True, "msg": text, "botname": botname, "logs": logs}, 400
+
+# === Idempotenz: doppelte TradingView-Alarme nur einmal ausführen ===
+_idem_cache = OrderedDict()  # schluessel -> (ablauf, body, status), älteste zuerst
+_idem_laufend = {}  # schluessel -> threading.Event, solange der erste Alarm noch läuft
+_idem_lock = threading.Lock()
+_idem_db = threading.local()  # eine SQLite-Verbindung pro Thread, damit DB-Zugriffe nicht unter _idem_lock laufen
+_idem_db_schreibzaehler = itertools.count(1)
+
+def idempotenz_schluessel(data):
+    """
+    Schlüssel eines Alarms: explizite alert_id oder Hash aus botname, action, price und Bar-Zeit.
+    Ohne alert_id und ohne Bar-Zeit ("time": {{time}}) wird nicht dedupliziert,
+    da zwei echte Nachkäufe zum gleichen Preis sonst verschluckt würden.
+    """
+    vyn = data.get("vyn") or {}
+    render = data.get("RENDER") or {}
+    botname = render.get("botname")
+    alert_id = data.get("alert_id") or vyn.get("alert_id") or render.get("alert_id")
+    if alert_id:
+        roh = f"id|{botname}|{alert_id}"
+    else:
+        bar_zeit = vyn.get("time") or render.get("time") or data.get("time")
+        if not bar_zeit:
+            return None
+        roh = f"{botname}|{vyn.get('action', '').lower()}|{render.get('price')}|{bar_zeit}"
+    return hashlib.sha256(roh.encode("utf-8")).hexdigest()
+
+def _idem_db_verbindung():
+    if not IDEMPOTENZ_DB:
+        return None
+    db = getattr(_idem_db, "verbindung", None)
+    if db is None:
+        db = _idem_db.verbindung = sqlite3.connect(IDEMPOTENZ_DB, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")  # Leser blockieren Schreiber anderer Threads nicht
+        db.execute("CREATE TABLE IF NOT EXISTS alarme (schluessel TEXT PRIMARY KEY, ablauf REAL, status INTEGER, body TEXT)")
+        db.commit()
+    return db
+
+def _idem_lesen(schluessel, jetzt):
+    # Aufruf nur mit _idem_lock, nur der Speicher
+    eintrag = _idem_cache.get(schluessel)
+    if eintrag and eintrag[0] > jetzt:
+        return eintrag
+    return None
+
+def _idem_merken(schluessel, eintrag, jetzt):
+    # Aufruf nur mit _idem_lock
+    _idem_cache[schluessel] = eintrag
+    _idem_cache.move_to_end(schluessel)
+    while _idem_cache:
+        ablauf = next(iter(_idem_cache.values()))[0]
+        if ablauf > jetzt and len(_idem_cache) <= IDEMPOTENZ_MAX:
+            break
+        _idem_cache.popitem(last=False)
+
+def _idem_db_lesen(schluessel, jetzt):
+    # ohne _idem_lock; der Aufrufer hält den Schlüssel in _idem_laufend
+    db = _idem_db_verbindung()
+    if db is None:
+        return None
+    try:
+        zeile = db.execute("SELECT ablauf, body, status FROM alarme WHERE schluessel = ?", (schluessel,)).fetchone()
+    except Exception as e:
+        print(f"[Fehler] Idempotenz-DB: {e}")
+        return None
+    if zeile and zeile[0] > time.time():
+        # Ablauf in der DB ist Wandzeit, im Speicher monotone Zeit
+        return (jetzt + zeile[0] - time.time(), json_loads(zeile[1]), zeile[2])
+    return None
+
+def _idem_db_speichern(schluessel, body, status):
+    # ohne _idem_lock; der Aufrufer hält den Schlüssel in _idem_laufend
+    db = _idem_db_verbindung()
+    if db is None:
+        return
+    try:
+        db.execute("INSERT OR REPLACE INTO alarme VALUES (?, ?, ?, ?)",
+                   (schluessel, time.time() + IDEMPOTENZ_TTL, status, json_dumps(body)))
+        if next(_idem_db_schreibzaehler) % 100 == 0:
+            db.execute("DELETE FROM alarme WHERE ablauf < ?", (time.time(),))
+        db.commit()
+    except Exception as e:
+        print(f"[Fehler] Idempotenz-DB: {e}")
+
+def idempotent_ausfuehren(schluessel, funktion, warte_timeout=120):
+    """
+    Führt funktion() für einen Schlüssel höchstens einmal erfolgreich innerhalb von IDEMPOTENZ_TTL aus.
+    Rückgabe: (body, status, wiederholung) – bei Duplikaten das Ergebnis der ersten Ausführung.
+    Gemerkt werden nur Erfolge und endgültige Ablehnungen (Status < 500); nach 5xx oder einer Exception
+    darf TradingView denselben Alarm erneut schicken und er wird wieder ausgeführt.
+    """
+    while True:
+        with _idem_lock:
+            eintrag = _idem_lesen(schluessel, time.monotonic())
+            if eintrag:
+                return eintrag[1], eintrag[2], True
+            event = _idem_laufend.get(schluessel)
+            if event is None:
+                event = _idem_laufend[schluessel] = threading.Event()
+                break
+        # gleicher Alarm läuft gerade noch -> auf dessen Ergebnis warten
+        if not event.wait(warte_timeout):
+            return {"error": True, "msg": "Gleicher Alarm wird noch verarbeitet"}, 409, True
+
+    try:
+        # nach einem Neustart nur in der DB; gleiche Alarme warten derweil auf event, andere Schlüssel laufen weiter
+        eintrag = _idem_db_lesen(schluessel, time.monotonic())
+        if eintrag:
+            with _idem_lock:
+                _idem_merken(schluessel, eintrag, time.monotonic())
+            return eintrag[1], eintrag[2], True
+        ergebnis = funktion()
+        body, status = ergebnis if isinstance(ergebnis, tuple) else (ergebnis, 200)
+        if status < 500:
+            jetzt = time.monotonic()
+            with _idem_lock:
+                _idem_merken(schluessel, (jetzt + IDEMPOTENZ_TTL, body, status), jetzt)
+            _idem_db_speichern(schluessel, body, status)
+        return body, status, False
+    finally:
+        with _idem_lock:
+            _idem_laufend.pop(schluessel, None)
+        event.set()
+
+@app.route('/close_all', methods=['POST'])
+def close_all():
+    # Notfall: alle Positionen des Kontos schließen, TP/SL löschen, Bot-Zustand zurücksetzen
+    # Zugang: api_key + secret_key oder (Registry) botname + token, dann mit den Schlüsseln dieses Bots
+    data = request.json or {}
+    render = data.get("RENDER", {})
+    api_key = render.get("api_key")
+    secret_key = render.get("secret_key")
+    firebase_secret = render.get("FIREBASE_SECRET")
+    if (not api_key or not secret_key) and render.get("botname") in bot_registry:
+        try:
+            cfg = bot_config_fuer_alarm(data)
+        except ZugriffVerweigert as e:
+            return jsonify({"error": True, "msg": str(e)}), 403
+        api_key, secret_key, firebase_secret = cfg.api_key, cfg.secret_key, firebase_secret or cfg.firebase_secret
+    if not api_key or not secret_key:
+        return jsonify({"error": True, "msg": "api_key und secret_key (oder botname und token) sind erforderlich"}), 400
+    nur_position_side = data.get("position_side") or render.get("position_side")
+    # Notfall läuft auch beim Herunterfahren, zählt aber als laufender Alarm; im Pool vor allen BO/SO
+    with alarm_in_arbeit():
+        ergebnis = alarm_pool.einreihen(f"_konto_{api_key}", PRIO_SCHLIESSEN, lambda: close_all_positions(
+            api_key, secret_key, firebase_secret, nur_position_side)).result()
+    return jsonify(ergebnis), (500 if ergebnis.get("error") else 200)
+
+def webhook_verarbeiten(data):
     global saved_usdt_amounts
     global status_fuer_alle
     global alarm_counter
     global base_order_times
 
-    data = request.json
-    logs = []
+    logs = RequestLog()
 
-    position_side = data.get("RENDER", {}).get("position_side") or data.get("RENDER", {}).get("positionSide") or "LONG"    #data.get("position_side") or data.get("positionSide") or "LONG"
+    try:
+        cfg = bot_config_fuer_alarm(data)
+    except ZugriffVerweigert as e:
+        return {"error": True, "msg": str(e)}, 403
+    except ValueError as e:
+        return {"error": True, "msg": str(e)}, 400
+    render = data.get("RENDER") or {}
 
-    if position_side == "LONG":  
+    position_side = cfg.position_side
 
-        data = request.json or {}
-        logs = []
-    
+    if position_side == "LONG":  
 
-     
+        logs = RequestLog()
     
-        botname = data.get("RENDER", {}).get("botname")    #data.get("botname")
-        if not botname:
-            return jsonify({"error": True, "msg": "botname ist erforderlich"}), 400
+        botname = cfg.botname
     
-        symbol = data.get("RENDER", {}).get("symbol", "")  #data.get("symbol", "BTC-USDT")
+        symbol = cfg.symbol
         base_asset = symbol.split("-")[0]  # Nur für menschliche Logs
     
         # Hole den gespeicherten Wert für den Bot, falls vorhanden
         saved_usdt_amount = saved_usdt_amounts.get(botname)
     
         # Eingabewerte
-        pyramiding = float(data.get("RENDER", {}).get("pyramiding", 1))  #float(data.get("pyramiding", 1))
-        leverageB = float(data.get("RENDER", {}).get("leverage", 1))     #float(data.get("leverage", 1))
-        sicherheit = float(data.get("RENDER", {}).get("sicherheit", 0) * leverageB)    #float(data.get("sicherheit", 0) * leverageB)
-        sell_percentage = data.get("RENDER", {}).get("sell_percentage")    #data.get("sell_percentage")
-        api_key = data.get("RENDER", {}).get("api_key")    #data.get("api_key")
-        secret_key = data.get("RENDER", {}).get("secret_key")   #data.get("secret_key")
-        position_side = data.get("RENDER", {}).get("position_side") or data.get("RENDER", {}).get("positionSide") or "LONG"    #data.get("position_side") or data.get("positionSide") or "LONG"
-        firebase_secret = data.get("RENDER", {}).get("FIREBASE_SECRET")    #data.get("FIREBASE_SECRET")
-        price_from_webhook = data.get("RENDER", {}).get("price")    #data.get("price")
-        usdt_factor = float(data.get("RENDER", {}).get("usdt_factor", 1))    #float(data.get("usdt_factor", 1))
-        bo_factor = float(data.get("RENDER", {}).get("bo_factor", 0.0001))    #float(data.get("bo_factor", 0.0001))
-        action = data.get("vyn", {}).get("action", "").lower()    #KOMMT VON VYN     data.get("action", "").lower()
-        base_time2 = data.get("RENDER", {}).get("base_time2")
-        after_h = data.get("RENDER", {}).get("after_h")
-        after_so = data.get("RENDER", {}).get("after_so")
-        sell_percentage2 = data.get("RENDER", {}).get("sell_percentage2")
-        beenden = data.get("RENDER", {}).get("beenden", "nein")
-        sl = data.get("RENDER", {}).get("sl")
+        pyramiding = cfg.pyramiding
+        leverageB = cfg.leverage
+        sicherheit = cfg.sicherheit * leverageB
+        sell_percentage = cfg.sell_percentage
+        api_key = cfg.api_key
+        secret_key = cfg.secret_key
+        firebase_secret = cfg.firebase_secret
+        price_from_webhook = render.get("price")
+        usdt_factor = cfg.usdt_factor
+        bo_factor = cfg.bo_factor
+        action = data.get("vyn", {}).get("action", "").lower()    #KOMMT VON VYN
+        base_time2 = render.get("base_time2")
+        after_h = cfg.after_h
+        after_so = cfg.after_so
+        sell_percentage2 = cfg.sell_percentage2
+        beenden = cfg.beenden
+        sl = cfg.sl
 
        # Check: Offene SHORT-Position
         # ------------------------------
         try:
-            short_position_size, _, _ = get_current_position(api_key, secret_key, symbol, "SHORT", logs)
+            short_position_size, _, _ = snapshot_position(api_key, secret_key, symbol, "SHORT", logs)
             logs.append(f"Short Position Size: {short_position_size}")
             if short_position_size and short_position_size > 0:
                 logs.append("Offene SHORT-Position vorhanden → keine Aktion ausgeführt.")
-                return jsonify({"status": "short_position_exists", "botname": botname, "logs": logs})
+                return {"status": "short_position_exists", "botname": botname, "logs": logs}
         except Exception as e:
             logs.append(f"Fehler bei SHORT-Positionsprüfung: {e}")
-            return jsonify({"error": True, "msg": "Fehler bei SHORT-Positionsprüfung", "logs": logs}), 500
+            return {"error": True, "msg": "Fehler bei SHORT-Positionsprüfung", "logs": logs}, 500
 
     
         if not api_key or not secret_key:
-            return jsonify({"error": True, "msg": "api_key und secret_key sind erforderlich"}), 400
+            return {"error": True, "msg": "api_key und secret_key sind erforderlich"}, 400
+
+        bot_positionen[botname] = {"symbol": symbol, "position_side": position_side, "api_key": api_key,
+                                   "secret_key": secret_key, "firebase_secret": firebase_secret, "zeit": time.monotonic()}
         
         if action == "close" and botname:
             # Position schließen
             ergebnis = close_open_position(api_key, secret_key, symbol, position_side)
+            konto_snapshot_invalidieren(api_key)
             
             # Logs ausgeben
             print(ergebnis.get("logs", []))
             print(ergebnis.get("result", None))
             
-            # Nur die Daten für diesen Bot zurücksetzen
-            saved_usdt_amounts.pop(botname, None)
-            status_fuer_alle.pop(botname, None)
-            alarm_counter.pop(botname, None)
-            base_order_times.pop(botname, None)
-            
-            # Kaufpreise löschen (Firebase oder lokal)
+            # Nur die Daten für diesen Bot zurücksetzen, Kaufpreise löschen (Firebase oder lokal)
+            logs = bot_zustand_loeschen(botname, firebase_secret)
             if firebase_secret:
-                try:
-                    logs = []
-                    logs.append(firebase_loesche_kaufpreise(botname, firebase_secret))
-                    logs.append(firebase_loesche_ordergroesse(botname, firebase_secret))
-                    logs.append(firebase_loesche_base_order_time(botname, firebase_secret))
-                    
-                    print("\n".join(logs))
-                except Exception as e:
-                    print(f"Fehler beim Löschen von Kaufpreisen/Ordergrößen für {botname}: {e}")
+                print("\n".join(logs))
     
-                 # **Hier ein Response zurückgeben**
-                return jsonify({
-                    "status": "position_closed",
-                    "botname": botname,
-                    "logs": ergebnis.get("logs", []),
-                    "result": ergebnis.get("result", None)
-                })  # <-- alle Klammern geschlossen
+            # **Hier ein Response zurückgeben**
+            return {
+                "status": "position_closed",
+                "botname": botname,
+                "logs": ergebnis.get("logs", []),
+                "result": ergebnis.get("result", None)
+            }  # <-- alle Klammern geschlossen
         else:
     
             
@@ -976,8 +2802,8 @@ def webhook():
         
             # 0. USDT-Guthaben vor Order abrufen
             try:
-                balance_response = get_futures_balance(api_key, secret_key)
-                logs.append(f"Balance Response: {balance_response}")
+                balance_response = snapshot_balance(api_key, secret_key)
+                logs.ereignis("Balance Response", balance_response)
                 if balance_response.get("code") == 0:
                     
                     balance_data_temp = float(balance_response.get("data", {}).get("balance", {}).get("availableMargin", 0))
@@ -989,19 +2815,11 @@ def webhook():
                 logs.append(f"Fehler bei Balance-Abfrage: {e}")
                 available_usdt = None
         
-            # 1. Hebel setzen
-            try:
-                logs.append(f"Setze Hebel auf {leverageB} für {symbol} ({position_side})...")
-                leverage_response = set_leverage(api_key, secret_key, symbol, leverageB, position_side)
-                logs.append(f"Hebel gesetzt: {leverage_response}")
-            except Exception as e:
-                logs.append(f"Fehler beim Setzen des Hebels: {e}")
-        
             # 2. Offene Orders abrufen
             open_orders = {}
             try:
                 open_orders = get_open_orders(api_key, secret_key, symbol)
-                logs.append(f"Open Orders: {open_orders}")
+                logs.ereignis("Open Orders", open_orders)
             except Exception as e:
                 logs.append(f"Fehler bei Orderprüfung: {e}")
                 sende_telegram_nachricht(botname, f"Fehler bei Orderprüfung {botname}: {e}")
@@ -1015,7 +2833,7 @@ def webhook():
     
             
             if action == "increase":  # Nachkauforder
-                position_size, _, _ = get_current_position(api_key, secret_key, symbol, position_side, logs)
+                position_size, _, _ = snapshot_position(api_key, secret_key, symbol, position_side, logs)
                 logs.append(f"position_size_A={position_size}, botname={botname}, open_sell_orders_exist={open_sell_orders_exist}")
                 if position_size is None:
                     logs.append("❌ Keine Verbindung zur BingX API – Order wird NICHT gesetzt")
@@ -1030,12 +2848,12 @@ def webhook():
                     if beenden.lower() == "ja" or position_size == 0:
                         logs.append(f"⚠️ Bot {botname}: Beenden=ja → KEINE neue Base Order wird eröffnet")
                         # Nur Status zurückgeben, keine Base Order setzen
-                        return jsonify({
+                        return {
                             "status": "no_base_order_opened",
                             "botname": botname,
                             "reason": "beenden=ja",
                             "logs": logs
-                        })
+                        }
                     else:
                         open_sell_orders_exist = False
                         saved_usdt_amounts.pop(botname, None)
@@ -1068,12 +2886,12 @@ def webhook():
                 if beenden.lower() == "ja":
                     logs.append(f"⚠️ Bot {botname}: Beenden=ja → KEINE neue Base Order wird eröffnet")
                     # Nur Status zurückgeben, keine Base Order setzen
-                    return jsonify({
+                    return {
                         "status": "no_base_order_opened",
                         "botname": botname,
                         "reason": "beenden=ja",
                         "logs": logs
-                    })
+                    }
                 else:
             
                     status_fuer_alle[botname] = "OK"
@@ -1117,24 +2935,46 @@ def webhook():
                         logs.append(f"Fehler beim Lesen der Ordergröße aus Firebase: {e}")
                         sende_telegram_nachricht(botname, f"❌ Fehler beim Lesen der Ordergröße aus Firebase {botname}: {e}")
         
+            abgelehnt = margin_pruefen(botname, cfg, usdt_amount, available_usdt, price_from_webhook, logs, sende_telegram_nachricht)
+            if abgelehnt is not None:
+                return abgelehnt
+
+            # 1. Hebel setzen (erst nach der Margin-Prüfung: eine abgelehnte Order lässt den Hebel unverändert)
+            try:
+                logs.append(f"Setze Hebel auf {leverageB} für {symbol} ({position_side})...")
+                leverage_response = set_leverage(api_key, secret_key, symbol, leverageB, position_side)
+                logs.ereignis("Hebel gesetzt", leverage_response)
+            except Exception as e:
+                logs.append(f"Fehler beim Setzen des Hebels: {e}")
+
+            ordergroesse_gespeichert = False
+            if open_sell_orders_exist:
+                usdt_amount, ordergroesse_gespeichert = ordergroesse_reservieren(botname, usdt_amount, usdt_factor, firebase_secret, logs)
+
             # 4. Market-Order ausführen
             try:
                 logs.append(f"Plaziere Market-Order mit {usdt_amount} USDT für {symbol} ({position_side})...")
                 order_response = place_market_order(api_key, secret_key, symbol, float(usdt_amount), position_side)
+                konto_snapshot_invalidieren(api_key)
                 alarm_counter[botname] += 1
-                logs.append(firebase_speichere_ordergroesse(botname, usdt_amount, firebase_secret))
+                if not ordergroesse_gespeichert:
+                    logs.append(firebase_speichere_ordergroesse(botname, usdt_amount, firebase_secret))
                 time.sleep(2)
-                logs.append(f"Market-Order Antwort: {order_response}")
+                logs.ereignis("Market-Order Antwort", order_response)
     
                 # API-Antwort prüfen
                 if not order_response or order_response.get("code") != 0:
                     status_fuer_alle[botname] = "Fehler"
-                    logs.append(order_response)
+                    logs.ereignis("Market-Order Fehler", order_response)
                     sende_telegram_nachricht(botname, f"❌❌❌ Marketorder konnte nicht gesetzt werden für Bot: {botname}")
+                    if ordergroesse_gespeichert:
+                        ordergroesse_zuruecknehmen(botname, usdt_amount, usdt_factor, firebase_secret, logs)
             except Exception as e:
                 logs.append(f"Fehler bei Marketorder: {e}")
                 status_fuer_alle[botname] = "Fehler"
                 sende_telegram_nachricht(botname, f"❌❌❌ Marketorder konnte nicht gesetzt werden für Bot: {botname}")
+                if ordergroesse_gespeichert:
+                    ordergroesse_zuruecknehmen(botname, usdt_amount, usdt_factor, firebase_secret, logs)
                 
             # 5. Positionsgröße und Liquidationspreis ermitteln
             try:
@@ -1159,6 +2999,11 @@ def webhook():
                 logs.append(f"Fehler bei Positions- oder Liquidationspreis-Abfrage: {e}")
                 sende_telegram_nachricht(botname, f"❌ Fehler bei Positions- oder Liquidationspreis-Abfrage {botname}: {e}")
         
+            # Firebase-Circuit offen -> nicht auf Firebase warten, direkt BingX avgPrice verwenden
+            if firebase_secret and not abhaengigkeit_verfuegbar("firebase"):
+                status_fuer_alle[botname] = "Fehler"
+                logs.append("Firebase nicht erreichbar (Circuit offen) → Fallback auf BingX avgPrice")
+
             # 6. Kaufpreise ggf. löschen
             if firebase_secret and not open_sell_orders_exist:
                 try:
@@ -1196,7 +3041,7 @@ def webhook():
                 try:
                     if firebase_secret:
                         kaufpreise = firebase_lese_kaufpreise(botname, firebase_secret)
-                        logs.append(f"[Firebase] Gelesene Kaufpreise Rohdaten: {kaufpreise}")
+                        logs.ereignis("[Firebase] Gelesene Kaufpreise Rohdaten", kaufpreise)
                         durchschnittspreis = berechne_durchschnittspreis(kaufpreise or [])
                         if durchschnittspreis:
                             logs.append(f"[Firebase] Durchschnittspreis berechnet: {durchschnittspreis}")
@@ -1230,7 +3075,7 @@ def webhook():
                     for order in open_orders.get("data", {}).get("orders", []):
                         if order.get("side") == "SELL" and order.get("positionSide") == position_side and order.get("type") == "LIMIT":
                             cancel_response = cancel_order(api_key, secret_key, symbol, str(order.get("orderId")))
-                            logs.append(f"Gelöschte Order {order.get('orderId')}: {cancel_response}")
+                            logs.ereignis(f"Gelöschte Order {order.get('orderId')}", cancel_response)
             except Exception as e:
                 logs.append(f"Fehler beim Löschen der Sell-Limit-Orders: {e}")
                 sende_telegram_nachricht(botname, f"Fehler beim Löschen der Sell-Limit-Order {botname}: {e}")
@@ -1298,11 +3143,11 @@ def webhook():
                         base_time = None
         
                 # Alarm-Infos
-                alarm_trigger = int(data.get("RENDER", {}).get("alarm", 0))
+                alarm_trigger = cfg.alarm
                 if status_fuer_alle.get(botname) == "Fehler":
                     anzahl_nachkäufe = alarm_counter.get(botname, -1)
                 else:
-                    anzahl_käufe = len(kaufpreise or [])
+                    anzahl_käufe = anzahl_kaeufe(kaufpreise)
                     anzahl_nachkäufe = max(anzahl_käufe - 1, 0)     
                     
                 logs.append(f"Alarm2 {alarm_trigger - 4}")
@@ -1353,7 +3198,7 @@ def webhook():
         
                 if sell_quantity > 0 and limit_price > 0:
                     limit_order_response = place_limit_sell_order(api_key, secret_key, symbol, sell_quantity, limit_price, position_side)
-                    logs.append(f"Limit-Order gesetzt für Bot {botname} (Basis Durchschnittspreis {durchschnittspreis}): {limit_order_response}")
+                    logs.ereignis(f"Limit-Order gesetzt für Bot {botname} (Basis Durchschnittspreis {durchschnittspreis})", limit_order_response)
                 else:
                     logs.append("Ungültige Daten, keine Limit-Order gesetzt.")
                     sende_telegram_nachricht(botname, f"❌ Ungültige Daten, keine Limit-Order gesetzt für Bot: {botname}")
@@ -1366,7 +3211,7 @@ def webhook():
                 for order in open_orders.get("data", {}).get("orders", []):
                     if order.get("type") == "STOP_MARKET" and order.get("positionSide") == position_side:
                         cancel_response = cancel_order(api_key, secret_key, symbol, str(order.get("orderId")))
-                        logs.append(f"Bestehende SL-Order gelöscht: {cancel_response}")
+                        logs.ereignis("Bestehende SL-Order gelöscht", cancel_response)
             except Exception as e:
                 logs.append(f"Fehler beim Löschen alter Stop-Market-Orders: {e}")
                 sende_telegram_nachricht(botname, f"❌ Fehler beim Löschen des Stop Loss für Bot: {botname}")
@@ -1376,7 +3221,7 @@ def webhook():
             try:
                 if sell_quantity > 0 and stop_loss_price:
                     sl_order_resp = place_stop_loss_order(api_key, secret_key, symbol, sell_quantity, stop_loss_price, "LONG")
-                    logs.append(f"SL Stop-Market(BUY) Order gesetzt @ {stop_loss_price}: {sl_order_resp}")
+                    logs.ereignis(f"SL Stop-Market(BUY) Order gesetzt @ {stop_loss_price}", sl_order_resp)
                     if sl_order_resp.get("code") != 0 or sl_order_resp.get("data", {}).get("order", {}).get("status") not in (None, "NEW",):
                         logs.append("SL Stop-Market konnte nicht gesetzt werden.")
                         sende_telegram_nachricht(botname, f"⚠️ SL Stop-Market-Order konnte nicht gesetzt werden!\nSymbol: {symbol}\nResponse: {sl_order_resp}")
@@ -1389,10 +3234,11 @@ def webhook():
 
 
         
-            return jsonify({
+            return {
                 "error": False,
                 "order_result": order_response,
                 "limit_order_result": limit_order_response,
+                "sl_order_result": sl_order_resp,
                 "symbol": symbol,
                 "botname": botname,
                 "usdt_amount": usdt_amount,
@@ -1402,100 +3248,84 @@ def webhook():
                 "firebase_average_price": durchschnittspreis,
                 "firebase_all_prices": kaufpreise,
                 "usdt_balance_before_order": available_usdt,
-                "stop_loss_price": stop_loss_price if liquidation_price else None,
                 "stop_loss_price": stop_loss_price if 'stop_loss_price' in locals() else None,
-                "saved_usdt_amount": saved_usdt_amounts,
-                "status_fuer_alle": status_fuer_alle,
+                "tp_price": limit_price if 'limit_price' in locals() else None,
+                # nur dieser Bot, alle Bots über /bots
+                "saved_usdt_amount": saved_usdt_amounts.get(botname),
+                "status_fuer_alle": status_fuer_alle.get(botname),
                 "Botname": botname,
                 "logs": logs
-            })
+            }
         
 #     #      #      #      #      #      #      #      #     #      #      #      #      #      #      #   #     #      #      #      #      #      #      #   #     #      #      #      #      #      #      #   
 
     if position_side == "SHORT":
-        data = request.json or {}
         
-        logs = []
-    
-        # Pflicht: botname
-        botname = data.get("RENDER", {}).get("botname")
-        if not botname:
-            return jsonify({"error": True, "msg": "botname ist erforderlich"}), 400
+        logs = RequestLog()
     
         # Basis-Parameter
-        symbol = data.get("RENDER", {}).get("symbol", "")
-        api_key = data.get("RENDER", {}).get("api_key")
-        secret_key = data.get("RENDER", {}).get("secret_key")
-        firebase_secret = data.get("RENDER", {}).get("FIREBASE_SECRET")
-        position_side = (data.get("RENDER", {}).get("position_side") or data.get("RENDER", {}).get("positionSide") or "SHORT").upper()
-        # Erzwinge SHORT-only
-        if position_side != "SHORT":
-            return jsonify({"error": True, "msg": "Nur position_side=SHORT erlaubt. Abgebrochen."}), 400
+        botname = cfg.botname
+        symbol = cfg.symbol
+        api_key = cfg.api_key
+        secret_key = cfg.secret_key
+        firebase_secret = cfg.firebase_secret
     
         # Weitere parameter
-        pyramiding = float(data.get("RENDER", {}).get("pyramiding", 1))
-        leverage = float(data.get("RENDER", {}).get("leverage", 1))
-        sicherheit_param = float(data.get("RENDER", {}).get("sicherheit", 0))
+        pyramiding = cfg.pyramiding
+        leverage = cfg.leverage
         # Hinweis: in vielen deiner bisherigen Codes wurde Sicherheiten mit Hebel multipliziert -> beibehalten falls gewünscht
-        sicherheit = sicherheit_param * leverage
-        sell_percentage = data.get("RENDER", {}).get("sell_percentage")
-        price_from_webhook = data.get("RENDER", {}).get("price")
-        usdt_factor = float(data.get("RENDER", {}).get("usdt_factor", 1))
-        bo_factor = float(data.get("RENDER", {}).get("bo_factor", 0.0001))
+        sicherheit = cfg.sicherheit * leverage
+        sell_percentage = cfg.sell_percentage
+        price_from_webhook = render.get("price")
+        usdt_factor = cfg.usdt_factor
+        bo_factor = cfg.bo_factor
         action = data.get("vyn", {}).get("action", "").lower()
-        base_time2 = data.get("RENDER", {}).get("base_time2")
-        after_h = data.get("RENDER", {}).get("after_h", 48)
-        after_so = data.get("RENDER", {}).get("after_so", 14)
-        sell_percentage2 = data.get("RENDER", {}).get("sell_percentage2")
-        beenden = data.get("RENDER", {}).get("beenden", "nein")
-        sl = data.get("RENDER", {}).get("sl")
+        base_time2 = render.get("base_time2")
+        after_h = cfg.after_h
+        after_so = cfg.after_so
+        sell_percentage2 = cfg.sell_percentage2
+        beenden = cfg.beenden
+        sl = cfg.sl
     
         if not api_key or not secret_key:
-            return jsonify({"error": True, "msg": "api_key und secret_key sind erforderlich"}), 400
+            return {"error": True, "msg": "api_key und secret_key sind erforderlich"}, 400
+
+        bot_positionen[botname] = {"symbol": symbol, "position_side": position_side, "api_key": api_key,
+                                   "secret_key": secret_key, "firebase_secret": firebase_secret, "zeit": time.monotonic()}
     
             # Check Offene LONG-Position
         # ------------------------------
       
         try:
-            long_position_size, _, _ = SHORT_get_current_position(api_key, secret_key, symbol, "LONG", logs)
+            long_position_size, _, _ = snapshot_position(api_key, secret_key, symbol, "LONG", logs)
             logs.append(f"Long Position Size {long_position_size}")
             if long_position_size and long_position_size > 0:
                 logs.append("Offene LONG-Position vorhanden - keine Aktion ausgeführt.")
-                return jsonify({"status": "long_position_exists", "botname": botname, "logs": logs})
+                return {"status": "long_position_exists", "botname": botname, "logs": logs}
         except Exception as e:
             logs.append(f"Fehler bei LONG-Positionsprüfung: {e}")
-            return jsonify({"error": True, "msg": "Fehler bei LONG-Positionsprüfung", "logs": logs}), 500
+            return {"error": True, "msg": "Fehler bei LONG-Positionsprüfung", "logs": logs}, 500
     
     
         # action == "close" -> sofort close der SHORT position
         if action == "close":
             ergebnis = SHORT_close_open_position(api_key, secret_key, symbol, position_side)
-            # reset cache für diesen bot
-            saved_usdt_amounts.pop(botname, None)
-            status_fuer_alle.pop(botname, None)
-            alarm_counter.pop(botname, None)
-            base_order_times.pop(botname, None)
-            # optional: firebase löschen
-            if firebase_secret:
-                try:
-                    logs.append(SHORT_firebase_loesche_kaufpreise(botname, firebase_secret))
-                    logs.append(firebase_loesche_ordergroesse(botname, firebase_secret))
-                    logs.append(SHORT_firebase_loesche_base_order_time(botname, firebase_secret))
-                except Exception as e:
-                    logs.append(f"Fehler beim Löschen in Firebase: {e}")
-            return jsonify({
+            konto_snapshot_invalidieren(api_key)
+            # Zustand wie beim LONG-Close zurücksetzen (inkl. Leiter-Cache, Bot-Index, Deadline und Firebase)
+            logs.extend(bot_zustand_loeschen(botname, firebase_secret))
+            return {
                 "status": "position_closed",
                 "botname": botname,
                 "logs": ergebnis.get("logs", []),
                 "result": ergebnis.get("result", None)
-            })
+            }
     
         # sonst: Base Order / Increase / sonstiges (nur SHORT)
         # 0. Guthaben abfragen
         available_usdt = 0.0
         try:
-            balance_response = SHORT_get_futures_balance(api_key, secret_key)
-            logs.append(f"Balance Response: {balance_response}")
+            balance_response = snapshot_balance(api_key, secret_key)
+            logs.ereignis("Balance Response", balance_response)
             if balance_response.get("code") == 0:
                 available_margin = float(balance_response.get("data", {}).get("balance", {}).get("availableMargin", 0))
                 available_usdt = available_margin * leverage
@@ -1507,19 +3337,11 @@ def webhook():
             SHORT_sende_telegram_nachricht(botname, f"❌❌❌ Keine Verbindung zu BingX bei Balance-Abfrage für Bot: {botname}")            
             available_usdt = None
     
-        # 1. Hebel setzen (SHORT)
-        try:
-            logs.append(f"Setze Hebel auf {leverage} für {symbol} (SHORT)...")
-            lev_resp = SHORT_set_leverage(api_key, secret_key, symbol, leverage, "SHORT")
-            logs.append(f"Leverage Response: {lev_resp}")
-        except Exception as e:
-            logs.append(f"Fehler beim Setzen des Hebels: {e}")
-    
         # 2. Offene Orders abrufen (um alte TP/SL/Limit zu handhaben)
         open_orders = {}
         try:
             open_orders = SHORT_get_open_orders(api_key, secret_key, symbol)
-            logs.append(f"Open Orders: {open_orders}")
+            logs.ereignis("Open Orders", open_orders)
         except Exception as e:
             logs.append(f"Fehler bei Orderprüfung: {e}")
             SHORT_sende_telegram_nachricht(botname, f"Fehler bei Orderprüfung {botname}: {e}")
@@ -1531,18 +3353,18 @@ def webhook():
     
         if action == "increase":
             # Nachkauforder: prüfen ob Position noch offen
-            position_size, _, _ = SHORT_get_current_position(api_key, secret_key, symbol, "SHORT", logs)
+            position_size, _, _ = snapshot_position(api_key, secret_key, symbol, "SHORT", logs)
             logs.append(f"position_size bei increase: {position_size}")
             if position_size is None:
                 SHORT_sende_telegram_nachricht(botname, f"Keine Verbindung zu BingX für Bot {botname} - increase aborted")
-                return jsonify({"error": True, "msg": "Keine Verbindung zu BingX - increase aborted", "logs": logs}), 500
+                return {"error": True, "msg": "Keine Verbindung zu BingX - increase aborted", "logs": logs}, 500
             if position_size > 0:
                 open_sell_orders_exist = True
             else:
                 # Position bereits geschlossen -> treat as new BO if beenden != "ja"
                 if beenden.lower() == "ja" or position_size == 0:
                     logs.append("Beenden=ja → Keine neue Base Order")
-                    return jsonify({"status": "no_base_order_opened", "botname": botname, "reason": "beenden=ja", "logs": logs})
+                    return {"status": "no_base_order_opened", "botname": botname, "reason": "beenden=ja", "logs": logs}
                 else:
                     # Reset caches, proceed to set new BO
                     saved_usdt_amounts.pop(botname, None)
@@ -1567,7 +3389,7 @@ def webhook():
         if not open_sell_orders_exist:
             if beenden.lower() == "ja":
                 logs.append("Beenden=ja → Keine neue Base Order")
-                return jsonify({"status": "no_base_order_opened", "botname": botname, "reason": "beenden=ja", "logs": logs})
+                return {"status": "no_base_order_opened", "botname": botname, "reason": "beenden=ja", "logs": logs}
             else:
                 status_fuer_alle[botname] = "OK"
                 alarm_counter[botname] = -1
@@ -1601,23 +3423,45 @@ def webhook():
                     logs.append(f"Fehler beim Lesen der Ordergröße aus Firebase: {e}")
                     SHORT_sende_telegram_nachricht(botname, f"❌ Fehler beim Lesen der Ordergröße aus Firebase {botname}: {e}")
     
+        abgelehnt = margin_pruefen(botname, cfg, usdt_amount, available_usdt, price_from_webhook, logs, SHORT_sende_telegram_nachricht)
+        if abgelehnt is not None:
+            return abgelehnt
+
+        # 1. Hebel setzen (SHORT, erst nach der Margin-Prüfung)
+        try:
+            logs.append(f"Setze Hebel auf {leverage} für {symbol} (SHORT)...")
+            lev_resp = SHORT_set_leverage(api_key, secret_key, symbol, leverage, "SHORT")
+            logs.ereignis("Leverage Response", lev_resp)
+        except Exception as e:
+            logs.append(f"Fehler beim Setzen des Hebels: {e}")
+
+        ordergroesse_gespeichert = False
+        if open_sell_orders_exist:
+            usdt_amount, ordergroesse_gespeichert = ordergroesse_reservieren(botname, usdt_amount, usdt_factor, firebase_secret, logs)
+
         # 4. Market-Order platzieren (SHORT open)
         order_response = None
         try:
             logs.append(f"Plaziere Market-Order (SHORT) mit {usdt_amount} USDT für {symbol}...")
             order_response = SHORT_place_market_order(api_key, secret_key, symbol, float(usdt_amount), "SHORT")
+            konto_snapshot_invalidieren(api_key)
             alarm_counter[botname] = alarm_counter.get(botname, -1) + 1
-            logs.append(SHORT_firebase_speichere_ordergroesse(botname, usdt_amount, firebase_secret))
+            if not ordergroesse_gespeichert:
+                logs.append(SHORT_firebase_speichere_ordergroesse(botname, usdt_amount, firebase_secret))
             time.sleep(1.5)
-            logs.append(f"Market-Order Antwort: {order_response}")
+            logs.ereignis("Market-Order Antwort", order_response)
             if not order_response or order_response.get("code") != 0:
                 status_fuer_alle[botname] = "Fehler"
                 logs.append("Marketorder konnte nicht gesetzt werden.")
                 SHORT_sende_telegram_nachricht(botname, f"❌❌❌ Marketorder konnte nicht gesetzt werden für Bot: {botname}")
+                if ordergroesse_gespeichert:
+                    ordergroesse_zuruecknehmen(botname, usdt_amount, usdt_factor, firebase_secret, logs)
         except Exception as e:
             logs.append(f"Fehler bei Marketorder: {e}")
             status_fuer_alle[botname] = "Fehler"
             SHORT_sende_telegram_nachricht(botname, f"❌❌❌ Marketorder konnte nicht gesetzt werden für Bot: {botname}")
+            if ordergroesse_gespeichert:
+                ordergroesse_zuruecknehmen(botname, usdt_amount, usdt_factor, firebase_secret, logs)
     
         # 5. Positionsgröße & liq price
         try:
@@ -1642,6 +3486,11 @@ def webhook():
             logs.append(f"Fehler bei Positions-/Liquidationsabfrage: {e}")
             SHORT_sende_telegram_nachricht(botname, f"❌ Fehler bei Positions-/Liquidationsabfrage {botname}: {e}")
     
+        # Firebase-Circuit offen -> nicht auf Firebase warten, direkt BingX avgPrice verwenden
+        if firebase_secret and not abhaengigkeit_verfuegbar("firebase"):
+            status_fuer_alle[botname] = "Fehler"
+            logs.append("Firebase nicht erreichbar (Circuit offen) → Fallback auf BingX avgPrice")
+
         # 6. Kaufpreise ggf. löschen (bei neuer BO)
         if firebase_secret and not open_sell_orders_exist:
             try:
@@ -1678,7 +3527,7 @@ def webhook():
             try:
                 if firebase_secret:
                     kaufpreise = SHORT_firebase_lese_kaufpreise(botname, firebase_secret)
-                    logs.append(f"[Firebase] Kaufpreise: {kaufpreise}")
+                    logs.ereignis("[Firebase] Kaufpreise", kaufpreise)
                     durchschnittspreis = SHORT_berechne_durchschnittspreis(kaufpreise or [])
                     if durchschnittspreis:
                         logs.append(f"[Firebase] Durchschnittspreis berechnet: {durchschnittspreis}")
@@ -1711,7 +3560,7 @@ def webhook():
                     # Nur BUY LIMIT für SHORT löschen, STOP_MARKET bleibt erhalten
                     if order.get("positionSide") == "SHORT" and order.get("type") == "LIMIT" and order.get("side") == "BUY":
                         cancel_resp = SHORT_cancel_order(api_key, secret_key, symbol, str(order.get("orderId")))
-                        logs.append(f"Gelöschte Limit-Buy-Order {order.get('orderId')}: {cancel_resp}")
+                        logs.ereignis(f"Gelöschte Limit-Buy-Order {order.get('orderId')}", cancel_resp)
         except Exception as e:
             logs.append(f"Fehler beim Löschen alter Limit-Buy-Orders: {e}")
             SHORT_sende_telegram_nachricht(botname, f"❌ Fehler beim Löschen alter Limit-Buy-Orders {botname}: {e}")
@@ -1723,7 +3572,7 @@ def webhook():
                     # Nur BUY STOP_MARKET (Stoploss) für SHORT löschen
                     if order.get("positionSide") == "SHORT" and order.get("type") == "STOP_MARKET" and order.get("side") == "BUY":
                         cancel_resp = SHORT_cancel_order(api_key, secret_key, symbol, str(order.get("orderId")))
-                        logs.append(f"Gelöschte SL Stop-Market-Order {order.get('orderId')}: {cancel_resp}")
+                        logs.ereignis(f"Gelöschte SL Stop-Market-Order {order.get('orderId')}", cancel_resp)
         except Exception as e:
             logs.append(f"Fehler beim Löschen alter SL Orders: {e}")
             SHORT_sende_telegram_nachricht(botname, f"❌ Fehler beim Löschen alter SL Orders {botname}: {e}")
@@ -1754,9 +3603,9 @@ def webhook():
                     base_time_str = None
                     # read from firebase
                     url = f"{FIREBASE_URL}/base_order_time/{botname}.json?auth={firebase_secret}"
-                    r = requests.get(url)
+                    r = http_anfrage("GET", url)
                     if r.status_code == 200 and r.text:
-                        d = r.json()
+                        d = antwort_json(r)
                         base_time_str = d.get("base_order_time") if isinstance(d, dict) else None
                     if base_time_str:
                         base_time = datetime.fromisoformat(base_time_str)
@@ -1767,11 +3616,11 @@ def webhook():
                 except Exception as e:
                     logs.append(f"Fehler beim Laden base_time aus Firebase: {e}")
             # prüfen after_h / after_so & ggf sell_percentage anpassen
-            alarm_trigger = int(data.get("RENDER", {}).get("alarm", 0))
+            alarm_trigger = cfg.alarm
             if status_fuer_alle.get(botname) == "Fehler":
                 anzahl_nachkäufe = alarm_counter.get(botname, -1)
             else:
-                anzahl_käufe = len(kaufpreise or [])
+                anzahl_käufe = anzahl_kaeufe(kaufpreise)
                 anzahl_nachkäufe = max(anzahl_käufe - 1, 0)
 
 
@@ -1809,7 +3658,7 @@ def webhook():
     
             if sell_quantity > 0 and limit_price > 0:
                 limit_order_response = SHORT_place_limit_buy_order(api_key, secret_key, symbol, sell_quantity, limit_price, "SHORT")
-                logs.append(f"TP Limit(BUY) Order gesetzt @ {limit_price}: {limit_order_response}")
+                logs.ereignis(f"TP Limit(BUY) Order gesetzt @ {limit_price}", limit_order_response)
                 # Prüfen ob Limit erfolgreich erstellt
                 if limit_order_response.get("code") != 0 or limit_order_response.get("data", {}).get("order", {}).get("status") not in (None, "NEW",): 
                     # Abhängig von API kann die Struktur variieren; wir prüfen code != 0 als Fehler
@@ -1830,7 +3679,7 @@ def webhook():
         try:
             if sell_quantity > 0 and stop_loss_price:
                 sl_order_resp = SHORT_place_stoploss_buy_order(api_key, secret_key, symbol, sell_quantity, stop_loss_price, "SHORT")
-                logs.append(f"SL Stop-Market(BUY) Order gesetzt @ {stop_loss_price}: {sl_order_resp}")
+                logs.ereignis(f"SL Stop-Market(BUY) Order gesetzt @ {stop_loss_price}", sl_order_resp)
                 if sl_order_resp.get("code") != 0 or sl_order_resp.get("data", {}).get("order", {}).get("status") not in (None, "NEW",):
                     logs.append("SL Stop-Market konnte nicht gesetzt werden.")
                     SHORT_sende_telegram_nachricht(botname, f"⚠️ SL Stop-Market-Order konnte nicht gesetzt werden!\nSymbol: {symbol}\nResponse: {sl_order_resp}")
@@ -1849,14 +3698,14 @@ def webhook():
             SHORT_sende_telegram_nachricht(botname, f"⚠️ TP oder SL konnte(n) nicht gesetzt werden. Symbol: {symbol}")
             #close_resp = SHORT_close_all_positions(api_key, secret_key)
             #logs.append(f"Positionen geschlossen weil TP/SL nicht gesetzt: {close_resp}")
-            return jsonify({
+            return {
                 "error": True,
                 "msg": "TP/SL konnte nicht gesetzt werden.",
                 "logs": logs
-            }), 500
+            }, 500
     
         # final response
-        return jsonify({
+        return {
             "error": False,
             "order_result": order_response,
             "limit_order_result": limit_order_response,
@@ -1871,19 +3720,1787 @@ def webhook():
             "firebase_all_prices": kaufpreise,
             "usdt_balance_before_order": available_usdt,
             "stop_loss_price": stop_loss_price if 'stop_loss_price' in locals() else None,
+            "tp_price": limit_price if 'limit_price' in locals() else None,
             "saved_usdt_amount": saved_usdt_amounts.get(botname),
             "status_fuer_alle": status_fuer_alle.get(botname),
             "Botname": botname,
             "logs": logs
-        })
+        }
 
+    return {"error": True, "msg": f"Unbekannte position_side: {position_side}"}, 400
 
+# === Antworten: kompakter Modus und Log-Puffer pro Bot ===
+bot_log_puffer = OrderedDict()  # botname -> deque der letzten BOT_LOG_PUFFER Requests, zuletzt benutzt hinten
+_bot_log_lock = threading.Lock()
 
-        
+def _bot_logs_vergessen(botname):
+    with _bot_log_lock:
+        bot_log_puffer.pop(botname, None)
+
+bot_zustaende.verdraengen_abonnenten.append(_bot_logs_vergessen)
+
+def _order_kurz(antwort):
+    if not isinstance(antwort, dict):
+        return antwort
+    order = (antwort.get("data") or {}).get("order", {}) if isinstance(antwort.get("data"), dict) else {}
+    return {"code": antwort.get("code"), "msg": antwort.get("msg"), "orderId": order.get("orderId"), "status": order.get("status")}
+
+def antwort_aufbereiten(ergebnis, botname, action, kompakt=False, mit_logs=False):
+    """
+    Legt die Logs im Puffer des Bots ab und kürzt die Antwort im kompakten Modus
+    (ohne Logs und Kaufpreisliste, Orders nur mit ID und Status).
+    """
+    body, status = ergebnis if isinstance(ergebnis, tuple) else (ergebnis, 200)
+    logs = body.get("logs")
+    if botname and isinstance(logs, RequestLog):
+        eintrag = {"zeit": datetime.now(timezone.utc).isoformat(), "action": action, "status": status, "logs": logs}
+        with _bot_log_lock:
+            puffer = bot_log_puffer.get(botname)
+            if puffer is None:
+                puffer = bot_log_puffer[botname] = deque(maxlen=BOT_LOG_PUFFER)
+            bot_log_puffer.move_to_end(botname)
+            puffer.append(eintrag)
+            while len(bot_log_puffer) > BOT_LOG_BOTS:
+                bot_log_puffer.popitem(last=False)
+    if not kompakt:
+        return body, status
+
+    kurz = {}
+    for key, wert in body.items():
+        if key == "logs" or key == "firebase_all_prices" or key == "Botname":
+            continue
+        if key in ("order_result", "limit_order_result", "sl_order_result", "result"):
+            wert = _order_kurz(wert)
+        kurz[key] = wert
+    if "firebase_all_prices" in body:
+        kurz["anzahl_kaufpreise"] = anzahl_kaeufe(body["firebase_all_prices"])
+    if mit_logs and logs is not None:
+        kurz["logs"] = logs
+    return kurz, status
+
+# === Handelsereignisse: ein gemeinsamer Einstieg für Fills, TP/SL und Schließungen ===
+ereignis_abonnenten = []  # Funktionen, die jedes Ereignis (dict) bekommen, z.B. das Journal
+
+def handel_ereignis(art, botname, symbol, position_side, menge=0.0, preis=0.0, referenzpreis=0.0, usdt=0.0, so=-1, api_key=None, maker=False):
+    """
+    art: "fill" (BO/SO ausgeführt), "tp" / "sl" (Order gesetzt), "close" (selbst geschlossen),
+    "extern" (auf BingX geschlossen, z.B. TP/SL/Liquidation, erkannt vom Reconciler; preis 0 = unbekannt)
+    maker: Ausführung als Limit-Order (Maker-Gebühr), sonst Taker
+    """
+    ereignis = {"zeit": time.time(), "art": art, "botname": botname, "symbol": symbol or "",
+                "position_side": (position_side or "LONG").upper(), "menge": float(menge or 0), "preis": float(preis or 0),
+                "referenzpreis": float(referenzpreis or 0), "usdt": float(usdt or 0), "so": int(so if so is not None else -1),
+                "api_key": api_key, "maker": bool(maker)}
+    for abonnent in ereignis_abonnenten:
+        try:
+            abonnent(ereignis)
+        except Exception as e:
+            print(f"[Fehler] Handelsereignis {art} für {botname}: {e}")
+
+def _zahl_oder_0(wert):
+    try:
+        return float(wert or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def handel_ereignisse_aus_alarm(botname, ergebnis, data):
+    """Leitet aus dem Ergebnis eines Alarms die Handelsereignisse ab (läuft nach der Order-Sequenz)."""
+    body = ergebnis[0] if isinstance(ergebnis, tuple) else ergebnis
+    if not botname or not isinstance(body, dict) or not ereignis_abonnenten:
+        return
+    try:
+        cfg = bot_config_fuer_alarm(data)
+    except ValueError:
+        return
+    symbol, seite, api_key = cfg.symbol, cfg.position_side, cfg.api_key
+    referenzpreis = _zahl_oder_0((data.get("RENDER") or {}).get("price"))
+
+    if body.get("status") == "position_closed":
+        order = ((body.get("result") or {}).get("data") or {}).get("order") or {}
+        if (body.get("result") or {}).get("code") == 0:
+            preis = _zahl_oder_0(order.get("avgPrice")) or referenzpreis
+            handel_ereignis("close", botname, symbol, seite, _zahl_oder_0(order.get("executedQty")), preis, referenzpreis, api_key=api_key)
+        return
+    if body.get("error") or not symbol:
+        return
+
+    order_result = body.get("order_result") or {}
+    if order_result.get("code") == 0:
+        order = (order_result.get("data") or {}).get("order") or {}
+        menge = _zahl_oder_0(order.get("executedQty")) or _zahl_oder_0(order.get("quantity"))
+        usdt = _zahl_oder_0(body.get("usdt_amount"))
+        # avgPrice fehlt in der Antwort oft (0) -> effektiver Preis aus Betrag und Menge
+        preis = _zahl_oder_0(order.get("avgPrice")) or (usdt / menge if menge else referenzpreis)
+        handel_ereignis("fill", botname, symbol, seite, menge, preis, referenzpreis, usdt, alarm_counter.get(botname, 0), api_key)
+    if (body.get("limit_order_result") or {}).get("code") == 0:
+        handel_ereignis("tp", botname, symbol, seite, body.get("sell_quantity"), body.get("tp_price"), api_key=api_key)
+    if (body.get("sl_order_result") or {}).get("code") == 0:
+        handel_ereignis("sl", botname, symbol, seite, body.get("sell_quantity"), body.get("stop_loss_price"), api_key=api_key)
+
+# === Trade-Journal: alle Handelsereignisse spaltenweise in NumPy-Segmenten (append-only) ===
+# Ereignisse landen zuerst in einem Puffer; ein Hintergrund-Thread schreibt sie als .npy-Segment.
+# Abfragen laden die Segmente per mmap und rechnen vektorisiert (bincount statt Schleifen).
+JOURNAL_ARTEN = ("fill", "tp", "sl", "close", "extern")
+JOURNAL_SCHLIESSEN = (JOURNAL_ARTEN.index("close"), JOURNAL_ARTEN.index("extern"))
+JOURNAL_DTYPE = [
+    ("zeit", "f8"), ("bot", "i4"), ("symbol", "i4"), ("seite", "i1"), ("art", "i1"), ("so", "i2"),
+    ("zyklus", "i4"), ("menge", "f8"), ("preis", "f8"), ("referenzpreis", "f8"), ("usdt", "f8"),
+]
+
+class TradeJournal:
+    """
+    Append-only Journal in verzeichnis/seg_<zeit>_<n>.npy plus namen.json (botname/symbol -> Nummer).
+    zyklus zählt die Positionen eines Bots (neu bei jeder BO), damit PnL pro geschlossener Position
+    ohne Zustand gerechnet werden kann.
+    Geschriebene Segmente bleiben read-only per mmap eingebunden (Seiten lädt das OS bei Bedarf);
+    im Speicher liegt nur der noch ungeschriebene Puffer. Zusammengefügt wird erst für eine Abfrage.
+    """
+
+    def __init__(self, verzeichnis):
+        self.verzeichnis = verzeichnis
+        os.makedirs(verzeichnis, exist_ok=True)
+        self._lock = threading.Lock()
+        self._puffer = []
+        self._voll = threading.Event()
+        self._namen = {"bot": [], "symbol": []}
+        pfad = os.path.join(verzeichnis, "namen.json")
+        if os.path.exists(pfad):
+            with open(pfad, encoding="utf-8") as f:
+                self._namen = json.load(f)
+        self._ids = {feld: {name: i for i, name in enumerate(namen)} for feld, namen in self._namen.items()}
+        segmente = sorted(n for n in os.listdir(verzeichnis) if n.startswith("seg_") and n.endswith(".npy"))
+        self._segmente = [np.load(os.path.join(verzeichnis, n), mmap_mode="r") for n in segmente]
+        # offener Zustand pro Bot (für Schließ-Ereignisse ohne Menge/SO), aus dem Bestand wiederhergestellt
+        self._offen = {}  # bot-id -> [zyklus, menge, so, offen]
+        self._zustand_laden()
+
+    @property
+    def segmente(self):
+        return len(self._segmente)
+
+    @property
+    def zeilen(self):
+        with self._lock:
+            return sum(len(segment) for segment in self._segmente) + len(self._puffer)
+
+    def _zustand_laden(self):
+        d = self.daten("bot", "art", "zyklus", "menge", "so")
+        if not len(d):
+            return
+        # letzte Zeile pro Bot bestimmt Zyklus und ob die Position noch offen ist
+        bots, letzte = np.unique(d["bot"][::-1], return_index=True)
+        letzte = len(d) - 1 - letzte
+        aktuell = np.zeros(int(bots.max()) + 1, dtype="i4")
+        aktuell[bots] = d["zyklus"][letzte]
+        maske = (d["art"] == 0) & (d["zyklus"] == aktuell[d["bot"]])
+        menge = np.bincount(d["bot"][maske], weights=d["menge"][maske], minlength=len(aktuell))
+        so = np.full(len(aktuell), -1, dtype="i4")
+        np.maximum.at(so, d["bot"][maske], d["so"][maske])
+        for bot, zeile in zip(bots, letzte):
+            offen = int(d["art"][zeile]) not in JOURNAL_SCHLIESSEN
+            self._offen[int(bot)] = [int(aktuell[bot]), float(menge[bot]), int(so[bot]), offen]
+
+    def _id(self, feld, name):
+        ids = self._ids[feld]
+        if name not in ids:
+            ids[name] = len(self._namen[feld])
+            self._namen[feld].append(name)
+        return ids[name]
+
+    def _zustand_fortschreiben(self, bot, art, menge, so):
+        zustand = self._offen.setdefault(bot, [0, 0.0, -1, False])
+        if art == 0:  # fill
+            if so == 0 or not zustand[3]:
+                zustand[:] = [zustand[0] + 1, 0.0, so, True]
+            zustand[1] += menge
+            zustand[2] = so
+        elif art in JOURNAL_SCHLIESSEN:
+            zustand[3] = False
+        return zustand
+
+    def aufnehmen(self, ereignis):
+        with self._lock:
+            bot = self._id("bot", ereignis["botname"])
+            art = JOURNAL_ARTEN.index(ereignis["art"])
+            zustand = self._offen.get(bot, [0, 0.0, -1, False])
+            menge, so = ereignis["menge"], ereignis["so"]
+            if art in JOURNAL_SCHLIESSEN:
+                # Schließen: Menge und SO-Tiefe der offenen Position übernehmen, falls unbekannt
+                menge = menge or zustand[1]
+                so = so if so >= 0 else zustand[2]
+            zustand = self._zustand_fortschreiben(bot, art, menge, so)
+            self._puffer.append((
+                ereignis["zeit"], bot, self._id("symbol", ereignis["symbol"]), 1 if ereignis["position_side"] == "LONG" else -1,
+                art, so, zustand[0], menge, ereignis["preis"], ereignis["referenzpreis"], ereignis["usdt"],
+            ))
+            if len(self._puffer) >= JOURNAL_SEGMENT_ZEILEN:
+                self._voll.set()
+
+    def flush(self):
+        """Schreibt den Puffer als neues Segment (erst tmp, dann os.replace, damit nie halbe Dateien entstehen)."""
+        with self._lock:
+            if not self._puffer:
+                return 0
+            zeilen, self._puffer = self._puffer, []
+            namen = json_dumps(self._namen)
+        segment = np.array(zeilen, dtype=JOURNAL_DTYPE)
+        namen_pfad = os.path.join(self.verzeichnis, "namen.json")
+        with open(namen_pfad + ".tmp", "wb") as f:
+            f.write(namen)
+        os.replace(namen_pfad + ".tmp", namen_pfad)
+        pfad = os.path.join(self.verzeichnis, f"seg_{time.time_ns()}_{len(zeilen)}.npy")
+        with open(pfad + ".tmp", "wb") as f:
+            np.save(f, segment)
+        os.replace(pfad + ".tmp", pfad)
+        segment = np.load(pfad, mmap_mode="r")
+        with self._lock:
+            self._segmente.append(segment)
+        return len(zeilen)
+
+    def daten(self, *felder):
+        """
+        Geschriebene Segmente + noch ungeschriebener Puffer, nur für die Dauer einer Abfrage zusammengefügt.
+        felder: nur diese Spalten kopieren (weniger Speicher und Zeit bei großen Journalen), sonst alle.
+        """
+        with self._lock:
+            teile, puffer = list(self._segmente), list(self._puffer)
+        if puffer:
+            teile.append(np.array(puffer, dtype=JOURNAL_DTYPE))
+        dtype = [(feld, typ) for feld, typ in JOURNAL_DTYPE if not felder or feld in felder]
+        ergebnis = np.empty(sum(len(teil) for teil in teile), dtype=dtype)
+        start = 0
+        for teil in teile:
+            for feld in ergebnis.dtype.names:
+                ergebnis[feld][start:start + len(teil)] = teil[feld]
+            start += len(teil)
+        return ergebnis
+
+    def name(self, feld, nummer):
+        return self._namen[feld][nummer]
+
+    def _gruppen(self, daten, gruppe):
+        feld = "symbol" if gruppe == "symbol" else "bot"
+        return daten[feld], len(self._namen[feld]), feld
+
+    def pnl(self, gruppe="bot"):
+        """Realisierter PnL (ohne Gebühren) aller geschlossenen Positionen pro Bot oder Symbol."""
+        d = self.daten("bot", "symbol", "seite", "art", "zyklus", "menge", "preis")
+        schliessen = np.isin(d["art"], JOURNAL_SCHLIESSEN)
+        # Zahlungsstrom: Kauf (LONG) kostet, Schließen bringt; bei SHORT umgekehrt
+        fluss = np.where(d["art"] == 0, -1.0, np.where(schliessen, 1.0, 0.0)) * d["seite"] * d["menge"] * d["preis"]
+        schluessel = d["bot"].astype("i8") << 32 | d["zyklus"].astype("i8")
+        geschlossen = np.isin(schluessel, schluessel[schliessen & (d["preis"] > 0)])
+        ids, anzahl, feld = self._gruppen(d, gruppe)
+        summe = np.bincount(ids[geschlossen], weights=fluss[geschlossen], minlength=anzahl)
+        positionen = np.bincount(ids[schliessen & geschlossen], minlength=anzahl)
+        return {self.name(feld, i): {"pnl_usdt": round(float(summe[i]), 4), "positionen": int(positionen[i])}
+                for i in np.flatnonzero(positionen)}
+
+    def so_tiefe(self, botname=None):
+        """Verteilung der SO-Tiefe beim Schließen: {so: anzahl}."""
+        d = self.daten("bot", "art", "so")
+        maske = np.isin(d["art"], JOURNAL_SCHLIESSEN) & (d["so"] >= 0)
+        if botname is not None:
+            if botname not in self._ids["bot"]:
+                return {}
+            maske &= d["bot"] == self._ids["bot"][botname]
+        zaehler = np.bincount(d["so"][maske])
+        return {int(so): int(zaehler[so]) for so in np.flatnonzero(zaehler)}
+
+    def slippage(self, gruppe="bot"):
+        """Slippage der Fills gegenüber dem Alarmpreis in Basispunkten (positiv = ungünstig)."""
+        d = self.daten("bot", "symbol", "seite", "art", "preis", "referenzpreis")
+        maske = (d["art"] == 0) & (d["referenzpreis"] > 0) & (d["preis"] > 0)
+        d = d[maske]
+        bps = (d["preis"] - d["referenzpreis"]) / d["referenzpreis"] * 1e4 * d["seite"]
+        ids, _, feld = self._gruppen(d, gruppe)
+        reihenfolge = np.argsort(ids, kind="stable")
+        ids, bps = ids[reihenfolge], bps[reihenfolge]
+        grenzen = np.flatnonzero(np.diff(ids)) + 1
+        ergebnis = {}
+        for teil_ids, teil in zip(np.split(ids, grenzen), np.split(bps, grenzen)):
+            if len(teil):
+                p50, p95 = np.percentile(teil, [50, 95])
+                ergebnis[self.name(feld, int(teil_ids[0]))] = {
+                    "fills": int(len(teil)), "mittel_bps": round(float(teil.mean()), 2),
+                    "p50_bps": round(float(p50), 2), "p95_bps": round(float(p95), 2)}
+        return ergebnis
+
+journal = None
+_journal_thread = None
+
+def _journal_schleife():
+    while True:
+        journal._voll.wait(JOURNAL_FLUSH_INTERVALL)
+        journal._voll.clear()
+        try:
+            journal.flush()
+        except Exception as e:
+            print(f"[Fehler] Journal-Segment nicht geschrieben: {e}")
+
+def journal_starten(verzeichnis=None):
+    global journal, _journal_thread
+    verzeichnis = verzeichnis or JOURNAL_VERZEICHNIS
+    if journal is not None or not verzeichnis:
+        return journal
+    if shard_index is not None:
+        verzeichnis = os.path.join(verzeichnis, f"shard_{shard_index}")
+    if np is None:
+        print("Trade-Journal deaktiviert: numpy nicht installiert")
+        return None
+    journal = TradeJournal(verzeichnis)
+    ereignis_abonnenten.append(journal.aufnehmen)
+    _journal_thread = threading.Thread(target=_journal_schleife, name="journal", daemon=True)
+    _journal_thread.start()
+    print(f"Trade-Journal: {journal.zeilen} Zeilen in {journal.segmente} Segmenten ({verzeichnis})")
+    return journal
+
+def _journal_abfrage(funktion):
+    if journal is None:
+        return jsonify({"error": True, "msg": "Journal nicht aktiv (JOURNAL_VERZEICHNIS setzen, numpy installieren)"}), 404
+    start = time.perf_counter()
+    ergebnis = funktion()
+    return jsonify({"ergebnis": ergebnis, "dauer_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+@app.route('/journal/pnl', methods=['GET'])
+def journal_pnl():
+    return _journal_abfrage(lambda: journal.pnl(request.args.get("gruppe", "bot")))
+
+@app.route('/journal/so_tiefe', methods=['GET'])
+def journal_so_tiefe():
+    return _journal_abfrage(lambda: journal.so_tiefe(request.args.get("botname")))
+
+@app.route('/journal/slippage', methods=['GET'])
+def journal_slippage():
+    return _journal_abfrage(lambda: journal.slippage(request.args.get("gruppe", "bot")))
+
+# === PnL: laufende Aggregate pro Bot und Konto, gespeist aus den Handelsereignissen ===
+# Jedes Ereignis ändert nur die Summen eines Bots und seines Kontos (O(1)); unrealisiert wird beim Abfragen
+# aus Menge, Einstandskosten und dem letzten bekannten Preis gerechnet, ohne die Historie anzufassen.
+class PnLEngine:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bots = {}  # botname -> Aggregat
+        self.konten = {}  # api_key -> {"realisiert", "gebuehren", "positionen": {(symbol, seite): [menge, kosten]}}
+
+    @staticmethod
+    def _neu(symbol, seite, api_key):
+        return {"symbol": symbol, "position_side": seite, "api_key": api_key, "menge": 0.0, "kosten": 0.0,
+                "realisiert": 0.0, "gebuehren": 0.0, "fills": 0, "positionen_geschlossen": 0, "positionen_unbekannt": 0}
+
+    def _konto(self, api_key):
+        konto = self.konten.get(api_key)
+        if konto is None:
+            konto = self.konten[api_key] = {"realisiert": 0.0, "gebuehren": 0.0, "positionen": {}}
+        return konto
+
+    def aufnehmen(self, ereignis):
+        art = ereignis["art"]
+        if art not in ("fill", "close", "extern"):
+            return
+        seite = ereignis["position_side"]
+        vorzeichen = 1 if seite == "LONG" else -1
+        with self._lock:
+            bot = self.bots.get(ereignis["botname"])
+            if bot is None:
+                bot = self.bots[ereignis["botname"]] = self._neu(ereignis["symbol"], seite, ereignis["api_key"])
+            konto = self._konto(bot["api_key"] or ereignis["api_key"])
+            konto_pos = konto["positionen"].setdefault((bot["symbol"], seite), [0.0, 0.0])
+            preis = ereignis["preis"]
+
+            if art == "fill":
+                menge = ereignis["menge"]
+                gebuehr = menge * preis * TAKER_GEBUEHR
+                bot["menge"] += menge
+                bot["kosten"] += menge * preis
+                bot["fills"] += 1
+                konto_pos[0] += menge
+                konto_pos[1] += menge * preis
+            else:
+                if bot["menge"] <= 0:
+                    return
+                if preis <= 0 and art != "extern":
+                    return
+                # ohne Menge (extern) wird die ganze Position geschlossen
+                menge = min(ereignis["menge"] or bot["menge"], bot["menge"])
+                anteil_kosten = bot["kosten"] * menge / bot["menge"]
+                if preis > 0:
+                    gebuehr = menge * preis * (MAKER_GEBUEHR if ereignis.get("maker") else TAKER_GEBUEHR)
+                    gewinn = vorzeichen * (menge * preis - anteil_kosten)
+                else:
+                    # extern geschlossen, Schlusspreis unbekannt: Position austragen, aber keinen Gewinn erfinden
+                    gebuehr = gewinn = 0.0
+                    bot["positionen_unbekannt"] += 1
+                bot["realisiert"] += gewinn
+                konto["realisiert"] += gewinn
+                bot["menge"] -= menge
+                bot["kosten"] -= anteil_kosten
+                konto_pos[0] -= menge
+                konto_pos[1] -= anteil_kosten
+                if bot["menge"] <= 1e-12:
+                    bot["menge"] = bot["kosten"] = 0.0
+                    bot["positionen_geschlossen"] += 1
+            bot["gebuehren"] += gebuehr
+            konto["gebuehren"] += gebuehr
+            if ereignis["symbol"] and preis > 0:
+                letzte_preise.setdefault(ereignis["symbol"], preis)
+
+    @staticmethod
+    def _unrealisiert(symbol, seite, menge, kosten):
+        preis = letzte_preise.get(symbol)
+        if not menge or not preis:
+            return 0.0
+        return (1 if seite == "LONG" else -1) * (menge * preis - kosten)
+
+    def vergessen(self, botname):
+        # nur flache Bots: mit offener Position würde der Einstand für den späteren Schluss fehlen
+        with self._lock:
+            bot = self.bots.get(botname)
+            if bot is not None and not bot["menge"]:
+                del self.bots[botname]
+
+    def bot(self, botname):
+        with self._lock:
+            bot = self.bots.get(botname)
+            if bot is None:
+                return None
+            bot = dict(bot)
+        unrealisiert = self._unrealisiert(bot["symbol"], bot["position_side"], bot["menge"], bot["kosten"])
+        return {
+            "symbol": bot["symbol"], "position_side": bot["position_side"],
+            "menge": round(bot["menge"], 8), "einstand": round(bot["kosten"] / bot["menge"], 8) if bot["menge"] else None,
+            "preis": letzte_preise.get(bot["symbol"]), "realisiert": round(bot["realisiert"], 4),
+            "unrealisiert": round(unrealisiert, 4), "gebuehren": round(bot["gebuehren"], 4),
+            "netto": round(bot["realisiert"] + unrealisiert - bot["gebuehren"], 4),
+            "fills": bot["fills"], "positionen_geschlossen": bot["positionen_geschlossen"],
+            "positionen_ohne_schlusspreis": bot["positionen_unbekannt"],
+        }
+
+    def konto(self, api_key):
+        with self._lock:
+            konto = self.konten.get(api_key)
+            if konto is None:
+                return None
+            positionen = list(konto["positionen"].items())
+            realisiert, gebuehren = konto["realisiert"], konto["gebuehren"]
+        unrealisiert = sum(self._unrealisiert(symbol, seite, menge, kosten) for (symbol, seite), (menge, kosten) in positionen)
+        return {"realisiert": round(realisiert, 4), "unrealisiert": round(unrealisiert, 4), "gebuehren": round(gebuehren, 4),
+                "netto": round(realisiert + unrealisiert - gebuehren, 4),
+                "offene_positionen": sum(1 for _, (menge, _) in positionen if menge > 1e-12)}
+
+pnl_engine = PnLEngine()
+bot_zustaende.verdraengen_abonnenten.append(pnl_engine.vergessen)
+ereignis_abonnenten.append(pnl_engine.aufnehmen)
+
+def _konto_kurz(api_key):
+    # API-Keys nie vollständig ausgeben
+    return (api_key or "")[:6] + "…"
+
+def _konto_schluessel(api_key):
+    # gruppiert nach dem ganzen Key (zwei Keys mit gleichem Anfang bleiben getrennt), verrät ihn aber nicht
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+
+@app.route('/pnl', methods=['GET'])
+def pnl():
+    # ?botname=... für einen Bot, sonst alle Bots und Konten (seit Serverstart)
+    botname = request.args.get("botname")
+    if botname:
+        ergebnis = pnl_engine.bot(botname)
+        if ergebnis is None:
+            return jsonify({"error": True, "msg": f"Keine Fills für {botname} seit Start"}), 404
+        return jsonify(dict(ergebnis, botname=botname))
+    bots = {name: pnl_engine.bot(name) for name in list(pnl_engine.bots)}
+    konten = {_konto_schluessel(api_key): dict(pnl_engine.konto(api_key), konto=_konto_kurz(api_key))
+              for api_key in list(pnl_engine.konten)}
+    gesamt = {feld: round(sum(k[feld] for k in konten.values()), 4) for feld in ("realisiert", "unrealisiert", "gebuehren", "netto")}
+    return jsonify({"gesamt": gesamt, "konten": konten, "bots": bots})
+
+# === Bot-Übersicht: In-Memory-Index, wird nach jedem Alarm aktualisiert ===
+# /bots und /bots/<botname> lesen nur hieraus, ohne BingX- oder Firebase-Aufrufe
+bot_index = {}             # botname -> Eintrag (siehe bot_index_nach_alarm)
+bot_index_nach_status = {}  # status -> set(botnamen)
+bot_index_nach_symbol = {}  # symbol -> set(botnamen)
+_bot_index_lock = threading.Lock()
+
+def _bot_index_setzen(botname, eintrag):
+    # Eintrag ersetzen und die Nebenindizes nachziehen (Aufrufer hält den Lock)
+    alt = bot_index.get(botname)
+    for feld, nebenindex in (("status", bot_index_nach_status), ("symbol", bot_index_nach_symbol)):
+        if alt is not None and alt.get(feld) != eintrag.get(feld):
+            namen = nebenindex.get(alt.get(feld))
+            if namen is not None:
+                namen.discard(botname)
+                if not namen:
+                    del nebenindex[alt.get(feld)]
+        nebenindex.setdefault(eintrag.get(feld), set()).add(botname)
+    bot_index[botname] = eintrag
+
+def _bot_index_vergessen(botname):
+    with _bot_index_lock:
+        alt = bot_index.pop(botname, None)
+        if alt is None:
+            return
+        for feld, nebenindex in (("status", bot_index_nach_status), ("symbol", bot_index_nach_symbol)):
+            namen = nebenindex.get(alt.get(feld))
+            if namen is not None:
+                namen.discard(botname)
+                if not namen:
+                    del nebenindex[alt.get(feld)]
+
+bot_zustaende.verdraengen_abonnenten.append(_bot_index_vergessen)
+
+def bot_index_nach_alarm(botname, action, ergebnis, dauer_s):
+    """Übernimmt Ergebnis und lokalen Zustand eines Alarms in den Index."""
+    if not botname:
+        return
+    body, status_code = ergebnis if isinstance(ergebnis, tuple) else (ergebnis, 200)
+    if not isinstance(body, dict):
+        return
+    with _bot_index_lock:
+        eintrag = dict(bot_index.get(botname) or {"botname": botname})
+        eintrag["letzte_action"] = action
+        eintrag["letzter_alarm"] = datetime.now(timezone.utc).isoformat()
+        eintrag["letzte_latenz_ms"] = round(dauer_s * 1000, 1)
+        eintrag["letzter_http_status"] = status_code
+        position = bot_positionen.get(botname)
+        if position:
+            eintrag["symbol"] = position.get("symbol")
+            eintrag["position_side"] = position.get("position_side")
+        elif body.get("symbol"):
+            eintrag["symbol"] = body.get("symbol")
+        if body.get("status") == "position_closed":
+            eintrag.update(_bot_index_leer())
+            eintrag["status"] = "geschlossen"
+        elif not body.get("error") and "usdt_amount" in body:
+            kaufpreise = body.get("firebase_all_prices") or []
+            anzahl_so = alarm_counter.get(botname)
+            base_time = base_order_times.get(botname)
+            eintrag.update({
+                "status": status_fuer_alle.get(botname) or "OK",
+                "ordergroesse": saved_usdt_amounts.get(botname),
+                "letzte_order_usdt": body.get("usdt_amount"),
+                "anzahl_so": anzahl_so if anzahl_so is not None and anzahl_so >= 0 else max(anzahl_kaeufe(kaufpreise) - 1, 0),
+                "durchschnittspreis": body.get("firebase_average_price"),
+                "base_order_time": base_time.isoformat() if base_time else None,
+                "tp_preis": body.get("tp_price"),
+                "sl_preis": body.get("stop_loss_price"),
+            })
+        else:
+            eintrag["status"] = status_fuer_alle.get(botname) or "Fehler"
+            eintrag["letzter_fehler"] = body.get("msg") or body.get("error")
+        _bot_index_setzen(botname, eintrag)
+
+def _bot_index_leer():
+    return {"ordergroesse": None, "letzte_order_usdt": None, "anzahl_so": None, "durchschnittspreis": None,
+            "base_order_time": None, "tp_preis": None, "sl_preis": None}
+
+def bot_index_schliessen(botname):
+    # Position ist zu: Bot bleibt sichtbar, aber ohne Positionsdaten
+    with _bot_index_lock:
+        eintrag = bot_index.get(botname)
+        if eintrag is None:
+            return
+        eintrag = dict(eintrag, **_bot_index_leer())
+        eintrag["status"] = "geschlossen"
+        _bot_index_setzen(botname, eintrag)
+
+@app.route('/bots', methods=['GET'])
+def bots():
+    # Filter: ?status=OK&symbol=BTC-USDT, Seiten: ?offset=0&limit=100
+    status = request.args.get("status")
+    symbol = request.args.get("symbol")
+    offset = max(request.args.get("offset", default=0, type=int), 0)
+    limit = min(max(request.args.get("limit", default=100, type=int), 1), 1000)
+    with _bot_index_lock:
+        namen = None
+        if status is not None:
+            namen = set(bot_index_nach_status.get(status, ()))
+        if symbol is not None:
+            nach_symbol = bot_index_nach_symbol.get(symbol, set())
+            namen = set(nach_symbol) if namen is None else namen & nach_symbol
+        if namen is None:
+            namen = bot_index.keys()
+        namen = sorted(namen)
+        seite = [bot_index[name] for name in namen[offset:offset + limit]]
+    return jsonify({"anzahl": len(namen), "offset": offset, "limit": limit, "bots": seite})
+
+@app.route('/bots/<botname>/ladder', methods=['GET'])
+def bot_ladder_anzeigen(botname):
+    # zuletzt berechnete Leiter (wird bei jedem Kauf nur bei geänderten Eingaben neu gerechnet)
+    eintrag = _ladder_cache.get(botname)
+    if eintrag is None:
+        return jsonify({"error": True, "msg": f"Keine Leiter für {botname} (noch kein Kauf seit Start)"}), 404
+    return jsonify(dict(eintrag[1], botname=botname, naechste_so=alarm_counter.get(botname, -1) + 1))
+
+@app.route('/bots/<botname>', methods=['GET'])
+def bot_details(botname):
+    eintrag = bot_index.get(botname)
+    if eintrag is None:
+        return jsonify({"error": True, "msg": f"Bot {botname} nicht bekannt"}), 404
+    return jsonify(eintrag)
+
+# === Profiling einzelner Alarme: Header X-Profil, ?profil=1 oder Stichprobe mit PROFIL_RATE ===
+# Ohne PROFIL_VERZEICHNIS ist alles aus (eine Abfrage pro Request). Standard ist ein Sampling-Profiler über die
+# Wandzeit des Request-Threads (Warten auf BingX/Firebase zählt mit), Ausgabe als gefaltete Stacks (.folded,
+# für flamegraph.pl/inferno) und speedscope.json. Mit X-Profil: cprofile deterministisch per cProfile (.pstats).
+# Die Dateinamen stehen in der Antwort im Header X-Profil. Gezielte Profile (Header/Parameter) gibt es nur mit
+# X-Profil-Token = PROFIL_TOKEN, sonst könnte jeder Aufrufer einen Alarm verlangsamen und die Platte füllen.
+profil_statistik = {"profile": 0, "geloescht": 0, "fehler": 0, "letztes": None}
+_profil_pool = ThreadPoolExecutor(max_workers=1)  # schreibt die Dateien nach der Antwort
+
+def _profil_verzeichnis():
+    if shard_index is not None:
+        return os.path.join(PROFIL_VERZEICHNIS, f"shard_{shard_index}")
+    return PROFIL_VERZEICHNIS
+
+def profil_token_gueltig():
+    token = request.headers.get("X-Profil-Token") or ""
+    return bool(PROFIL_TOKEN) and hmac.compare_digest(token.encode(), PROFIL_TOKEN.encode())
+
+def profil_anfordern(data=None):
+    """Profiler für diesen Request oder None. Kostet ohne PROFIL_VERZEICHNIS nur diese eine Abfrage."""
+    if not PROFIL_VERZEICHNIS:
+        return None
+    modus = request.headers.get("X-Profil") or request.args.get("profil")
+    if modus and not profil_token_gueltig():
+        modus = None
+    if not modus and not (PROFIL_RATE > 0 and random.random() < PROFIL_RATE):
+        return None
+    botname = ((data or {}).get("RENDER") or {}).get("botname") or "alarm"
+    name = "{}_{}_{}".format(datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"),
+                             "".join(z if z.isalnum() or z in "-_" else "_" for z in str(botname))[:40], uuid.uuid4().hex[:6])
+    if modus == "cprofile":
+        return DeterministischerProfiler(name)
+    return StichprobenProfiler(name, PROFIL_INTERVALL)
+
+class StichprobenProfiler:
+    """
+    Tastet den Stack des aufrufenden Threads aus einem eigenen Thread alle intervall Sekunden ab.
+    Im Request-Thread kostet das nichts außer dem GIL-Anteil des Abtast-Threads.
+    """
+
+    def __init__(self, name, intervall=0.005):
+        self.name = name
+        self.intervall = intervall
+        self.proben = []  # (Zeitpunkt, Tupel von Frame-Indizes, Wurzel zuerst)
+        self.frames = {}  # (funktion, datei, zeile) -> Index
+        self.dateien = [f"{name}.folded", f"{name}.speedscope.json"]
+
+    def __enter__(self):
+        self._ziel = threading.get_ident()
+        self._stopp = threading.Event()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._abtasten, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _abtasten(self):
+        while not self._stopp.wait(self.intervall):
+            frame = sys._current_frames().get(self._ziel)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                schluessel = (code.co_name, code.co_filename, frame.f_lineno)
+                index = self.frames.get(schluessel)
+                if index is None:
+                    index = self.frames[schluessel] = len(self.frames)
+                stack.append(index)
+                frame = frame.f_back
+            if stack:
+                self.proben.append((time.perf_counter(), tuple(reversed(stack))))
+
+    def __exit__(self, *exc):
+        self._stopp.set()
+        self._thread.join()
+        self.dauer = time.perf_counter() - self._start
+        _profil_pool.submit(profil_schreiben, self)
+        return False
+
+    def _frame_namen(self):
+        namen = [None] * len(self.frames)
+        for (funktion, datei, zeile), index in self.frames.items():
+            namen[index] = f"{funktion} ({os.path.basename(datei)}:{zeile})"
+        return namen
+
+    def folded(self):
+        # eine Zeile pro Stack: "wurzel;...;blatt anzahl"
+        namen = self._frame_namen()
+        zaehler = {}
+        for _, stack in self.proben:
+            zaehler[stack] = zaehler.get(stack, 0) + 1
+        return "".join(f"{';'.join(namen[i] for i in stack)} {anzahl}\n" for stack, anzahl in zaehler.items())
+
+    def speedscope(self):
+        frames = [None] * len(self.frames)
+        for (funktion, datei, zeile), index in self.frames.items():
+            frames[index] = {"name": funktion, "file": datei, "line": zeile}
+        # Gewicht = tatsächlicher Abstand zur vorherigen Probe, damit Aussetzer des Abtast-Threads nicht verzerren
+        gewichte, vorher = [], self._start
+        for zeit, _ in self.proben:
+            gewichte.append(round(zeit - vorher, 6))
+            vorher = zeit
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": self.name, "unit": "seconds", "startValue": 0,
+                          "endValue": round(self.dauer, 6), "samples": [list(stack) for _, stack in self.proben],
+                          "weights": gewichte}],
+            "name": self.name,
+            "activeProfileIndex": 0,
+            "exporter": "mexc-trading-bot",
+        }
+
+    def schreiben(self, verzeichnis):
+        with open(os.path.join(verzeichnis, self.dateien[0]), "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        with open(os.path.join(verzeichnis, self.dateien[1]), "wb") as f:
+            f.write(json_dumps(self.speedscope()))
+
+class DeterministischerProfiler:
+    """cProfile für den Request-Thread; jede Funktion wird gezählt, dafür deutlich langsamer."""
+
+    def __init__(self, name):
+        self.name = name
+        self.dateien = [f"{name}.pstats"]
+        self._profil = cProfile.Profile()
+
+    def __enter__(self):
+        self._profil.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._profil.disable()
+        _profil_pool.submit(profil_schreiben, self)
+        return False
+
+    def schreiben(self, verzeichnis):
+        self._profil.dump_stats(os.path.join(verzeichnis, self.dateien[0]))
+
+def profil_starten(stapel, profiler):
+    """
+    Startet den Profiler im Stapel. Schlägt das fehl (cProfile neben einem anderen aktiven Profiler wirft ab
+    Python 3.12, kein Thread für den Sampler), läuft der Alarm ohne Profil weiter statt auszufallen.
+    """
+    if profiler is None:
+        return
+    try:
+        stapel.enter_context(profiler)
+    except Exception as e:
+        profil_statistik["fehler"] += 1
+        profiler.dateien = []
+        print(f"[Fehler] Profil {profiler.name} starten: {e}")
+
+def profil_schreiben(profiler):
+    verzeichnis = _profil_verzeichnis()
+    try:
+        os.makedirs(verzeichnis, exist_ok=True)
+        profiler.schreiben(verzeichnis)
+        profil_statistik["profile"] += 1
+        profil_statistik["letztes"] = profiler.name
+        profile_aufraeumen(verzeichnis)
+    except Exception as e:
+        profil_statistik["fehler"] += 1
+        print(f"[Fehler] Profil {profiler.name} schreiben: {e}")
+
+def profile_aufraeumen(verzeichnis, max_dateien=None, max_alter=None):
+    """Löscht Profildateien älter als max_alter Sekunden und die ältesten über max_dateien."""
+    max_dateien = PROFIL_MAX_DATEIEN if max_dateien is None else max_dateien
+    max_alter = PROFIL_MAX_ALTER if max_alter is None else max_alter
+    dateien = []
+    with os.scandir(verzeichnis) as eintraege:
+        for eintrag in eintraege:
+            if eintrag.is_file() and eintrag.name.endswith((".folded", ".speedscope.json", ".pstats")):
+                dateien.append((eintrag.stat().st_mtime, eintrag.path))
+    dateien.sort(reverse=True)
+    grenze = time.time() - max_alter
+    for index, (mtime, pfad) in enumerate(dateien):
+        if index >= max_dateien or mtime < grenze:
+            try:
+                os.remove(pfad)
+                profil_statistik["geloescht"] += 1
+            except FileNotFoundError:
+                pass
+
+@app.route('/webhook', methods=['POST'])
+def webhook():
+    if _betrieb["annahme_gestoppt"]:
+        return jsonify({"error": True, "msg": "Server fährt herunter, Alarm nicht angenommen"}), 503
+    profiler = profil_anfordern(request.get_json(silent=True)) if PROFIL_VERZEICHNIS else None
+    antwort = app.make_response(_webhook_ausfuehren(profiler))
+    if profiler is not None and profiler.dateien:
+        antwort.headers["X-Profil"] = ",".join(profiler.dateien)
+    return antwort
+
+def _webhook_ausfuehren(profiler=None):
+    data = request.json or {}
+    render = data.get("RENDER") or {}
+    kompakt = request.args.get("kompakt", "1" if (render.get("antwort") or ANTWORT_MODUS) == "kompakt" else "0") == "1"
+    mit_logs = request.args.get("logs") == "1"
+    action = (data.get("vyn") or {}).get("action", "").lower()
+    botname = render.get("botname")
+
+    def ausfuehren():
+        start = time.perf_counter()
+        with bot_sperre(botname) if botname else nullcontext():
+            if botname and bot_zustaende.verdraengt(botname):
+                cfg = bot_registry.get(botname)
+                try:
+                    # Registry-Bots schicken kein FIREBASE_SECRET im Alarm mit
+                    bot_zustaende.rehydrieren(botname, (cfg.firebase_secret if cfg is not None else None) or render.get("FIREBASE_SECRET"))
+                except Exception as e:
+                    # Firebase nicht erreichbar: mit leerem Zustand weiter, wie bei einem neuen Bot
+                    print(f"[Fehler] Zustand von {botname} nicht nachgeladen: {e}")
+            ergebnis = webhook_verarbeiten(data)
+        bot_index_nach_alarm(botname, action, ergebnis, time.perf_counter() - start)
+        deadline_nach_alarm(botname, ergebnis, data)
+        handel_ereignisse_aus_alarm(botname, ergebnis, data)
+        return antwort_aufbereiten(ergebnis, botname, action, kompakt, mit_logs)
+
+    gestartet = threading.Event()
+
+    def im_pool():
+        # läuft im Alarm-Pool (nach Priorität, pro Bot nacheinander); zählt bis zum Ende als laufender Alarm
+        gestartet.set()
+        try:
+            with app.app_context(), ExitStack() as stapel:
+                profil_starten(stapel, profiler)
+                schluessel = idempotenz_schluessel(data)
+                if schluessel is None:
+                    return ausfuehren() + ({},)
+                body, status, wiederholung = idempotent_ausfuehren(schluessel, ausfuehren)
+                return body, status, ({"X-Idempotent-Replay": "true"} if wiederholung else {})
+        finally:
+            alarm_beenden()
+
+    alarm_beginnen()
+    try:
+        future = alarm_pool.einreihen(botname or "_ohne_bot", alarm_prioritaet(data), im_pool)
+    except BaseException:
+        alarm_beenden()
+        raise
+    try:
+        if gestartet.wait(ALARM_START_WARTEN):
+            return future.result(ALARM_ANTWORT_WARTEN)
+    except FutureTimeoutError:
+        pass
+    return {"error": False, "angenommen": True, "botname": botname,
+            "msg": f"Alarm angenommen und eingereiht, Ergebnis unter /bots/{botname}"}, 202
+
+# === Reconciler: lokalen Bot-Zustand regelmäßig mit den Positionen auf BingX abgleichen ===
+# Erkennt Positionen, die per TP/SL/Liquidation geschlossen wurden, ohne auf den nächsten Alarm zu warten
+reconciler_status = {"laeufe": 0, "fehler": 0, "letzter_lauf": None, "dauer_ms": None,
+                     "bereinigt": 0, "verwaiste_positionen": []}
+_reconciler_verdacht = {}  # botname -> Anzahl Läufe in Folge ohne Position
+_reconciler_gemeldet = set()  # bereits gemeldete verwaiste Positionen (api_key, symbol, seite)
+_reconciler_thread = None
+
+def _reconciler_bots():
+    """
+    Bots mit lokalem Zustand, gruppiert nach API-Key: api_key -> {botname: eintrag}.
+    Zugangsdaten kommen aus dem letzten Alarm, sonst aus der Registry.
+    """
+    mit_zustand = set(saved_usdt_amounts) | set(base_order_times) | set(alarm_counter)
+    konten = {}
+    for botname in mit_zustand:
+        eintrag = bot_positionen.get(botname)
+        if eintrag is None:
+            cfg = bot_registry.get(botname)
+            if cfg is None or not cfg.symbol:
+                continue
+            eintrag = {"symbol": cfg.symbol, "position_side": cfg.position_side, "api_key": cfg.api_key,
+                       "secret_key": cfg.secret_key, "firebase_secret": cfg.firebase_secret, "zeit": None}
+        if not eintrag.get("api_key") or not eintrag.get("secret_key"):
+            continue
+        konten.setdefault(eintrag["api_key"], {})[botname] = eintrag
+    return konten
+
+def externer_abschluss(api_key, secret_key, symbol, position_side, seit=None):
+    """
+    Sucht in der Order-Historie von BingX die Orders, die eine extern geschlossene Position abgebaut haben
+    (gefüllt, gleiche Seite, Gegenrichtung, nach der Base Order). Rückgabe: {"menge", "preis", "maker", "typen"}
+    mit mengengewichtetem Durchschnittspreis oder None, wenn nichts Passendes gefunden wurde.
+    maker: nur Limit-Orders (unser TP); Stop-, Market- und Liquidations-Orders zählen als Taker.
+    """
+    jetzt_ms = int(time.time() * 1000)
+    start_ms = jetzt_ms - 7 * 24 * 3600 * 1000  # BingX liefert höchstens 7 Tage
+    if seit is not None:
+        start_ms = max(start_ms, int(seit.timestamp() * 1000))
+    seite = (position_side or "LONG").upper()
+    gegenrichtung = "SELL" if seite == "LONG" else "BUY"
+    try:
+        antwort = send_signed_request("GET", ALL_ORDERS_ENDPOINT, api_key, secret_key,
+                                      {"symbol": symbol, "startTime": start_ms, "endTime": jetzt_ms, "limit": 100})
+    except Exception as e:
+        print(f"[Fehler] Order-Historie für {symbol} {seite} nicht abrufbar: {e}")
+        return None
+    if antwort.get("code") != 0:
+        return None
+    orders = (antwort.get("data") or {}).get("orders") or []
+    menge = volumen = maker_menge = 0.0
+    typen = set()
+    for order in orders:
+        if (order.get("status") != "FILLED" or (order.get("positionSide") or "").upper() != seite
+                or (order.get("side") or "").upper() != gegenrichtung):
+            continue
+        order_menge = _zahl_oder_0(order.get("executedQty"))
+        order_preis = _zahl_oder_0(order.get("avgPrice"))
+        if order_menge <= 0 or order_preis <= 0:
+            continue
+        menge += order_menge
+        volumen += order_menge * order_preis
+        if order.get("type") == "LIMIT":
+            maker_menge += order_menge
+        typen.add(order.get("type"))
+    if menge <= 0:
+        return None
+    return {"menge": menge, "preis": volumen / menge, "maker": maker_menge >= menge, "typen": sorted(t for t in typen if t)}
+
+def reconcile():
+    """
+    Ein Abgleich: pro API-Key ein kontoweiter Positionsabruf.
+    - Bot hat lokalen Zustand, aber keine Position mehr (zwei Läufe in Folge) -> Zustand löschen wie bei action=close
+    - Position ohne zugehörigen Bot -> als verwaist melden
+    Bots mit einem Alarm innerhalb von RECONCILE_KARENZ werden übersprungen, da die Position gerade entsteht.
+    """
+    start = time.perf_counter()
+    bereinigt = []
+    verwaist = []
+    for api_key, bots in _reconciler_bots().items():
+        secret_key = next(iter(bots.values()))["secret_key"]
+        try:
+            snapshot = konto_snapshot(api_key, secret_key, erzwingen=True)
+        except Exception as e:
+            reconciler_status["fehler"] += 1
+            print(f"[Fehler] Reconciler: Positionen für Konto nicht abrufbar: {e}")
+            continue
+        if not snapshot["ok"]:
+            reconciler_status["fehler"] += 1
+            continue
+
+        offen = {schluessel for schluessel, pos in snapshot["positionen"].items() if _position_menge(pos) > 0}
+        for botname, eintrag in bots.items():
+            schluessel = (eintrag["symbol"], (eintrag["position_side"] or "").upper())
+            zuletzt = eintrag.get("zeit")
+            if schluessel in offen or (zuletzt is not None and zuletzt >= snapshot["zeit"] - RECONCILE_KARENZ):
+                _reconciler_verdacht.pop(botname, None)
+                continue
+            _reconciler_verdacht[botname] = _reconciler_verdacht.get(botname, 0) + 1
+            if _reconciler_verdacht[botname] < 2:
+                continue
+            # neuer Alarm während des Abgleichs? dann nicht anfassen
+            aktuell = bot_positionen.get(botname)
+            if aktuell is not None and aktuell.get("zeit") != zuletzt:
+                continue
+            _reconciler_verdacht.pop(botname, None)
+            # tatsächlichen Schluss-Fill holen; ohne ihn Preis 0 = unbekannt (zählt nicht in den realisierten PnL)
+            abschluss = externer_abschluss(api_key, eintrag["secret_key"], schluessel[0], schluessel[1], base_order_times.get(botname)) or {}
+            handel_ereignis("extern", botname, schluessel[0], schluessel[1], abschluss.get("menge"), abschluss.get("preis"),
+                            api_key=api_key, maker=abschluss.get("maker", False))
+            logs = bot_zustand_loeschen(botname, eintrag.get("firebase_secret") or FIREBASE_SECRET)
+            bereinigt.append(botname)
+            art = "/".join(abschluss["typen"]) + f" @ {abschluss['preis']:.8g}" if abschluss else "TP/SL/Liquidation, Preis unbekannt"
+            print(f"Reconciler: {botname} hat keine Position mehr auf BingX ({schluessel[0]} {schluessel[1]}, {art}) → Zustand gelöscht {logs}")
+            if RECONCILE_TELEGRAM:
+                sende_telegram_nachricht(botname, f"ℹ️ Position {schluessel[0]} {schluessel[1]} auf BingX geschlossen ({art}) → Bot-Zustand zurückgesetzt")
+
+        bekannt = {(e["symbol"], (e["position_side"] or "").upper()) for e in bots.values()}
+        bekannt |= {(e["symbol"], (e["position_side"] or "").upper()) for e in bot_positionen.values() if e.get("api_key") == api_key}
+        for symbol, seite in offen - bekannt:
+            verwaist.append({"symbol": symbol, "position_side": seite, "api_key": api_key[:6] + "…"})
+            if (api_key, symbol, seite) not in _reconciler_gemeldet:
+                _reconciler_gemeldet.add((api_key, symbol, seite))
+                print(f"⚠️ Reconciler: verwaiste Position {symbol} {seite} ohne Bot")
+                if RECONCILE_TELEGRAM:
+                    sende_telegram_nachricht("Reconciler", f"⚠️ Offene Position {symbol} {seite} ohne zugehörigen Bot")
+
+    reconciler_status["laeufe"] += 1
+    reconciler_status["bereinigt"] += len(bereinigt)
+    reconciler_status["verwaiste_positionen"] = verwaist
+    reconciler_status["letzter_lauf"] = datetime.now(timezone.utc).isoformat()
+    reconciler_status["dauer_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return {"bereinigt": bereinigt, "verwaist": verwaist}
+
+def _reconciler_schleife():
+    while True:
+        time.sleep(RECONCILE_INTERVALL)
+        if _betrieb["annahme_gestoppt"]:
+            return
+        try:
+            reconcile()
+        except Exception as e:
+            reconciler_status["fehler"] += 1
+            print(f"[Fehler] Reconciler: {e}")
+
+def reconciler_starten():
+    global _reconciler_thread
+    if _reconciler_thread is None and RECONCILE_INTERVALL > 0:
+        _reconciler_thread = threading.Thread(target=_reconciler_schleife, name="reconciler", daemon=True)
+        _reconciler_thread.start()
+
+# === Kompaktierer: Kaufpreis-Deltas regelmäßig in kaufpreise/<bot>/snapshot falten ===
+kompaktierer_status = {"laeufe": 0, "bots": 0, "gefaltet": 0, "konflikte": 0, "fehler": 0, "letzter_lauf": None}
+_kompaktierer_thread = None
+_kompaktiert_bei = {}  # botname -> Nachkauf-Zähler bei der letzten Kompaktierung (nur ohne Spiegel gebraucht)
+
+def kaufpreise_kompaktieren(botname, firebase_secret):
+    """
+    Ersetzt den Knoten per bedingtem PUT (ETag) durch {"snapshot": ...}. Kommt dazwischen ein Kauf dazu
+    oder wird der Knoten gelöscht, schlägt der PUT mit 412 fehl und es wird mit dem aktuellen Stand neu gefaltet.
+    Rückgabe: Anzahl gefalteter Deltas.
+    """
+    pfad = f"kaufpreise/{botname}"
+    daten, etag = firebase_lese_mit_etag(pfad, firebase_secret)
+    for _ in range(FIREBASE_CAS_VERSUCHE):
+        deltas = [k for k, v in (daten or {}).items() if k != KAUFPREISE_SNAPSHOT and isinstance(v, dict)]
+        if not deltas:
+            return 0  # leer, gelöscht oder schon verdichtet
+        knoten = {KAUFPREISE_SNAPSHOT: kaufpreise_falten(daten)}
+        ok, daten, etag = firebase_schreibe_wenn_unveraendert(pfad, knoten, etag, firebase_secret)
+        if ok:
+            firebase_spiegel.lokal_setzen("kaufpreise", botname, knoten)
+            return len(deltas)
+        kompaktierer_status["konflikte"] += 1
+    return 0
+
+def _kompaktierer_kandidaten():
+    # mit synchronem Spiegel ohne Lesezugriff, sonst grob über den Nachkauf-Zähler
+    kinder = firebase_spiegel.kinder_zaehlen("kaufpreise", ohne=(KAUFPREISE_SNAPSHOT,))
+    if kinder is not None:
+        # im Shard Bots ohne bekanntes Konto nur dort, wo sie gerade Alarme bekommen
+        return [name for name, anzahl in kinder.items() if anzahl >= KAUFPREISE_KOMPAKT_AB
+                and (bot_im_shard(name) or name in bot_positionen)]
+    for name in [name for name in _kompaktiert_bei if name not in alarm_counter]:
+        del _kompaktiert_bei[name]
+    kandidaten = []
+    for name, zaehler in list(alarm_counter.items()):
+        if zaehler is None:
+            continue
+        if zaehler < _kompaktiert_bei.get(name, -1):
+            del _kompaktiert_bei[name]  # neuer Zyklus
+        if zaehler - _kompaktiert_bei.get(name, -1) >= KAUFPREISE_KOMPAKT_AB:
+            kandidaten.append(name)
+    return kandidaten
+
+def kaufpreise_kompaktierer_lauf():
+    start = time.perf_counter()
+    bots = 0
+    for botname in _kompaktierer_kandidaten():
+        eintrag = bot_positionen.get(botname) or {}
+        cfg = bot_registry.get(botname)
+        firebase_secret = eintrag.get("firebase_secret") or (cfg.firebase_secret if cfg else None) or FIREBASE_SECRET
+        if not firebase_secret:
+            continue
+        try:
+            with bot_sperre(botname):
+                gefaltet = kaufpreise_kompaktieren(botname, firebase_secret)
+        except Exception as e:
+            kompaktierer_status["fehler"] += 1
+            print(f"[Fehler] Kaufpreise kompaktieren {botname}: {e}")
+            continue
+        _kompaktiert_bei[botname] = alarm_counter.get(botname, -1)
+        bots += gefaltet > 0
+        kompaktierer_status["gefaltet"] += gefaltet
+    kompaktierer_status["laeufe"] += 1
+    kompaktierer_status["bots"] += bots
+    kompaktierer_status["letzter_lauf"] = datetime.now(timezone.utc).isoformat()
+    kompaktierer_status["dauer_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return bots
+
+def _kompaktierer_schleife():
+    while True:
+        time.sleep(KAUFPREISE_KOMPAKT_INTERVALL)
+        if _betrieb["annahme_gestoppt"]:
+            return
+        try:
+            kaufpreise_kompaktierer_lauf()
+        except Exception as e:
+            kompaktierer_status["fehler"] += 1
+            print(f"[Fehler] Kompaktierer: {e}")
+
+def kompaktierer_starten():
+    global _kompaktierer_thread
+    if _kompaktierer_thread is None and KAUFPREISE_KOMPAKT_INTERVALL > 0 and FIREBASE_URL:
+        _kompaktierer_thread = threading.Thread(target=_kompaktierer_schleife, name="kompaktierer", daemon=True)
+        _kompaktierer_thread.start()
+
+# === Deadline-Scheduler: TP nach after_h Stunden auch ohne neuen Alarm auf sell_percentage2 umstellen ===
+# Heap mit (fällig_epoch, version, botname); überholte Einträge werden beim Herausnehmen verworfen (lazy delete)
+deadlines = {}  # botname -> {"faellig", "version", "symbol", "position_side", "sell_percentage2", "firebase_secret", "konto"}
+# Beim Verdrängen eines Bots bleibt seine Deadline: einen Eintrag gibt es nur, solange die TP-Umstellung aussteht,
+# und gerade Bots ohne neue Alarme brauchen sie; nach dem Auslösen wird er ohnehin entfernt.
+_deadline_heap = []
+_deadline_bedingung = threading.Condition()
+_deadline_version = itertools.count(1)
+_deadline_thread = None
+_deadline_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("DEADLINE_THREADS", "4")))
+deadline_statistik = {"geplant": 0, "ausgeloest": 0, "tp_neu_gesetzt": 0, "fehler": 0}
+
+_bot_sperren = weakref.WeakValueDictionary()  # eine Sperre lebt nur, solange jemand sie hält oder auf sie wartet
+_bot_sperren_lock = threading.Lock()
+
+def bot_sperre(botname):
+    # Alarme und Scheduler eines Bots laufen nacheinander, damit nie zwei TP-Orders gleichzeitig gesetzt werden.
+    # Gibt es keine Referenz mehr, verschwindet der Eintrag von selbst; so kann nie eine gehaltene Sperre
+    # beim Verdrängen gelöscht und für denselben Bot eine zweite angelegt werden.
+    with _bot_sperren_lock:
+        sperre = _bot_sperren.get(botname)
+        if sperre is None:
+            sperre = _bot_sperren[botname] = threading.RLock()
+        return sperre
+
+def firebase_speichere_deadline(botname, eintrag, firebase_secret):
+    url = f"{FIREBASE_URL}/deadlines/{botname}.json?auth={firebase_secret}"
+    daten = {k: eintrag[k] for k in ("symbol", "position_side", "sell_percentage2")}
+    if eintrag.get("konto"):
+        daten["konto"] = eintrag["konto"]
+    daten["faellig"] = datetime.fromtimestamp(eintrag["faellig"], timezone.utc).isoformat()
+    http_anfrage("PUT", url, json=daten)
+
+def firebase_loesche_deadline(botname, firebase_secret):
+    http_anfrage("DELETE", f"{FIREBASE_URL}/deadlines/{botname}.json?auth={firebase_secret}")
+
+def _deadline_einreihen(botname, eintrag):
+    # Aufruf nur mit _deadline_bedingung
+    eintrag["version"] = next(_deadline_version)
+    deadlines[botname] = eintrag
+    heapq.heappush(_deadline_heap, (eintrag["faellig"], eintrag["version"], botname))
+
+def deadline_planen(botname, faellig, symbol, position_side, sell_percentage2, firebase_secret=None, persistieren=True, konto=None):
+    """
+    Plant (oder verschiebt) die Deadline eines Bots; faellig als Unix-Zeit in Sekunden.
+    konto: _konto_schluessel des API-Keys, damit /close_all den Bot auch nach einem Neustart findet.
+    """
+    eintrag = {"faellig": faellig, "symbol": symbol, "position_side": position_side,
+               "sell_percentage2": sell_percentage2, "firebase_secret": firebase_secret, "konto": konto}
+    with _deadline_bedingung:
+        alt = deadlines.get(botname)
+        if alt is not None and all(alt.get(k) == eintrag[k] for k in ("faellig", "symbol", "position_side", "sell_percentage2", "konto")):
+            return
+        _deadline_einreihen(botname, eintrag)
+        deadline_statistik["geplant"] += 1
+        _deadline_bedingung.notify()
+    if persistieren and FIREBASE_URL and firebase_secret:
+        try:
+            firebase_speichere_deadline(botname, eintrag, firebase_secret)
+        except Exception as e:
+            print(f"[Fehler] Deadline für {botname} nicht in Firebase gespeichert: {e}")
+
+def deadline_entfernen(botname, firebase_secret=None):
+    with _deadline_bedingung:
+        eintrag = deadlines.pop(botname, None)
+    firebase_secret = firebase_secret or (eintrag or {}).get("firebase_secret")
+    if eintrag is not None and FIREBASE_URL and firebase_secret:
+        try:
+            firebase_loesche_deadline(botname, firebase_secret)
+        except Exception as e:
+            print(f"[Fehler] Deadline für {botname} nicht in Firebase gelöscht: {e}")
+
+def deadlines_laden(baum, firebase_secret=None):
+    """Baut den Heap beim Start aus dem Firebase-Baum deadlines in einem Schritt auf (heapify statt n-mal push)."""
+    with _deadline_bedingung:
+        for botname, wert in (baum or {}).items():
+            if botname in deadlines or not isinstance(wert, dict):
+                continue
+            try:
+                faellig = _iso_zeit_parsen(wert.get("faellig")).timestamp()
+                sell_percentage2 = float(wert["sell_percentage2"])
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+            eintrag = {"faellig": faellig, "symbol": wert.get("symbol"), "position_side": (wert.get("position_side") or "LONG").upper(),
+                       "sell_percentage2": sell_percentage2, "firebase_secret": firebase_secret, "konto": wert.get("konto"),
+                       "version": next(_deadline_version)}
+            deadlines[botname] = eintrag
+            _deadline_heap.append((faellig, eintrag["version"], botname))
+        heapq.heapify(_deadline_heap)
+        _deadline_bedingung.notify()
+    return len(deadlines)
+
+def deadline_nach_alarm(botname, ergebnis, data):
+    """Nach einem Alarm: Deadline = Base-Order-Zeit + after_h; bei close entfernen."""
+    if not botname:
+        return
+    body = ergebnis[0] if isinstance(ergebnis, tuple) else ergebnis
+    if not isinstance(body, dict):
+        return
+    if body.get("status") == "position_closed":
+        deadline_entfernen(botname)
+        return
+    if body.get("error") or "usdt_amount" not in body:
+        return
+    base_time = base_order_times.get(botname)
+    try:
+        cfg = bot_config_fuer_alarm(data)
+    except ValueError:
+        return
+    if base_time is None or cfg.after_h is None or cfg.sell_percentage2 is None:
+        return
+    faellig = base_time.timestamp() + float(cfg.after_h) * 3600
+    if faellig <= time.time():
+        # Zeit schon abgelaufen: der Alarm hat den TP bereits mit sell_percentage2 gesetzt
+        deadline_entfernen(botname, cfg.firebase_secret or FIREBASE_SECRET)
+        return
+    deadline_planen(botname, faellig, cfg.symbol, cfg.position_side, cfg.sell_percentage2, cfg.firebase_secret or FIREBASE_SECRET,
+                    konto=_konto_schluessel(cfg.api_key) if cfg.api_key else None)
+
+def _zugangsdaten(botname):
+    eintrag = bot_positionen.get(botname)
+    if eintrag and eintrag.get("api_key") and eintrag.get("secret_key"):
+        return eintrag["api_key"], eintrag["secret_key"]
+    cfg = bot_registry.get(botname)
+    if cfg is not None:
+        return cfg.api_key, cfg.secret_key
+    return None, None
+
+def tp_basispreis(botname, symbol, position_side, positions_raw, firebase_secret, logs):
+    """
+    Durchschnittspreis als TP-Basis wie im Webhook (Schritt 8): gewichteter Schnitt der Kaufpreise aus Firebase,
+    sonst avgPrice von BingX um 0,2 % zur sicheren Seite verschoben (LONG darunter, SHORT darüber). 0 = unbekannt.
+    """
+    if firebase_secret and status_fuer_alle.get(botname) != "Fehler":
+        durchschnittspreis = berechne_durchschnittspreis(firebase_lese_kaufpreise(botname, firebase_secret))
+        if durchschnittspreis:
+            logs.append(f"[Firebase] Durchschnittspreis berechnet: {durchschnittspreis}")
+            return durchschnittspreis
+    for pos in positions_raw or []:
+        if pos.get("symbol") == symbol and pos.get("positionSide", "").upper() == position_side:
+            avg_price = float(pos.get("avgPrice", 0) or pos.get("averagePrice", 0) or 0)
+            if avg_price > 0:
+                durchschnittspreis = round(avg_price * (1 - 0.002 if position_side == "LONG" else 1 + 0.002), 6)
+                logs.append(f"[Fallback] avgPrice von BingX verwendet: {durchschnittspreis}")
+                return durchschnittspreis
+            break
+    return 0
+
+def tp_neu_setzen(botname, eintrag):
+    """
+    Setzt die TP-Limit-Order eines Bots mit sell_percentage2 neu (Basis wie im Webhook, siehe tp_basispreis).
+    SL bleibt unverändert. Rückgabe: Liste von Log-Zeilen.
+    """
+    logs = []
+    api_key, secret_key = _zugangsdaten(botname)
+    if not api_key:
+        return [f"Keine Zugangsdaten für {botname} (kein Alarm seit Neustart, nicht in Registry) → TP bleibt bis zum nächsten Alarm"]
+    symbol, position_side = eintrag["symbol"], eintrag["position_side"]
+    menge, positions_raw, _ = get_current_position(api_key, secret_key, symbol, position_side)
+    if not menge:
+        return [f"Keine offene {position_side}-Position für {botname} → nichts zu tun"]
+    durchschnittspreis = tp_basispreis(botname, symbol, position_side, positions_raw,
+                                       eintrag.get("firebase_secret") or FIREBASE_SECRET, logs)
+    if durchschnittspreis <= 0:
+        return logs + [f"Kein Durchschnittspreis für {botname}, TP nicht neu gesetzt"]
+
+    faktor = 1 + eintrag["sell_percentage2"] / 100 if position_side == "LONG" else 1 - eintrag["sell_percentage2"] / 100
+    limit_price = round(durchschnittspreis * faktor, 6)
+    for order in _schliess_orders_filtern(get_open_orders(api_key, secret_key, symbol), position_side):
+        if order.get("type") == "LIMIT":
+            logs.append(f"Alte TP-Order gelöscht: {cancel_order(api_key, secret_key, symbol, str(order.get('orderId')))}")
+    if position_side == "LONG":
+        antwort = place_limit_sell_order(api_key, secret_key, symbol, menge, limit_price, position_side)
+    else:
+        antwort = SHORT_place_limit_buy_order(api_key, secret_key, symbol, menge, limit_price, position_side)
+    logs.append(f"TP neu gesetzt @ {limit_price} (sell_percentage2={eintrag['sell_percentage2']}): {antwort}")
+    if antwort.get("code") != 0:
+        raise Exception(f"TP-Order für {botname} abgelehnt: {antwort}")
+    with _bot_index_lock:
+        if botname in bot_index:
+            _bot_index_setzen(botname, dict(bot_index[botname], tp_preis=limit_price))
+    return logs
+
+def _deadline_ausloesen(botname, eintrag):
+    deadline_statistik["ausgeloest"] += 1
+    # ohne Zugangsdaten (anderer Shard, Neustart ohne Registry) bleibt die Deadline in Firebase erhalten
+    in_firebase_behalten = _zugangsdaten(botname)[0] is None
+
+    def ausfuehren():
+        with bot_sperre(botname):
+            with _deadline_bedingung:
+                # inzwischen neu geplant oder entfernt (z.B. close)?
+                if deadlines.get(botname) is not eintrag:
+                    return None
+            return tp_neu_setzen(botname, eintrag)
+
+    try:
+        logs = alarm_pool.einreihen(botname, PRIO_TP_SL, ausfuehren).result()
+        if logs is None:
+            return
+        gesetzt = any(zeile.startswith("TP neu gesetzt") for zeile in logs)
+        deadline_statistik["tp_neu_gesetzt"] += gesetzt
+        print(f"Deadline {botname}: " + " | ".join(str(zeile) for zeile in logs))
+        if gesetzt:
+            sende_telegram_nachricht(botname, f"⏰ after_h erreicht → TP mit sell_percentage2 neu gesetzt")
+    except Exception as e:
+        deadline_statistik["fehler"] += 1
+        print(f"[Fehler] Deadline {botname}: {e}")
+        sende_telegram_nachricht(botname, f"❌ TP konnte nach after_h nicht neu gesetzt werden: {e}")
+    with _deadline_bedingung:
+        if deadlines.get(botname) is eintrag:
+            del deadlines[botname]
+        else:
+            return
+    if FIREBASE_URL and eintrag.get("firebase_secret") and not in_firebase_behalten:
+        try:
+            firebase_loesche_deadline(botname, eintrag["firebase_secret"])
+        except Exception as e:
+            print(f"[Fehler] Deadline für {botname} nicht in Firebase gelöscht: {e}")
+
+def _deadline_schleife():
+    while True:
+        with _deadline_bedingung:
+            while True:
+                # überholte Heap-Einträge verwerfen
+                while _deadline_heap and deadlines.get(_deadline_heap[0][2], {}).get("version") != _deadline_heap[0][1]:
+                    heapq.heappop(_deadline_heap)
+                if _deadline_heap and _deadline_heap[0][0] <= time.time():
+                    _, _, botname = heapq.heappop(_deadline_heap)
+                    eintrag = deadlines[botname]
+                    break
+                warten = _deadline_heap[0][0] - time.time() if _deadline_heap else None
+                _deadline_bedingung.wait(warten)
+        if _betrieb["annahme_gestoppt"]:
+            return
+        _deadline_pool.submit(_deadline_ausloesen, botname, eintrag)
+
+def deadline_status():
+    with _deadline_bedingung:
+        offen = len(deadlines)
+        naechste = _deadline_heap[0][0] if _deadline_heap else None
+    return dict(deadline_statistik, offen=offen,
+                naechste=datetime.fromtimestamp(naechste, timezone.utc).isoformat() if naechste is not None else None)
+
+def deadline_scheduler_starten():
+    global _deadline_thread
+    if _deadline_thread is None:
+        _deadline_thread = threading.Thread(target=_deadline_schleife, name="deadlines", daemon=True)
+        _deadline_thread.start()
+
+# === Prioritäten: Schließen und TP/SL vor neuen Base-Orders ===
+# Order-Sequenzen laufen in einem eigenen Pool aus ALARM_SLOTS Threads, nicht in den gunicorn-Threads.
+# Der HTTP-Thread reiht den Alarm nur ein. Beginnt er nicht innerhalb von ALARM_START_WARTEN Sekunden (Pool voll)
+# oder ist er nach ALARM_ANTWORT_WARTEN Sekunden nicht fertig, antwortet der HTTP-Thread mit 202 und der Alarm läuft
+# im Pool weiter. So bleiben gunicorn-Threads frei und ein close wartet nicht in gunicorns Accept-Queue hinter BOs. Ein frei werdender Pool-Thread nimmt den wartenden Alarm mit der
+# kleinsten Priorität, wobei jede Sekunde Wartezeit 1/PRIO_ALTERUNG Stufen gutschreibt (keine BO verhungert).
+# Pro Bot läuft höchstens ein Alarm; weitere warten in der Schlange des Bots, ohne einen Pool-Thread zu belegen.
+ALARM_SLOTS = int(os.environ.get("ALARM_SLOTS", "24"))  # Threads im Alarm-Pool; 0 = Alarme im HTTP-Thread ausführen
+ALARM_START_WARTEN = float(os.environ.get("ALARM_START_WARTEN", "0.5"))  # Sekunden bis zur 202-Antwort, solange er wartet
+ALARM_ANTWORT_WARTEN = float(os.environ.get("ALARM_ANTWORT_WARTEN", "10"))  # Sekunden bis zur 202-Antwort, wenn er läuft
+PRIO_ALTERUNG = float(os.environ.get("PRIO_ALTERUNG", "10"))  # Sekunden Wartezeit pro gewonnener Prioritätsstufe
+PRIO_SCHLIESSEN, PRIO_TP_SL, PRIO_ORDER = 0, 1, 2
+PRIO_NAMEN = {PRIO_SCHLIESSEN: "schliessen", PRIO_TP_SL: "tp_sl", PRIO_ORDER: "order"}
+
+class PrioritaetsAusfuehrer:
+
+    def __init__(self, threads, alterung):
+        self.threads = threads
+        self.alterung = alterung
+        self._bedingung = threading.Condition()
+        self._bots = {}  # schlüssel (Bot) -> Heap (prio, nr, seit, future, funktion) seiner wartenden Aufträge
+        self._bereit = {prio: deque() for prio in PRIO_NAMEN}  # je Priorität (seit, schlüssel), älteste vorne
+        self._aktiv = set()  # Bots, deren Auftrag gerade läuft
+        self._nummern = itertools.count()
+        self._gestartet = False
+        self._wartezeiten = {prio: deque(maxlen=1000) for prio in PRIO_NAMEN}
+        self._zaehler = {prio: {"anfragen": 0, "gewartet": 0, "wartend": 0} for prio in PRIO_NAMEN}
+
+    def _naechster(self):
+        # Aufruf nur mit _bedingung; nur die Köpfe der Schlangen vergleichen (innerhalb einer Priorität FIFO).
+        # Einträge von Bots, die gerade laufen oder nichts mehr haben, sind überholt und werden verworfen.
+        jetzt = time.monotonic()
+        while True:
+            beste = None
+            for prio, schlange in self._bereit.items():
+                if schlange:
+                    effektiv = prio - (jetzt - schlange[0][0]) / self.alterung
+                    if beste is None or effektiv < beste[0]:
+                        beste = (effektiv, prio)
+            if beste is None:
+                return None
+            _, schluessel = self._bereit[beste[1]].popleft()
+            if schluessel not in self._aktiv and self._bots.get(schluessel):
+                return schluessel
+
+    def _arbeiten(self):
+        while True:
+            with self._bedingung:
+                schluessel = self._naechster()
+                while schluessel is None:
+                    # mit Timeout, damit Alterung auch ohne neues Ereignis neu bewertet wird
+                    self._bedingung.wait(1.0)
+                    schluessel = self._naechster()
+                self._aktiv.add(schluessel)
+                prio, _, seit, future, funktion = heapq.heappop(self._bots[schluessel])
+                gewartet = time.monotonic() - seit
+                self._zaehler[prio]["wartend"] -= 1
+                self._zaehler[prio]["gewartet"] += gewartet > 0.01
+                self._wartezeiten[prio].append(gewartet)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(funktion())
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._bedingung:
+                self._aktiv.discard(schluessel)
+                auftraege = self._bots[schluessel]
+                if auftraege:
+                    self._bereit[auftraege[0][0]].append((auftraege[0][2], schluessel))
+                    self._bedingung.notify()
+                else:
+                    del self._bots[schluessel]
+
+    def einreihen(self, schluessel, prio, funktion):
+        """Reiht funktion für den Bot schluessel ein; Rückgabe: Future mit ihrem Ergebnis."""
+        future = Future()
+        if self.threads <= 0:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(funktion())
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        with self._bedingung:
+            if not self._gestartet:
+                # erst beim ersten Alarm, damit Importe (Shard-Prozesse, gunicorn-Master) keine Threads starten
+                for i in range(self.threads):
+                    threading.Thread(target=self._arbeiten, name=f"alarm-{i}", daemon=True).start()
+                self._gestartet = True
+            jetzt = time.monotonic()
+            heapq.heappush(self._bots.setdefault(schluessel, []), (prio, next(self._nummern), jetzt, future, funktion))
+            self._zaehler[prio]["anfragen"] += 1
+            self._zaehler[prio]["wartend"] += 1
+            if schluessel not in self._aktiv:
+                self._bereit[prio].append((jetzt, schluessel))
+                self._bedingung.notify()
+        return future
+
+    def statistik(self):
+        with self._bedingung:
+            ergebnis = {"threads": self.threads, "aktiv": len(self._aktiv)}
+            for prio, name in PRIO_NAMEN.items():
+                werte = sorted(self._wartezeiten[prio])
+                ergebnis[name] = dict(
+                    self._zaehler[prio],
+                    warte_p50_ms=round(werte[len(werte) // 2] * 1000, 1) if werte else None,
+                    warte_p95_ms=round(werte[int(len(werte) * 0.95)] * 1000, 1) if werte else None,
+                    warte_max_ms=round(werte[-1] * 1000, 1) if werte else None,
+                )
+        return ergebnis
+
+alarm_pool = PrioritaetsAusfuehrer(ALARM_SLOTS, PRIO_ALTERUNG)
+
+def alarm_prioritaet(data):
+    action = ((data.get("vyn") or {}).get("action") or "").lower()
+    return PRIO_SCHLIESSEN if action == "close" else PRIO_ORDER
+
+# === Betrieb: laufende Alarme zählen, beim Herunterfahren sauber abarbeiten ===
+_betrieb = {"laufend": 0, "annahme_gestoppt": False}
+_betrieb_bedingung = threading.Condition()
+
+def alarm_beginnen():
+    with _betrieb_bedingung:
+        _betrieb["laufend"] += 1
+
+def alarm_beenden():
+    with _betrieb_bedingung:
+        _betrieb["laufend"] -= 1
+        _betrieb_bedingung.notify_all()
+
+class alarm_in_arbeit:
+    """Zählt laufende Order-Sequenzen, damit beim Herunterfahren keine Market-Order ohne TP/SL bleibt."""
+
+    def __enter__(self):
+        alarm_beginnen()
+
+    def __exit__(self, *exc):
+        alarm_beenden()
+        return False
+
+def annahme_stoppen():
+    # ab jetzt keine neuen Alarme, /ready meldet 503; auch aus einem Signal-Handler aufrufbar (nimmt keinen Lock)
+    _betrieb["annahme_gestoppt"] = True
+
+def herunterfahren(timeout=60):
+    """
+    Nimmt keine neuen Alarme mehr an und wartet, bis alle laufenden fertig sind (max. timeout Sekunden).
+    Rückgabe: Anzahl Alarme, die beim Timeout noch liefen.
+    """
+    with _betrieb_bedingung:
+        _betrieb["annahme_gestoppt"] = True
+        print(f"Herunterfahren: warte auf {_betrieb['laufend']} laufende Alarme")
+        _betrieb_bedingung.wait_for(lambda: _betrieb["laufend"] == 0, timeout=timeout)
+        if _betrieb["laufend"]:
+            print(f"⚠️ Herunterfahren nach {timeout}s mit {_betrieb['laufend']} laufenden Alarmen")
+        laufend = _betrieb["laufend"]
+    shards_stoppen(timeout)
+    firebase_spiegel.stoppen()
+    if journal is not None:
+        journal.flush()
+    return laufend
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Load Balancer schickt nur Alarme, wenn Warm-up fertig ist und nicht heruntergefahren wird
+    bereit = (warmup_status.get("fertig") and not _betrieb["annahme_gestoppt"]
+              and all(shard.prozess.is_alive() and shard.warmup is not None for shard in _shards))
+    return jsonify({
+        "bereit": bool(bereit),
+        "warmup": warmup_status,
+        "laufende_alarme": _betrieb["laufend"],
+        "annahme_gestoppt": _betrieb["annahme_gestoppt"]
+    }), (200 if bereit else 503)
+
+# Kennzahlen für /stats: name -> Funktion, die ein dict liefert
+stats_quellen = {
+    "circuit_breaker": lambda: {name: breaker.status() for name, breaker in circuit_breaker.items()},
+    "hedging": hedge_statistik,
+    "zeit_sync": lambda: dict(zeit_sync),
+    "firebase_spiegel": lambda: firebase_spiegel.status(),
+    "firebase_cas": lambda: dict(cas_statistik, etags=len(firebase_etags)),
+    "bot_zustand": lambda: bot_zustaende.stats(),
+    "prioritaeten": lambda: alarm_pool.statistik(),
+    "reconciler": lambda: dict(reconciler_status),
+    "profiler": lambda: dict(profil_statistik, aktiv=bool(PROFIL_VERZEICHNIS), rate=PROFIL_RATE, gezielt=bool(PROFIL_TOKEN)),
+    "kompaktierer": lambda: dict(kompaktierer_status),
+    "journal": lambda: {"aktiv": journal is not None, "zeilen": journal.zeilen if journal else 0,
+                        "segmente": journal.segmente if journal else 0},
+    "deadlines": deadline_status,
+}
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({name: quelle() for name, quelle in stats_quellen.items()})
+
+@app.route('/debug/logs/<botname>', methods=['GET'])
+def debug_logs(botname):
+    # letzte Requests eines Bots, Logs werden erst hier formatiert; enthalten Orders und Kontostände, daher nur mit Token
+    token = request.headers.get("X-Debug-Token") or ""
+    if not DEBUG_TOKEN or not hmac.compare_digest(token.encode(), DEBUG_TOKEN.encode()):
+        return jsonify({"error": True, "msg": "X-Debug-Token fehlt oder ist falsch"}), 403
+    anzahl = max(request.args.get("n", default=BOT_LOG_PUFFER, type=int), 0)
+    with _bot_log_lock:
+        puffer = bot_log_puffer.get(botname)
+        eintraege = list(puffer)[-anzahl:] if puffer and anzahl else []
+    if not puffer:
+        return jsonify({"error": True, "msg": f"Keine Logs für {botname}"}), 404
+    return jsonify({"botname": botname, "requests": eintraege})
+
+
+# === Sharding: Bots nach API-Key auf feste Worker-Prozesse verteilen ===
+# Der Front-Prozess nimmt die HTTP-Requests an und leitet sie per Pipe an den Shard des Kontos weiter.
+# Jeder Shard hat eigene HTTP-Session, Caches, Bot-Zustand und Hintergrund-Threads.
+# Im Shard laufen die Alarme wie ohne Sharding über den Alarm-Pool: pro Bot nacheinander, close vor BO/SO.
+SHARDS = int(os.environ.get("SHARDS", "0"))  # 0 = kein Sharding, alles in diesem Prozess
+SHARD_THREADS = int(os.environ.get("SHARD_THREADS", "32"))  # Request-Threads pro Shard (wie WEB_THREADS, warten nur auf den Pool)
+SHARD_TIMEOUT = float(os.environ.get("SHARD_TIMEOUT", "120"))  # Sekunden, bis der Front-Prozess bei Abfragen aufgibt
+_SHARD_HEADER = ("Content-Type", "X-Idempotent-Replay", "X-Profil")
+shard_index = None  # im Shard-Prozess: eigene Nummer
+_shards = []  # im Front-Prozess: eine _ShardVerbindung pro Shard
+_shards_erwartet = 0
+_registry_routing = {}  # im Shard-Prozess: botname -> Routing-Schlüssel aller Registry-Bots, auch fremder
+
+def shard_fuer(schluessel, anzahl=None):
+    # stabil über Neustarts und Prozesse (hash() ist pro Prozess zufällig)
+    return int.from_bytes(hashlib.sha256(str(schluessel).encode("utf-8")).digest()[:8], "big") % (anzahl or SHARDS)
+
+def bot_im_shard(botname):
+    """
+    Im Shard-Prozess: True = Bot gehört zu diesem Shard, False = zu einem anderen, None = unbekannt
+    (Bot ohne Registry-Eintrag, sein Konto steht erst im Alarm). Ohne Sharding immer True.
+    """
+    if shard_index is None:
+        return True
+    schluessel = _registry_routing.get(botname)
+    if schluessel is None:
+        return None
+    return shard_fuer(schluessel) == shard_index
+
+def _routing_schluessel(data):
+    render = data.get("RENDER") or {}
+    cfg = bot_registry.get(render.get("botname"))
+    return (cfg.api_key if cfg is not None else None) or render.get("api_key") or render.get("botname") or ""
+
+class _ShardVerbindung:
+
+    def __init__(self, index):
+        kontext = multiprocessing.get_context("spawn")  # kein fork aus einem Prozess mit laufenden Threads
+        self.index = index
+        self.verbindung, kind = kontext.Pipe()
+        self.prozess = kontext.Process(target=_shard_prozess, args=(index, kind), name=f"shard-{index}", daemon=True)
+        self.prozess.start()
+        kind.close()
+        self._ids = itertools.count(1)
+        self._offen = {}
+        self._lock = threading.Lock()
+        self.warmup = None  # Warm-up-Status, sobald der Shard bereit gemeldet hat
+        self._empfaenger = threading.Thread(target=self._empfangen, name=f"shard-{index}-antworten", daemon=True)
+        self._empfaenger.start()
+
+    def _empfangen(self):
+        while True:
+            try:
+                nachricht = self.verbindung.recv()
+            except (EOFError, OSError):
+                break
+            if nachricht[0] == "bereit":
+                self.warmup = nachricht[1]
+                _shards_bereit_pruefen()
+                continue
+            _, anfrage_id, status, header, body = nachricht
+            future = self._offen.pop(anfrage_id, None)
+            if future is not None:
+                future.set_result((body, status, header))
+        # Shard beendet: wartende Requests nicht hängen lassen
+        for future in list(self._offen.values()):
+            future.set_exception(AbhaengigkeitNichtVerfuegbar(f"Shard {self.index} beendet"))
+        self._offen.clear()
+
+    def senden(self, methode, pfad, header, body):
+        future = Future()
+        with self._lock:
+            anfrage_id = next(self._ids)
+            self._offen[anfrage_id] = future
+            self.verbindung.send(("http", anfrage_id, methode, pfad, header, body))
+        return future
+
+    def stoppen(self, timeout):
+        try:
+            with self._lock:
+                self.verbindung.send(("stop", timeout))
+        except (OSError, ValueError):
+            pass
+        self.prozess.join(timeout + 5)
+
+def _shard_prozess(index, verbindung):
+    """Einstieg im Shard-Prozess: Requests aus der Pipe mit dem normalen Flask-App-Code ausführen."""
+    global shard_index
+    shard_index = index
+    server_vorbereiten()
+    verbindung.send(("bereit", dict(warmup_status)))
+    client = app.test_client()
+    sende_lock = threading.Lock()
+    # Priorität und Reihenfolge pro Bot regelt der Alarm-Pool im Webhook; hier nur Requests annehmen und beantworten
+    pool = ThreadPoolExecutor(max_workers=SHARD_THREADS)
+
+    def ausfuehren(anfrage_id, methode, pfad, header, body):
+        try:
+            antwort = client.open(pfad, method=methode, headers=header, data=body)
+            ergebnis = (antwort.status_code, {k: antwort.headers[k] for k in _SHARD_HEADER if k in antwort.headers}, antwort.get_data())
+        except Exception as e:
+            ergebnis = (500, {"Content-Type": "application/json"}, json_dumps({"error": True, "msg": f"Shard {index}: {e}"}))
+        with sende_lock:
+            verbindung.send(("antwort", anfrage_id) + ergebnis)
+
+    while True:
+        try:
+            nachricht = verbindung.recv()
+        except (EOFError, OSError):
+            break
+        if nachricht[0] == "stop":
+            herunterfahren(nachricht[1])
+            break
+        pool.submit(ausfuehren, *nachricht[1:])
+    pool.shutdown(wait=True)
+
+def shards_starten(anzahl=None):
+    global _shards_erwartet
+    anzahl = anzahl or SHARDS
+    if _shards or anzahl <= 0 or shard_index is not None:
+        return
+    _shards_erwartet = anzahl
+    warmup_status.update({"fertig": False, "msg": f"warte auf {anzahl} Shards"})
+    _shards.extend(_ShardVerbindung(i) for i in range(anzahl))
+    _shards_bereit_pruefen()  # falls ein Shard schon gemeldet hat, bevor die Liste vollständig war
+    print(f"Sharding: {anzahl} Shard-Prozesse gestartet")
+
+def _shards_bereit_pruefen():
+    # Front-Prozess: Warm-up ist erst fertig, wenn jeder Shard seinen eigenen Warm-up gemeldet hat
+    anzahl = _shards_erwartet
+    bereit = [shard for shard in list(_shards) if shard.warmup is not None]
+    warmup_status.update({"fertig": len(bereit) == anzahl, "msg": f"{len(bereit)}/{anzahl} Shards bereit",
+                          "shards": {shard.index: shard.warmup for shard in bereit}})
+    if len(bereit) == anzahl:
+        print(f"Sharding: alle {anzahl} Shards bereit")
+
+def shards_stoppen(timeout=60):
+    for shard in _shards:
+        shard.stoppen(timeout)
+
+def _shard_antwort(future):
+    # ohne Timeout: ein weitergeleiteter Alarm wird im Shard auf jeden Fall ausgeführt, ein 503 würde den Absender
+    # zum erneuten Senden verleiten. Die Future endet spätestens, wenn der Shard-Prozess stirbt.
+    try:
+        body, status, header = future.result()
+    except Exception as e:
+        return jsonify({"error": True, "msg": f"Shard beendet, Ausführung des Alarms unbekannt: {e}"}), 502
+    return app.response_class(body, status=status, headers=header)
+
+@app.before_request
+def _an_shard_weiterleiten():
+    # nur im Front-Prozess mit aktivem Sharding; /health und /ready beantwortet der Front-Prozess selbst
+    if not _shards or request.path in ("/health", "/ready"):
+        return None
+    pfad = request.full_path if request.query_string else request.path
+    header = {k: request.headers[k] for k in ("Content-Type", "X-Profil", "X-Profil-Token", "X-Debug-Token") if k in request.headers}
+    body = request.get_data()
+    if request.path in ("/webhook", "/close_all"):
+        if request.path == "/webhook" and _betrieb["annahme_gestoppt"]:
+            return jsonify({"error": True, "msg": "Server fährt herunter, Alarm nicht angenommen"}), 503
+        schluessel = _routing_schluessel(json_loads(body) if body else {})
+        with alarm_in_arbeit():
+            return _shard_antwort(_shards[shard_fuer(schluessel, len(_shards))].senden(request.method, pfad, header, body))
+
+    # Abfragen (/bots, /pnl, /stats, ...): an alle Shards
+    futures = [shard.senden(request.method, pfad, header, body) for shard in _shards]
+    antworten = []
+    for future in futures:
+        try:
+            antworten.append(future.result(SHARD_TIMEOUT))
+        except Exception as e:
+            antworten.append((json_dumps({"error": True, "msg": f"Shard antwortet nicht: {e}"}), 504, {}))
+    gefunden = [a for a in antworten if a[1] < 400]
+    if len(gefunden) == 1 and all(a[1] == 404 for a in antworten if a is not gefunden[0]):
+        body, status, header = gefunden[0]
+        return app.response_class(body, status=status, headers=header)
+    return jsonify({"shards": [json_loads(a[0]) if a[0] else None for a in antworten]}), max(a[1] for a in antworten)
+
+def server_vorbereiten():
+    # Konfiguration und Zustand laden, bevor Alarme angenommen werden (auch von gunicorn.conf.py aufgerufen)
+    bot_registry_laden()
+    if SHARDS > 0 and shard_index is None:
+        # Front-Prozess: nur weiterleiten, Zustand und Hintergrund-Threads liegen in den Shards;
+        # /ready wird erst 200, wenn alle Shards ihren Warm-up gemeldet haben (_shards_bereit_pruefen)
+        shards_starten()
+        return
+    if shard_index is not None:
+        # Spiegel, Warm-up, Deadlines und Kompaktierer nur für die eigenen Bots (siehe bot_im_shard)
+        _registry_routing.update({name: cfg.api_key or name for name, cfg in bot_registry.items()})
+        for botname in [name for name in bot_registry if not bot_im_shard(name)]:
+            del bot_registry[botname]
+        firebase_spiegel.behalten = lambda name: bot_im_shard(name) is not False
+    if FIREBASE_STREAM_NUR_REGISTRY and bot_registry:
+        # die Registry steht vor dem ersten Resync fest, Bots außerhalb werden nie gespiegelt und immer per GET gelesen
+        firebase_spiegel.behalten = lambda name: name in bot_registry
+    firebase_spiegel_starten()
+    startup_warmup()
+    zeit_sync_starten()
+    reconciler_starten()
+    kompaktierer_starten()
+    deadline_scheduler_starten()
+    journal_starten()
+
+def _sigterm(signum, frame):
+    herunterfahren(float(os.environ.get("DRAIN_TIMEOUT", "60")))
+    sys.exit(0)
 
 if __name__ == "__main__":
-    # Achtung: debug=True in Produktion ausschalten
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Nur für lokale Tests. Produktion: gunicorn -c gunicorn.conf.py main:app
+    server_vorbereiten()
+    signal.signal(signal.SIGTERM, _sigterm)
+    debug = os.environ.get("FLASK_DEBUG", "0") == "1"
+    app.run(debug=debug, use_reloader=debug, threaded=True, host="0.0.0.0", port=int(os.environ.get("PORT", "5000")))
         
         
 
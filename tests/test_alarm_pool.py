@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+import main
+
+TIMEOUT = 5
+
+
+def _blockieren(pool, schluessel="blocker"):
+    """Belegt den einzigen Pool-Thread, bis das zurückgegebene Event gesetzt wird."""
+    laeuft, weiter = threading.Event(), threading.Event()
+
+    def job():
+        laeuft.set()
+        weiter.wait(TIMEOUT)
+        return schluessel
+
+    future = pool.einreihen(schluessel, main.PRIO_ORDER, job)
+    assert laeuft.wait(TIMEOUT)
+    return weiter, future
+
+
+def _merken(reihenfolge, name):
+    def job():
+        reihenfolge.append(name)
+        return name
+    return job
+
+
+def test_prioritaet_vor_reihenfolge():
+    pool = main.PrioritaetsAusfuehrer(1, 3600)
+    weiter, blocker = _blockieren(pool)
+    reihenfolge = []
+    futures = [
+        pool.einreihen("bot1", main.PRIO_ORDER, _merken(reihenfolge, "bo")),
+        pool.einreihen("bot2", main.PRIO_TP_SL, _merken(reihenfolge, "tp")),
+        pool.einreihen("bot3", main.PRIO_SCHLIESSEN, _merken(reihenfolge, "close")),
+        pool.einreihen("bot4", main.PRIO_ORDER, _merken(reihenfolge, "bo2")),
+    ]
+    weiter.set()
+    assert [f.result(TIMEOUT) for f in futures] == ["bo", "tp", "close", "bo2"]
+    assert blocker.result(TIMEOUT) == "blocker"
+    assert reihenfolge == ["close", "tp", "bo", "bo2"]
+
+
+def test_pro_bot_nacheinander_und_close_ueberholt():
+    pool = main.PrioritaetsAusfuehrer(4, 3600)
+    weiter, blocker = _blockieren(pool, "bot")
+    reihenfolge, laufend, hoechstens = [], [0], [0]
+    sperre = threading.Lock()
+
+    def job(name):
+        def ausfuehren():
+            with sperre:
+                laufend[0] += 1
+                hoechstens[0] = max(hoechstens[0], laufend[0])
+            time.sleep(0.01)
+            reihenfolge.append(name)
+            with sperre:
+                laufend[0] -= 1
+        return ausfuehren
+
+    futures = [pool.einreihen("bot", main.PRIO_ORDER, job(f"bo{i}")) for i in range(3)]
+    futures.append(pool.einreihen("bot", main.PRIO_SCHLIESSEN, job("close")))
+    weiter.set()
+    for future in futures + [blocker]:
+        future.result(TIMEOUT)
+    assert reihenfolge == ["close", "bo0", "bo1", "bo2"]
+    assert hoechstens[0] == 1
+
+
+def test_alterung_laesst_alte_bo_vor_neuem_close():
+    pool = main.PrioritaetsAusfuehrer(1, 0.01)  # 10 ms Wartezeit = eine Stufe
+    weiter, blocker = _blockieren(pool)
+    reihenfolge = []
+    alt = pool.einreihen("bot1", main.PRIO_ORDER, _merken(reihenfolge, "bo"))
+    time.sleep(0.1)
+    neu = pool.einreihen("bot2", main.PRIO_SCHLIESSEN, _merken(reihenfolge, "close"))
+    weiter.set()
+    alt.result(TIMEOUT), neu.result(TIMEOUT), blocker.result(TIMEOUT)
+    assert reihenfolge == ["bo", "close"]
+
+
+def test_ausnahme_landet_im_future():
+    pool = main.PrioritaetsAusfuehrer(1, 3600)
+    with pytest.raises(ZeroDivisionError):
+        pool.einreihen("bot", main.PRIO_ORDER, lambda: 1 / 0).result(TIMEOUT)
+    # der Bot ist danach wieder frei
+    assert pool.einreihen("bot", main.PRIO_ORDER, lambda: 7).result(TIMEOUT) == 7
+
+
+def test_ohne_threads_im_aufrufer():
+    pool = main.PrioritaetsAusfuehrer(0, 3600)
+    future = pool.einreihen("bot", main.PRIO_ORDER, threading.get_ident)
+    assert future.done() and future.result() == threading.get_ident()
+
+
+def test_statistik_zaehlt_pro_prioritaet():
+    pool = main.PrioritaetsAusfuehrer(1, 3600)
+    for prio in (main.PRIO_SCHLIESSEN, main.PRIO_ORDER, main.PRIO_ORDER):
+        pool.einreihen("bot", prio, lambda: None).result(TIMEOUT)
+    statistik = pool.statistik()
+    assert statistik["schliessen"]["anfragen"] == 1
+    assert statistik["order"]["anfragen"] == 2
+    assert statistik["order"]["wartend"] == 0
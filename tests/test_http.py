@@ -0,0 +1,125 @@
+import json
+
+import pytest
+import requests
+
+import main
+
+URL = main.BASE_URL + "/openApi/swap/v2/trade/order"
+
+
+class Antwort:
+    def __init__(self, status_code=200, daten=None):
+        self.status_code = status_code
+        self.content = json.dumps(daten if daten is not None else {"code": 0}).encode()
+
+
+@pytest.fixture
+def sitzung(monkeypatch):
+    """Gestubbte HTTP-Session: antworten ist eine Liste aus Antwort-Objekten oder Exceptions, aufrufe protokolliert."""
+    stub = {"antworten": [], "aufrufe": []}
+
+    def request(methode, url, **kwargs):
+        stub["aufrufe"].append((methode, url, kwargs))
+        antwort = stub["antworten"].pop(0)
+        if isinstance(antwort, Exception):
+            raise antwort
+        return antwort
+
+    monkeypatch.setattr(main._http_session, "request", request)
+    monkeypatch.setattr(main, "circuit_breaker", {name: main.CircuitBreaker(name) for name in main.HTTP_TIMEOUTS})
+    monkeypatch.setattr(main, "HTTP_RETRIES", 2)
+    monkeypatch.setattr(main, "HEDGING", False)
+    monkeypatch.setattr(main.time, "sleep", lambda sekunden: None)
+    return stub
+
+
+def test_get_wird_nach_timeout_wiederholt(sitzung):
+    sitzung["antworten"] = [requests.Timeout("read"), requests.ConnectionError("reset"), Antwort()]
+    assert main.http_anfrage("GET", URL).status_code == 200
+    assert len(sitzung["aufrufe"]) == 3
+    assert main.circuit_breaker["bingx"].fehler_in_folge == 0
+
+
+def test_timeout_pro_abhaengigkeit(sitzung):
+    sitzung["antworten"] = [Antwort()]
+    main.http_anfrage("GET", URL)
+    assert sitzung["aufrufe"][0][2]["timeout"] == main.HTTP_TIMEOUTS["bingx"]
+
+
+def test_letzter_timeout_wird_geworfen(sitzung):
+    sitzung["antworten"] = [requests.Timeout("read")] * 3
+    with pytest.raises(requests.Timeout):
+        main.http_anfrage("GET", URL)
+    assert len(sitzung["aufrufe"]) == 3
+
+
+def test_5xx_nach_allen_versuchen_zurueckgegeben(sitzung):
+    sitzung["antworten"] = [Antwort(503)] * 3
+    assert main.http_anfrage("GET", URL).status_code == 503
+    assert len(sitzung["aufrufe"]) == 3
+
+
+def test_post_ohne_wiederholung(sitzung):
+    sitzung["antworten"] = [requests.Timeout("read")]
+    with pytest.raises(requests.Timeout):
+        main.http_anfrage("POST", URL)
+    assert len(sitzung["aufrufe"]) == 1
+
+
+def test_circuit_oeffnet_und_probe_schliesst(sitzung, monkeypatch):
+    uhr = {"jetzt": 100.0}
+    monkeypatch.setattr(main.time, "monotonic", lambda: uhr["jetzt"])
+    monkeypatch.setattr(main, "CB_FEHLER_SCHWELLE", 3)
+    monkeypatch.setattr(main, "HTTP_RETRIES", 0)
+    breaker = main.circuit_breaker["bingx"]
+
+    sitzung["antworten"] = [Antwort(500)] * 3
+    for _ in range(3):
+        main.http_anfrage("GET", URL)
+    assert breaker.offen() and breaker.geoeffnet_anzahl == 1
+
+    # offen: kein Request an BingX
+    with pytest.raises(main.AbhaengigkeitNichtVerfuegbar):
+        main.http_anfrage("GET", URL)
+    assert len(sitzung["aufrufe"]) == 3 and breaker.abgelehnt == 1
+
+    # nach CB_PAUSE genau ein Probe-Request (halb offen)
+    uhr["jetzt"] += main.CB_PAUSE
+    assert breaker.erlauben()
+    assert not breaker.erlauben()
+    breaker.fehler()
+    assert breaker.offen()
+
+    uhr["jetzt"] += main.CB_PAUSE
+    sitzung["antworten"] = [Antwort()]
+    assert main.http_anfrage("GET", URL).status_code == 200
+    assert not breaker.offen() and breaker.fehler_in_folge == 0
+
+
+def _order(client_order_id="mb1"):
+    return {"symbol": "BTC-USDT", "side": "BUY", "type": "MARKET", "clientOrderID": client_order_id}
+
+
+def test_order_nach_timeout_nicht_doppelt_gesendet(sitzung):
+    # BingX hat die erste Order angenommen, nur die Antwort ging verloren
+    gefunden = Antwort(daten={"code": 0, "data": {"order": {"orderId": 7, "clientOrderId": "mb1"}}})
+    sitzung["antworten"] = [requests.Timeout("read"), gefunden]
+    assert main.order_posten(URL, {}, _order(), "geheim") is gefunden
+    assert [m for m, _, _ in sitzung["aufrufe"]] == ["POST", "GET"]
+    assert sitzung["aufrufe"][1][2]["params"]["clientOrderId"] == "mb1"
+
+
+def test_order_unbekannt_wird_neu_gesendet(sitzung):
+    unbekannt = Antwort(daten={"code": 109414, "msg": "order not exist"})
+    sitzung["antworten"] = [Antwort(502), unbekannt, Antwort(daten={"code": 0, "data": {"order": {"orderId": 8}}})]
+    assert main.order_posten(URL, {}, _order(), "geheim").status_code == 200
+    assert [m for m, _, _ in sitzung["aufrufe"]] == ["POST", "GET", "POST"]
+    assert sitzung["aufrufe"][2][2]["json"]["clientOrderID"] == "mb1"
+
+
+def test_order_abfrage_gescheitert_kein_zweiter_post(sitzung):
+    sitzung["antworten"] = [requests.ConnectionError("reset")] + [requests.Timeout("read")] * 3
+    with pytest.raises(requests.ConnectionError):
+        main.order_posten(URL, {}, _order(), "geheim")
+    assert [m for m, _, _ in sitzung["aufrufe"]] == ["POST", "GET", "GET", "GET"]
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def idem(monkeypatch):
+    """Leerer Idempotenz-Speicher ohne DB und eine Uhr, die der Test selbst weiterstellt."""
+    uhr = {"jetzt": 1000.0}
+    monkeypatch.setattr(main, "_idem_cache", OrderedDict())
+    monkeypatch.setattr(main, "_idem_laufend", {})
+    monkeypatch.setattr(main, "IDEMPOTENZ_DB", "")
+    monkeypatch.setattr(main, "IDEMPOTENZ_TTL", 300.0)
+    monkeypatch.setattr(main.time, "monotonic", lambda: uhr["jetzt"])
+    return uhr
+
+
+def zaehlend(ergebnis):
+    aufrufe = []
+
+    def funktion():
+        aufrufe.append(1)
+        return ergebnis
+    return funktion, aufrufe
+
+
+def test_duplikat_liefert_erstes_ergebnis(idem):
+    funktion, aufrufe = zaehlend(({"usdt_amount": 5.0}, 200))
+    assert main.idempotent_ausfuehren("k", funktion) == ({"usdt_amount": 5.0}, 200, False)
+    assert main.idempotent_ausfuehren("k", funktion) == ({"usdt_amount": 5.0}, 200, True)
+    assert len(aufrufe) == 1
+
+
+def test_ablehnung_wird_gemerkt(idem):
+    funktion, aufrufe = zaehlend(({"error": True}, 400))
+    main.idempotent_ausfuehren("k", funktion)
+    assert main.idempotent_ausfuehren("k", funktion) == ({"error": True}, 400, True)
+    assert len(aufrufe) == 1
+
+
+def test_5xx_wird_nicht_gemerkt(idem):
+    funktion, aufrufe = zaehlend(({"error": True}, 502))
+    assert main.idempotent_ausfuehren("k", funktion)[2] is False
+    assert main.idempotent_ausfuehren("k", funktion)[2] is False
+    assert len(aufrufe) == 2
+    assert "k" not in main._idem_cache
+
+
+def test_exception_wird_nicht_gemerkt(idem):
+    def kaputt():
+        raise RuntimeError("BingX weg")
+
+    with pytest.raises(RuntimeError):
+        main.idempotent_ausfuehren("k", kaputt)
+    assert main._idem_laufend == {}
+    funktion, aufrufe = zaehlend(({}, 200))
+    assert main.idempotent_ausfuehren("k", funktion)[2] is False
+
+
+def test_nach_ttl_wieder_ausgefuehrt(idem):
+    funktion, aufrufe = zaehlend(({}, 200))
+    main.idempotent_ausfuehren("k", funktion)
+    idem["jetzt"] += 299
+    assert main.idempotent_ausfuehren("k", funktion)[2] is True
+    idem["jetzt"] += 2
+    assert main.idempotent_ausfuehren("k", funktion)[2] is False
+    assert len(aufrufe) == 2
+
+
+def test_db_erkennt_duplikat_nach_neustart(idem, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "IDEMPOTENZ_DB", str(tmp_path / "idem.db"))
+    monkeypatch.setattr(main, "_idem_db", main.threading.local())
+    funktion, aufrufe = zaehlend(({"usdt_amount": 5.0}, 200))
+    main.idempotent_ausfuehren("k", funktion)
+    main._idem_cache.clear()  # Speicher weg wie nach einem Neustart
+    assert main.idempotent_ausfuehren("k", funktion) == ({"usdt_amount": 5.0}, 200, True)
+    assert len(aufrufe) == 1
+    assert "k" in main._idem_cache
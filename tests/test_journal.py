@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import main
+
+pytest.importorskip("numpy")
+
+
+def _ereignis(art, botname, seite="LONG", menge=0.0, preis=0.0, so=-1, symbol="BTC-USDT"):
+    return {"zeit": time.time(), "art": art, "botname": botname, "symbol": symbol, "position_side": seite,
+            "menge": menge, "preis": preis, "referenzpreis": preis, "usdt": menge * preis, "so": so}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = main.TradeJournal(str(tmp_path))
+    for ereignis in [
+        # LONG: 1 @ 100 + 1 @ 90, Schließen ohne Menge (aus dem offenen Zustand) @ 110 -> +30
+        _ereignis("fill", "long", menge=1, preis=100, so=0),
+        _ereignis("fill", "long", menge=1, preis=90, so=1),
+        _ereignis("close", "long", preis=110),
+        # SHORT: 2 @ 100, extern geschlossen @ 95 -> +10
+        _ereignis("fill", "short", "SHORT", menge=2, preis=100, so=0, symbol="ETH-USDT"),
+        _ereignis("extern", "short", "SHORT", preis=95, symbol="ETH-USDT"),
+        # extern ohne Schlusspreis: zählt nicht
+        _ereignis("fill", "unbekannt", menge=1, preis=100, so=0),
+        _ereignis("extern", "unbekannt"),
+        # noch offen: zählt nicht
+        _ereignis("fill", "offen", menge=1, preis=100, so=0),
+        # zweite Position von "long": neuer Zyklus, -5
+        _ereignis("fill", "long", menge=1, preis=100, so=0),
+        _ereignis("close", "long", preis=95),
+    ]:
+        journal.aufnehmen(ereignis)
+    return journal
+
+
+def test_pnl_pro_bot(journal):
+    assert journal.pnl() == {
+        "long": {"pnl_usdt": 25.0, "positionen": 2},
+        "short": {"pnl_usdt": 10.0, "positionen": 1},
+    }
+
+
+def test_pnl_pro_symbol(journal):
+    assert journal.pnl("symbol") == {
+        "BTC-USDT": {"pnl_usdt": 25.0, "positionen": 2},
+        "ETH-USDT": {"pnl_usdt": 10.0, "positionen": 1},
+    }
+
+
+def test_so_tiefe(journal):
+    assert journal.so_tiefe() == {0: 3, 1: 1}
+    assert journal.so_tiefe("long") == {0: 1, 1: 1}
+    assert journal.so_tiefe("gibt_es_nicht") == {}
+
+
+def test_nach_flush_und_neustart_gleich(journal, tmp_path):
+    vorher = journal.pnl()
+    assert journal.flush() == 10 and journal.segmente == 1
+    neu = main.TradeJournal(str(tmp_path))
+    assert neu.zeilen == 10
+    assert neu.pnl() == vorher
+    # offener Zustand wiederhergestellt: Schließen ohne Menge nimmt die offene Menge
+    neu.aufnehmen(_ereignis("close", "offen", preis=120))
+    assert neu.pnl()["offen"] == {"pnl_usdt": 20.0, "positionen": 1}
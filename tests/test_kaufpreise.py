@@ -0,0 +1,48 @@
+import pytest
+
+import main
+
+
+def test_falten_ohne_snapshot():
+    daten = {
+        "-a": {"price": 100, "usdt_amount": 10, "zeit": "2026-01-02T00:00:00+00:00"},
+        "-b": {"price": 80, "usdt_amount": 30, "zeit": "2026-01-01T00:00:00+00:00"},
+    }
+    snapshot = main.kaufpreise_falten(daten)
+    assert snapshot["price"] == pytest.approx(85)
+    assert snapshot["usdt_amount"] == 40
+    assert snapshot["anzahl"] == 2
+    assert (snapshot["erste"], snapshot["letzte"]) == ("2026-01-01T00:00:00+00:00", "2026-01-02T00:00:00+00:00")
+
+
+def test_falten_mit_altem_snapshot():
+    daten = {
+        main.KAUFPREISE_SNAPSHOT: {"price": 90, "usdt_amount": 20, "anzahl": 3, "erste": "2026-01-01T00:00:00+00:00",
+                                   "letzte": "2026-01-01T00:00:00+00:00"},
+        "-c": {"price": 60, "usdt_amount": 10},
+        "kaputt": 5,
+    }
+    snapshot = main.kaufpreise_falten(daten)
+    assert snapshot["price"] == pytest.approx(80)
+    assert snapshot["usdt_amount"] == 30
+    assert snapshot["anzahl"] == 4
+
+
+@pytest.mark.parametrize("daten", [None, [], {}, {"x": 1}])
+def test_falten_ohne_kaeufe(daten):
+    assert main.kaufpreise_falten(daten) is None
+
+
+def test_aus_knoten_gleicher_durchschnitt_und_anzahl_nach_dem_falten():
+    daten = {"-a": {"price": 100, "usdt_amount": 10}, "-b": {"price": 80, "usdt_amount": 30}, "-c": {"price": 70, "usdt_amount": 5}}
+    vorher = main.kaufpreise_aus_knoten(daten)
+    gefaltet = {main.KAUFPREISE_SNAPSHOT: main.kaufpreise_falten({k: daten[k] for k in ("-a", "-b")}), "-c": daten["-c"]}
+    nachher = main.kaufpreise_aus_knoten(gefaltet)
+    assert len(nachher) == 2
+    assert main.anzahl_kaeufe(vorher) == main.anzahl_kaeufe(nachher) == 3
+    assert main.berechne_durchschnittspreis(nachher) == pytest.approx(main.berechne_durchschnittspreis(vorher))
+
+
+def test_aus_knoten_ignoriert_fremdes():
+    assert main.kaufpreise_aus_knoten(None) == []
+    assert main.kaufpreise_aus_knoten({"-a": "x", "-b": {"price": "5", "usdt_amount": "2"}}) == [{"price": 5.0, "usdt_amount": 2.0}]
@@ -0,0 +1,50 @@
+import pytest
+
+import main
+
+
+def test_geom_summe():
+    assert main._geom_summe(2, 0) == 0.0
+    assert main._geom_summe(2, 3) == 7.0
+    assert main._geom_summe(1.0, 4) == 4.0
+    assert main._geom_summe(0.5, 3) == pytest.approx(1.75)
+
+
+def test_ladder_ordergroessen_und_summen():
+    leiter = main.ladder_berechnen(10, 2, 2)
+    assert [s["usdt"] for s in leiter["stufen"]] == [10, 20, 40]
+    assert [s["kumuliert_usdt"] for s in leiter["stufen"]] == [10, 30, 70]
+    assert leiter["gesamt_usdt"] == 70
+    assert "preis" not in leiter["stufen"][0]
+
+
+@pytest.mark.parametrize("seite, r", [("LONG", 0.9), ("SHORT", 1.1)])
+def test_ladder_durchschnitt_wie_einzeln_gerechnet(seite, r):
+    leiter = main.ladder_berechnen(10, 1.5, 3, seite, preis=100, so_abstand=10)
+    einsatz = menge = 0.0
+    for k, stufe in enumerate(leiter["stufen"]):
+        preis = 100 * r ** k
+        einsatz += 10 * 1.5 ** k
+        menge += 10 * 1.5 ** k / preis
+        assert stufe["preis"] == pytest.approx(preis)
+        assert stufe["durchschnittspreis"] == pytest.approx(einsatz / menge)
+
+
+def test_ladder_liquidationspreis():
+    leiter = main.ladder_berechnen(10, 1.0, 1, "LONG", preis=100, so_abstand=10, kapital=5)
+    stufe = leiter["stufen"][1]
+    menge = 10 / 100 + 10 / 90
+    assert stufe["liq_preis"] == pytest.approx(20 / menge - 5 / menge)
+    assert stufe["liq_abstand_pct"] == pytest.approx(abs(90 - stufe["liq_preis"]) / 90 * 100, abs=0.01)
+
+    short = main.ladder_berechnen(10, 1.0, 0, "SHORT", preis=100, so_abstand=10, kapital=5)
+    assert short["stufen"][0]["liq_preis"] == pytest.approx(100 + 5 / 0.1)
+
+
+def test_bot_ladder_rechnet_aus_der_aktuellen_so_zurueck(monkeypatch):
+    monkeypatch.setattr(main, "_ladder_cache", {})
+    cfg = main.BotConfig.aus_dict({"botname": "b", "usdt_factor": 2, "pyramiding": 3, "leverage": 1, "position_side": "LONG"})
+    bo = main.bot_ladder("b", cfg, 10, 0, 1000, 100)
+    assert bo["gesamt_usdt"] == 70 and bo["verfuegbar_bei_bo"] == 1000
+    # SO 2 mit 40 USDT gehört zur selben Leiter: aus dem Cache, Startpreis und Kapital von der BO
+    assert main.bot_ladder("b", cfg, 40, 2, 500, 80) is bo
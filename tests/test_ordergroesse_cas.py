@@ -0,0 +1,61 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def firebase(monkeypatch):
+    """Firebase-Knoten ordergroesse/b im Speicher: {"wert", "etag", "schreibversuche"}; vorgeschaltete Konflikte in "fremd"."""
+    knoten = {"wert": {"usdt_amount": 10.0}, "etag": "e0", "schreibversuche": 0, "fremd": []}
+
+    def lesen(pfad, firebase_secret):
+        return knoten["wert"], knoten["etag"]
+
+    def schreiben(pfad, wert, etag, firebase_secret):
+        knoten["schreibversuche"] += 1
+        if knoten["fremd"]:
+            # ein anderer Worker schreibt dazwischen
+            knoten["wert"], knoten["etag"] = {"usdt_amount": knoten["fremd"].pop(0)}, f"f{knoten['schreibversuche']}"
+        if etag != knoten["etag"]:
+            return False, knoten["wert"], knoten["etag"]
+        knoten["wert"], knoten["etag"] = wert, f"e{knoten['schreibversuche']}"
+        return True, wert, knoten["etag"]
+
+    monkeypatch.setattr(main, "firebase_lese_mit_etag", lesen)
+    monkeypatch.setattr(main, "firebase_schreibe_wenn_unveraendert", schreiben)
+    monkeypatch.setattr(main, "firebase_etags", {})
+    monkeypatch.setattr(main, "firebase_spiegel", main.FirebaseSpiegel())
+    monkeypatch.setattr(main.time, "sleep", lambda sekunden: None)
+    return knoten
+
+
+def test_ohne_konflikt(firebase):
+    assert main.ordergroesse_cas("b", 20.0, 2.0, "s") == (20.0, 1)
+    assert firebase["wert"] == {"usdt_amount": 20.0}
+    assert main.firebase_etags["ordergroesse/b"] == firebase["etag"]
+
+
+def test_gemerktes_etag_spart_den_get(firebase, monkeypatch):
+    main.firebase_etags["ordergroesse/b"] = "e0"
+    monkeypatch.setattr(main, "firebase_lese_mit_etag", lambda *a: pytest.fail("GET trotz ETag"))
+    assert main.ordergroesse_cas("b", 20.0, 2.0, "s") == (20.0, 1)
+
+
+def test_schon_erhoeht_wird_vom_aktuellen_wert_weitergerechnet(firebase):
+    firebase["wert"] = {"usdt_amount": 20.0}  # anderer Worker hat 10 -> 20 schon geschrieben
+    assert main.ordergroesse_cas("b", 20.0, 2.0, "s") == (40.0, 1)
+
+
+def test_konflikt_beim_schreiben(firebase):
+    firebase["fremd"] = [20.0]
+    assert main.ordergroesse_cas("b", 20.0, 2.0, "s") == (40.0, 2)
+    assert firebase["wert"] == {"usdt_amount": 40.0}
+    assert main.cas_statistik["konflikte"] >= 1
+
+
+def test_aufgeben_nach_zu_vielen_konflikten(firebase, monkeypatch):
+    monkeypatch.setattr(main, "FIREBASE_CAS_VERSUCHE", 2)
+    firebase["fremd"] = [20.0, 40.0, 80.0]
+    with pytest.raises(Exception, match="nicht geschrieben"):
+        main.ordergroesse_cas("b", 20.0, 2.0, "s")
+    assert "ordergroesse/b" not in main.firebase_etags
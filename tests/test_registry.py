@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import main
+
+
+def eintrag(**felder):
+    render = {"api_key": "k", "secret_key": "s", "symbol": "BTC-USDT", "webhook_token": "geheim"}
+    render.update(felder)
+    return render
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "bot_registry", {})
+
+    def laden(eintraege):
+        pfad = tmp_path / "bots.json"
+        pfad.write_text(json.dumps(eintraege), encoding="utf-8")
+        return main.bot_registry_laden(str(pfad))
+    return laden
+
+
+def test_richtiger_token(registry):
+    registry({"b": eintrag()})
+    cfg = main.bot_config_fuer_alarm({"RENDER": {"botname": "b", "token": "geheim"}})
+    assert (cfg.api_key, cfg.secret_key, cfg.symbol) == ("k", "s", "BTC-USDT")
+
+
+@pytest.mark.parametrize("render", [
+    {"botname": "b"},
+    {"botname": "b", "token": "falsch"},
+    {"botname": "b", "token": ""},
+    {"botname": "b", "token": 123},
+])
+def test_falscher_oder_fehlender_token(registry, render):
+    registry({"b": eintrag()})
+    with pytest.raises(main.ZugriffVerweigert):
+        main.bot_config_fuer_alarm({"RENDER": render})
+
+
+def test_token_schuetzt_auch_bei_mitgeschickten_schluesseln(registry):
+    registry({"b": eintrag()})
+    with pytest.raises(main.ZugriffVerweigert):
+        main.bot_config_fuer_alarm({"RENDER": {"botname": "b", "api_key": "k", "secret_key": "s"}})
+
+
+def test_bot_ohne_registry_aus_render(registry):
+    registry({"b": eintrag()})
+    cfg = main.bot_config_fuer_alarm({"RENDER": {"botname": "anderer", "api_key": "x", "secret_key": "y", "symbol": "ETH-USDT"}})
+    assert (cfg.botname, cfg.api_key) == ("anderer", "x")
+
+
+def test_eintrag_ohne_webhook_token_bricht_laden_ab(registry):
+    registry({"b": eintrag()})
+    with pytest.raises(ValueError, match="webhook_token"):
+        registry({"b": eintrag(), "c": eintrag(webhook_token=None)})
+    # die alte Registry bleibt gültig
+    assert list(main.bot_registry) == ["b"]
+
+
+def test_token_aus_umgebung(registry, monkeypatch):
+    monkeypatch.setenv("BOT_B_TOKEN", "aus-env")
+    registry({"b": eintrag(webhook_token="env:BOT_B_TOKEN")})
+    assert main.bot_config_fuer_alarm({"RENDER": {"botname": "b", "token": "aus-env"}}).botname == "b"
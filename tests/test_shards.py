@@ -0,0 +1,34 @@
+import hashlib
+
+import main
+
+
+def test_shard_fuer_ist_stabil_und_im_bereich():
+    erwartet = int.from_bytes(hashlib.sha256(b"api-key-1").digest()[:8], "big") % 4
+    assert main.shard_fuer("api-key-1", 4) == erwartet
+    assert all(0 <= main.shard_fuer(f"k{i}", 3) < 3 for i in range(100))
+
+
+def test_shard_fuer_verteilt_gleichmaessig():
+    zaehler = [0] * 4
+    for i in range(4000):
+        zaehler[main.shard_fuer(f"konto-{i}", 4)] += 1
+    assert min(zaehler) > 800
+
+
+def test_routing_schluessel_registry_vor_alarm(monkeypatch):
+    cfg = main.BotConfig.aus_dict({"botname": "reg", "api_key": "registry-key"})
+    monkeypatch.setattr(main, "bot_registry", {"reg": cfg})
+    assert main._routing_schluessel({"RENDER": {"botname": "reg", "api_key": "anders"}}) == "registry-key"
+    assert main._routing_schluessel({"RENDER": {"botname": "frei", "api_key": "k"}}) == "k"
+    assert main._routing_schluessel({"RENDER": {"botname": "frei"}}) == "frei"
+
+
+def test_bot_im_shard(monkeypatch):
+    assert main.bot_im_shard("egal") is True
+    monkeypatch.setattr(main, "SHARDS", 2)
+    monkeypatch.setattr(main, "shard_index", main.shard_fuer("key-a"))
+    monkeypatch.setattr(main, "_registry_routing", {"a": "key-a", "b": "key-b"})
+    assert main.bot_im_shard("a") is True
+    assert main.bot_im_shard("b") is (main.shard_fuer("key-b") == main.shard_fuer("key-a"))
+    assert main.bot_im_shard("unbekannt") is None
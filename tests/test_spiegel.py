@@ -0,0 +1,98 @@
+import main
+
+
+def test_sse_put_und_patch():
+    zeilen = [
+        "event: put",
+        'data: {"path": "/", "data": {"bot1": {"usdt_amount": 5}}}',
+        "",
+        b"event: patch",
+        b'data: {"path": "/bot1", "data": {"usdt_amount": 7}}',
+        b"",
+    ]
+    assert list(main.sse_ereignisse_parsen(zeilen)) == [
+        ("put", {"path": "/", "data": {"bot1": {"usdt_amount": 5}}}),
+        ("patch", {"path": "/bot1", "data": {"usdt_amount": 7}}),
+    ]
+
+
+def test_sse_keep_alive_kommentare_und_mehrzeilige_daten():
+    zeilen = [
+        ": kommentar",
+        "event: keep-alive",
+        "data: null",
+        "",
+        "",  # doppelte Leerzeile erzeugt kein Ereignis
+        "data: {\"a\":",
+        "data:  1}\r",
+        "",
+        "event: cancel",
+        "data: kein json",
+        "",
+    ]
+    assert list(main.sse_ereignisse_parsen(zeilen)) == [
+        ("keep-alive", None),
+        ("message", {"a": 1}),
+        ("cancel", "kein json"),
+    ]
+
+
+def test_sse_ohne_abschliessende_leerzeile():
+    assert list(main.sse_ereignisse_parsen(["event: put", 'data: {"path": "/"}'])) == []
+
+
+def test_spiegel_setzen_legt_pfade_an_und_loescht_leere_knoten():
+    wurzel = main.spiegel_setzen(None, ["bot1", "k1"], {"price": 1})
+    assert wurzel == {"bot1": {"k1": {"price": 1}}}
+    wurzel = main.spiegel_setzen(wurzel, ["bot2"], {"usdt_amount": 3})
+    assert wurzel == {"bot1": {"k1": {"price": 1}}, "bot2": {"usdt_amount": 3}}
+    wurzel = main.spiegel_setzen(wurzel, ["bot1", "k1"], None)
+    assert wurzel == {"bot2": {"usdt_amount": 3}}
+    assert main.spiegel_setzen(wurzel, ["bot2"], {}) is None
+
+
+def test_spiegel_setzen_ersetzt_blatt_durch_knoten():
+    assert main.spiegel_setzen({"bot1": 5}, ["bot1", "usdt_amount"], 7) == {"bot1": {"usdt_amount": 7}}
+
+
+def test_spiegel_ereignis_put_auf_wurzel_ist_resync():
+    wurzel, resync = main.spiegel_ereignis_anwenden({"alt": 1}, "put", {"path": "/", "data": {"bot1": {"x": 1}}})
+    assert (wurzel, resync) == ({"bot1": {"x": 1}}, True)
+    wurzel, resync = main.spiegel_ereignis_anwenden(wurzel, "put", {"path": "/bot1/x", "data": 2})
+    assert (wurzel, resync) == ({"bot1": {"x": 2}}, False)
+
+
+def test_spiegel_ereignis_patch_setzt_und_loescht_unterpfade():
+    wurzel = {"bot1": {"a": 1, "b": 2}}
+    wurzel, resync = main.spiegel_ereignis_anwenden(wurzel, "patch", {"path": "/bot1", "data": {"a": None, "c/d": 4}})
+    assert (wurzel, resync) == ({"bot1": {"b": 2, "c": {"d": 4}}}, False)
+    assert main.spiegel_ereignis_anwenden(wurzel, "keep-alive", {}) == (wurzel, False)
+
+
+def test_spiegel_ereignis_filtern():
+    behalten = {"bot1"}.__contains__
+    assert main.spiegel_ereignis_filtern("put", {"path": "/bot2/x", "data": 1}, behalten) is None
+    assert main.spiegel_ereignis_filtern("put", {"path": "/", "data": {"bot1": 1, "bot2": 2}}, behalten) == {"path": "/", "data": {"bot1": 1}}
+    assert main.spiegel_ereignis_filtern("patch", {"path": "/", "data": {"bot2/x": 1}}, behalten) is None
+    assert main.spiegel_ereignis_filtern("patch", {"path": "/", "data": {"bot1/x": 1, "bot2": 2}}, behalten) == {"path": "/", "data": {"bot1/x": 1}}
+
+
+def test_firebase_spiegel_lesen_nur_synchron_und_als_kopie():
+    spiegel = main.FirebaseSpiegel(baeume=("kaufpreise",))
+    assert spiegel.lesen("kaufpreise", "bot1") == (False, None)
+    spiegel.anwenden("kaufpreise", "put", {"path": "/", "data": {"bot1": {"k1": {"price": 100}}}})
+    gespiegelt, wert = spiegel.lesen("kaufpreise", "bot1")
+    assert gespiegelt and wert == {"k1": {"price": 100}}
+    wert["k1"]["price"] = 0
+    assert spiegel.lesen("kaufpreise", "bot1/k1") == (True, {"price": 100})
+    assert spiegel.status()["baeume"]["kaufpreise"]["bots"] == 1
+
+
+def test_firebase_spiegel_behalten_liest_fremde_bots_per_rest():
+    spiegel = main.FirebaseSpiegel(baeume=("ordergroesse",))
+    spiegel.behalten = {"bot1"}.__contains__
+    spiegel.anwenden("ordergroesse", "put", {"path": "/", "data": {"bot1": {"usdt_amount": 5}, "bot2": {"usdt_amount": 6}}})
+    spiegel.lokal_setzen("ordergroesse", "bot2", {"usdt_amount": 7})
+    assert spiegel.status()["baeume"]["ordergroesse"]["bots"] == 1
+    assert spiegel.lesen("ordergroesse", "bot1") == (True, {"usdt_amount": 5})
+    assert spiegel.lesen("ordergroesse", "bot2") == (False, None)